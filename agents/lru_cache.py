@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache LRU generica partilhada pelas caches do projeto
+- LRUCache: dicionario com capacidade maxima em que o acesso menos recente
+  sai primeiro, com contadores de hits/misses/evictions
+- Usada pela cache de rotas (routing.RouteCache), pela memoria de
+  alcancabilidade (routing.ReachabilityIndex) e pela cache de textos da
+  interface (live_dynamic_spade.TextCache)
+"""
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Dicionario limitado a capacity entradas, com despejo LRU
+
+    get conta um hit ou um miss e passa a entrada a mais recente; put
+    insere (ou substitui) e despeja as entradas mais antigas que excedam a
+    capacidade. Os valores nao podem ser o default de get (None) para que
+    um miss seja distinguivel.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def get(self, key, default=None):
+        """Valor guardado para key (passa a mais recente) ou default"""
+        value = self._entries.get(key, default)
+        if value is default:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Guarda value e despeja as entradas menos recentes acima da capacidade"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Esvazia a cache (os contadores mantem-se)"""
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Contadores (hits, misses, taxa de acerto, tamanho, despejos)"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total > 0 else 0.0,
+            'size': len(self._entries),
+            'evictions': self.evictions
+        }
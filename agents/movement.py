@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Motor central de movimento dos veiculos (opcional)
+- MovementKernel: posicoes, velocidades, alvos e tempos de espera em arrays
+  NumPy (struct-of-arrays); um unico passo vetorizado por tick avanca todos
+  os veiculos e avalia as regras de paragem (vermelho, amarelo, ambulancia)
+  como mascaras
+- KernelField: atributo do VehicleAgent guardado no array do kernel
+
+Os agentes continuam a tratar mensagens e roteamento; o kernel so os acorda
+quando chegam a um no, ficam sem alvo ou a rota muda.
+"""
+
+import time
+
+try:
+    import numpy as np
+except ImportError:  # NumPy e opcional: sem ele o kernel fica indisponivel
+    np = None
+
+from .sim_clock import get_clock, sim_time
+
+# Regras de paragem (iguais ao MoveBehaviour)
+ARRIVAL_DISTANCE = 2  # Distancia (px) ao no a partir da qual o veiculo chegou
+YIELD_DISTANCE = 50  # So cede passagem a ambulancias a menos de 50px do no
+RED_STOP_DISTANCE = 50  # Vermelho: para a menos de 50px do no
+YELLOW_STOP_DISTANCE = 30  # Amarelo: para a menos de 30px do no
+YELLOW_FAST_DISTANCE = 60  # Amarelo e velocidade alta: para a menos de 60px
+YELLOW_FAST_SPEED = 250
+
+GREEN, YELLOW, RED = 0, 1, 2
+LIGHT_CODES = {'green': GREEN, 'yellow': YELLOW, 'red': RED}
+
+
+class KernelField:
+    """Atributo numerico do veiculo: no array homonimo do kernel quando ligado
+
+    Antes do registo (ou sem kernel) o valor fica num atributo local "_<nome>".
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.local = "_" + name
+
+    def __get__(self, agent, owner=None):
+        if agent is None:
+            return self
+        if agent.kernel_slot is not None:
+            return getattr(agent.kernel, self.name)[agent.kernel_slot].item()
+        return getattr(agent, self.local)
+
+    def __set__(self, agent, value):
+        if agent.kernel_slot is not None:
+            getattr(agent.kernel, self.name)[agent.kernel_slot] = value
+        else:
+            setattr(agent, self.local, value)
+
+
+class MovementKernel:
+    """Estado de movimento de todos os veiculos do processo em arrays
+
+    Cada veiculo registado ocupa um indice (slot). step() calcula num passo
+    vetorizado as distancias aos alvos, as mascaras de paragem e as novas
+    posicoes; os veiculos que chegaram ao alvo, que nao tem alvo ou cuja rota
+    mudou (pending) sao acordados para o passo discreto (KernelStepBehaviour).
+    """
+
+    FIELDS = ('x', 'y', 'speed', 'waiting_time', 'total_travel_time')
+
+    def __init__(self, capacity=64, yield_radius=150, ambulance_max_age=1.0):
+        if np is None:
+            raise RuntimeError("MovementKernel requer NumPy (pip install numpy)")
+        self.yield_radius = yield_radius
+        self.ambulance_max_age = ambulance_max_age
+        self.count = 0
+        self.agents = []
+        self.target_nodes = []  # Nó alvo de cada slot (ou None)
+        self._allocate(capacity)
+
+        # Semáforos: {node_orientation: indice} -> estado atual (GREEN/YELLOW/RED)
+        self.light_index = {}
+        self.light_state = np.zeros(16, dtype=np.int8)
+
+        # Últimas posições conhecidas das ambulâncias
+        self.ambulance_index = {}
+        self.amb_x = np.zeros(4)
+        self.amb_y = np.zeros(4)
+        self.amb_time = np.full(4, -np.inf)
+
+        self.running = False
+        self.ticks = 0
+        self.step_ms = 0.0  # Tempo acumulado em step()
+
+    def _allocate(self, capacity):
+        """Cria (ou aumenta) os arrays por veiculo mantendo os valores atuais"""
+        old = self.count
+        arrays = {
+            'x': np.zeros(capacity),
+            'y': np.zeros(capacity),
+            'speed': np.zeros(capacity),
+            'waiting_time': np.zeros(capacity, dtype=np.int64),
+            'total_travel_time': np.zeros(capacity, dtype=np.int64),
+            'tx': np.zeros(capacity),
+            'ty': np.zeros(capacity),
+            'light_slot': np.full(capacity, -1, dtype=np.int64),
+            'has_target': np.zeros(capacity, dtype=bool),
+            'arrived': np.zeros(capacity, dtype=bool),
+            'pending': np.zeros(capacity, dtype=bool),
+            'ambulance': np.zeros(capacity, dtype=bool),
+        }
+        for name, array in arrays.items():
+            if old:
+                array[:old] = getattr(self, name)[:old]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def register(self, agent):
+        """Passa o estado de movimento do veiculo para os arrays do kernel"""
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        slot = self.count
+        self.count += 1
+        for name in self.FIELDS:
+            getattr(self, name)[slot] = getattr(agent, "_" + name)
+        self.ambulance[slot] = agent.vehicle_type == 'ambulance'
+        self.pending[slot] = True
+        self.agents.append(agent)
+        self.target_nodes.append(None)
+        agent.kernel_slot = slot
+        return slot
+
+    def wake(self, slot):
+        """Pede um passo discreto ao veiculo no proximo tick"""
+        self.pending[slot] = True
+
+    def set_target(self, slot, node_id, x=0.0, y=0.0):
+        """Define o no alvo (None para parar); o semaforo relevante depende da direcao"""
+        if node_id is None:
+            self.has_target[slot] = False
+            self.target_nodes[slot] = None
+            return
+        if self.target_nodes[slot] != node_id or not self.has_target[slot]:
+            # Movimento horizontal -> semáforo vertical e vice-versa (como no MoveBehaviour)
+            horizontal = abs(x - self.x[slot]) > abs(y - self.y[slot])
+            orientation = 'vertical' if horizontal else 'horizontal'
+            self.light_slot[slot] = self._light_slot(f"{node_id}_{orientation}")
+        self.target_nodes[slot] = node_id
+        self.tx[slot] = x
+        self.ty[slot] = y
+        self.has_target[slot] = True
+
+    def take_arrival(self, slot):
+        """No a que o veiculo chegou desde o ultimo passo discreto (ou None)"""
+        if not self.arrived[slot]:
+            return None
+        self.arrived[slot] = False
+        return self.target_nodes[slot]
+
+    def _light_slot(self, light_key):
+        slot = self.light_index.get(light_key)
+        if slot is None:
+            slot = len(self.light_index)
+            if slot == len(self.light_state):
+                self.light_state = np.concatenate([self.light_state, np.zeros_like(self.light_state)])
+            self.light_index[light_key] = slot
+        return slot
+
+    def set_light(self, light_key, state):
+        """Estado atual de um semaforo (chave node_id + orientacao)"""
+        self.light_state[self._light_slot(light_key)] = LIGHT_CODES.get(state, GREEN)
+
+    def set_ambulance(self, ambulance_id, x, y, timestamp=None):
+        """Ultima posicao conhecida de uma ambulancia"""
+        slot = self.ambulance_index.get(ambulance_id)
+        if slot is None:
+            slot = len(self.ambulance_index)
+            if slot == len(self.amb_x):
+                self.amb_x = np.concatenate([self.amb_x, np.zeros_like(self.amb_x)])
+                self.amb_y = np.concatenate([self.amb_y, np.zeros_like(self.amb_y)])
+                self.amb_time = np.concatenate([self.amb_time, np.full_like(self.amb_time, -np.inf)])
+            self.ambulance_index[ambulance_id] = slot
+        self.amb_x[slot] = x
+        self.amb_y[slot] = y
+        self.amb_time[slot] = timestamp if timestamp is not None else sim_time()
+
+    def step(self, now=None):
+        """Avanca todos os veiculos um tick e acorda os que precisam de um passo discreto"""
+        n = self.count
+        if n == 0:
+            return
+        started = time.perf_counter()
+        now = now if now is not None else sim_time()
+
+        x, y = self.x[:n], self.y[:n]
+        tx, ty = self.tx[:n], self.ty[:n]
+        speed = self.speed[:n]
+        active = self.has_target[:n]
+        dx = tx - x
+        dy = ty - y
+        dist = np.hypot(dx, dy)
+
+        arrived = active & (dist <= ARRIVAL_DISTANCE)
+        moving = active & ~arrived
+        cars = moving & ~self.ambulance[:n]
+        stop = np.zeros(n, dtype=bool)
+
+        # 🚑 Ceder passagem: ambulância recente a menos de yield_radius do próximo nó
+        amb_count = len(self.ambulance_index)
+        if amb_count:
+            fresh = (now - self.amb_time[:amb_count]) < self.ambulance_max_age
+            near_node = np.flatnonzero(cars & (dist <= YIELD_DISTANCE))
+            if fresh.any() and near_node.size:
+                ax = self.amb_x[:amb_count][fresh]
+                ay = self.amb_y[:amb_count][fresh]
+                d2 = (tx[near_node, None] - ax) ** 2 + (ty[near_node, None] - ay) ** 2
+                stop[near_node[(d2 < self.yield_radius ** 2).any(axis=1)]] = True
+
+        # 🚦 Semáforos (ambulâncias ignoram)
+        slots = self.light_slot[:n]
+        light = np.where(slots >= 0, self.light_state[slots], GREEN)
+        red = (light == RED) & (dist < RED_STOP_DISTANCE)
+        yellow = (light == YELLOW) & (
+            (dist < YELLOW_STOP_DISTANCE) | ((speed > YELLOW_FAST_SPEED) & (dist < YELLOW_FAST_DISTANCE))
+        )
+        stop |= cars & (red | yellow)
+
+        # Mover (mesmo passo por tick que o MoveBehaviour)
+        go = moving & ~stop
+        scale = np.divide(0.1 * (speed / 60.0), dist, out=np.zeros(n), where=go)
+        x += dx * scale
+        y += dy * scale
+        self.waiting_time[:n][stop] += 1
+        self.total_travel_time[:n][active] += 1
+
+        # Chegadas: o passo discreto avança na rota e define o próximo alvo
+        active[arrived] = False
+        self.arrived[:n] |= arrived
+        wake = self.pending[:n] | self.arrived[:n] | ~active
+        for slot in np.flatnonzero(wake):
+            self.agents[slot].kernel_wakeup.set()
+
+        self.ticks += 1
+        self.step_ms += (time.perf_counter() - started) * 1000
+
+    async def run(self, period):
+        """Loop de ticks no relógio da simulação (no loop asyncio dos agentes) até stop()"""
+        self.running = True
+        clock = get_clock()
+        print(f"⚙️  MovementKernel ativo ({self.count} veículos, {1 / period:.0f} Hz)")
+        while self.running:
+            started = time.perf_counter()
+            self.step()
+            # No relógio em passos o custo do passo não conta como tempo simulado
+            elapsed = time.perf_counter() - started if clock.realtime else 0.0
+            await clock.sleep(max(0.0, period - elapsed))
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        """Contadores do kernel (ticks e tempo medio de um passo)"""
+        return {
+            'vehicles': self.count,
+            'ticks': self.ticks,
+            'step_ms_avg': self.step_ms / self.ticks if self.ticks else 0.0
+        }
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Carregamento da rede viaria para o CSRGraph
+- grid_network: grelha gerada de qualquer tamanho (tipos de rua por linha/coluna)
+- file_network: nos e arestas externos (CSV, JSON Lines ou array JSON) lidos
+  em streaming, registo a registo, diretamente para as listas do CSRGraph
+  (sem dicionarios por no/aresta)
+- ROAD_TYPES: tipos de rua (limite de velocidade, peso base, cor e largura)
+- load_network: escolhe a fonte a partir da secao "network" do cenario
+- intersection_nodes: cruzamentos (nos com pelo menos N vizinhos distintos)
+
+Formato dos ficheiros externos (colunas/chaves; as entre [] sao opcionais):
+    nos:     id, x, y
+    arestas: from, to, [id], [weight], [type], [speed_limit], [distance], [bidirectional]
+Cada aresta e dirigida; com "bidirectional" (na aresta ou na secao
+"network" do cenario) e criada tambem a inversa. Os IDs das arestas sao
+opcionais (dados em todas ou em nenhuma).
+Sem "weight", o peso e o do tipo de rua com a variacao sorteada pelo cenario.
+"""
+
+import csv
+import json
+import math
+import os
+from typing import Iterator, List
+
+from .road_network import CSRGraph
+
+DEFAULT_GRID_SIZE = 6
+DEFAULT_GRID_SPACING = 200  # Espaçamento (px) entre nós da grelha
+GRID_MARGIN = 50
+DEFAULT_ROAD_TYPE = 'residential'
+JSON_CHUNK_SIZE = 1 << 16  # Bytes lidos de cada vez de um array JSON
+
+# Tipos de ruas e seus pesos (TODAS COM MESMA LARGURA - 2 faixas bem visíveis)
+ROAD_TYPES = {
+    'highway': {'speed_limit': 100, 'weight': 5.0, 'color': (100, 100, 100), 'width': 24},
+    'main': {'speed_limit': 80, 'weight': 15.0, 'color': (85, 85, 85), 'width': 24},
+    'secondary': {'speed_limit': 60, 'weight': 30.0, 'color': (70, 70, 70), 'width': 24},
+    'residential': {'speed_limit': 40, 'weight': 50.0, 'color': (60, 60, 60), 'width': 24}
+}
+
+
+def iter_records(path) -> Iterator[dict]:
+    """Registos de um ficheiro CSV, JSON Lines (.jsonl/.ndjson) ou array JSON, um a um"""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    elif suffix in ('.jsonl', '.ndjson'):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    elif suffix == '.json':
+        yield from _iter_json_array(path)
+    else:
+        raise ValueError(f"Formato de rede não suportado: {path} (use .csv, .jsonl ou .json)")
+
+
+def _iter_json_array(path) -> Iterator[dict]:
+    """Objetos de um array JSON de topo, descodificados por blocos (sem json.load do ficheiro)"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    with open(path, encoding='utf-8') as f:
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,[':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            if pos == len(buffer):
+                if eof:
+                    return
+                buffer, pos = f.read(JSON_CHUNK_SIZE), 0
+                eof = not buffer
+                continue
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(JSON_CHUNK_SIZE)
+                eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            yield record
+            pos = end
+
+
+def _edge_id(value):
+    """IDs numericos ficam inteiros (como os da grelha gerada)"""
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'sim')
+    return bool(value)
+
+
+def grid_road_type(row, col, size, horizontal):
+    """Tipo de rua da grelha: perimetro highway, cada 4a linha/coluna main/secondary"""
+    along, across = (row, col) if horizontal else (col, row)
+    if along == 0 or along == size - 1 or across == 0:
+        return 'highway'
+    if along % 4 == 2 or across % 4 == 2:
+        return 'main'
+    if along % 4 == 3:
+        return 'secondary'
+    return 'residential'
+
+
+def grid_network(scenario, road_types, size=DEFAULT_GRID_SIZE, spacing=DEFAULT_GRID_SPACING) -> CSRGraph:
+    """Grelha size x size de ruas com dois sentidos (nos "linha_coluna")
+
+    Os pesos sao sorteados pelo cenario pela mesma ordem da grelha 6x6
+    original (linha a linha; horizontal antes de vertical).
+    """
+    node_ids = []
+    xs = []
+    ys = []
+    for row in range(size):
+        for col in range(size):
+            node_ids.append(f"{row}_{col}")
+            xs.append(col * spacing + GRID_MARGIN)
+            ys.append(row * spacing + GRID_MARGIN)
+
+    edge_list = []
+    edge_id = 0
+    for row in range(size):
+        for col in range(size):
+            from_id = f"{row}_{col}"
+            neighbours = []
+            if col < size - 1:
+                neighbours.append((f"{row}_{col + 1}", True))
+            if row < size - 1:
+                neighbours.append((f"{row + 1}_{col}", False))
+            for to_id, horizontal in neighbours:
+                road_type = grid_road_type(row, col, size, horizontal)
+                weight = scenario.edge_weight(from_id, to_id, road_types[road_type]['weight'])
+                speed_limit = road_types[road_type]['speed_limit']
+                edge_list.append((edge_id, from_id, to_id, weight, spacing, speed_limit, road_type))
+                edge_list.append((edge_id + 1, to_id, from_id, weight, spacing, speed_limit, road_type))
+                edge_id += 2
+    return CSRGraph(node_ids, xs, ys, edge_list)
+
+
+def file_network(nodes_path, edges_path, scenario, road_types, bidirectional=False) -> CSRGraph:
+    """Rede externa: os registos sao lidos em streaming e acumulados em listas/tuplos"""
+    node_ids = []
+    xs = []
+    ys = []
+    positions = {}  # {node_id: indice} para validar as arestas e calcular distâncias
+    for record in iter_records(nodes_path):
+        node_id = str(record['id'])
+        positions[node_id] = len(node_ids)
+        node_ids.append(node_id)
+        xs.append(float(record['x']))
+        ys.append(float(record['y']))
+
+    edge_list = []
+    reverse = []  # Sentidos inversos: IDs atribuídos no fim, depois dos do ficheiro
+    drawn = {}  # Pesos sorteados por rua (o sentido inverso pode vir mais tarde no ficheiro)
+    skipped = 0
+    for record in iter_records(edges_path):
+        from_id, to_id = str(record['from']), str(record['to'])
+        from_index = positions.get(from_id)
+        to_index = positions.get(to_id)
+        if from_index is None or to_index is None or from_id == to_id:
+            skipped += 1
+            continue
+        road_type = record.get('type') or DEFAULT_ROAD_TYPE
+        road = road_types.get(road_type, road_types[DEFAULT_ROAD_TYPE])
+        weight = record.get('weight')
+        if weight in (None, ''):
+            weight = scenario.edge_weight(from_id, to_id, road['weight'], drawn)
+        speed_limit = record.get('speed_limit')
+        if speed_limit in (None, ''):
+            speed_limit = road['speed_limit']
+        distance = record.get('distance')
+        if distance in (None, ''):
+            distance = math.hypot(xs[to_index] - xs[from_index], ys[to_index] - ys[from_index])
+        edge_id = record.get('id')
+        edge_id = len(edge_list) if edge_id in (None, '') else _edge_id(edge_id)
+        edge = (edge_id, from_id, to_id, float(weight), float(distance), float(speed_limit), road_type)
+        edge_list.append(edge)
+        if bidirectional or _flag(record.get('bidirectional', False)):
+            reverse.append((edge_id, to_id, from_id) + edge[3:])
+
+    next_id = 1 + max((edge[0] for edge in edge_list if isinstance(edge[0], int)), default=-1)
+    for edge in reverse:
+        if isinstance(edge[0], int):
+            edge_list.append((next_id,) + edge[1:])
+            next_id += 1
+        else:
+            edge_list.append((f"{edge[0]}r",) + edge[1:])
+    del positions, drawn
+    if skipped:
+        print(f"⚠️  {skipped} arestas ignoradas (nós desconhecidos ou laços) em {edges_path}")
+    return CSRGraph(node_ids, xs, ys, edge_list)
+
+
+def load_network(scenario, road_types=ROAD_TYPES) -> CSRGraph:
+    """Rede descrita na secao "network" do cenario (grelha por omissao)"""
+    spec = scenario.data['network']
+    if spec.get('type', 'grid') == 'file':
+        return file_network(
+            scenario.resolve_path(spec['nodes']), scenario.resolve_path(spec['edges']),
+            scenario, road_types, bidirectional=spec.get('bidirectional', False)
+        )
+    return grid_network(
+        scenario, road_types,
+        size=spec.get('size', DEFAULT_GRID_SIZE), spacing=spec.get('spacing', DEFAULT_GRID_SPACING)
+    )
+
+
+def intersection_nodes(road_graph: CSRGraph, min_degree=3) -> List[str]:
+    """Nos ligados a pelo menos min_degree vizinhos distintos (em qualquer sentido)"""
+    neighbours = [set() for _ in range(road_graph.num_nodes)]
+    for source, target in zip(road_graph.sources, road_graph.targets):
+        neighbours[source].add(target)
+        neighbours[target].add(source)
+    return [road_graph.node_ids[i] for i, linked in enumerate(neighbours) if len(linked) >= min_degree]
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Representacao compacta da rede viaria partilhada pelos agentes
+- CSRGraph: grafo em formato CSR (compressed sparse row) com pesos,
+  coordenadas e atributos das arestas em arrays contiguos
+- register_shared_graph / get_shared_graph: registo por processo para que
+  todos os agentes do mesmo processo usem uma unica copia (so leitura)
+- register_route_cache / get_route_cache: cache de rotas do coordenador,
+  partilhada pelos veiculos do mesmo processo
+- As tabelas ALT (LandmarkTable) podem ser guardadas em disco, por rede
+  (impressao digital da topologia e dos pesos), para nao repetir os
+  Dijkstras de landmarks a cada arranque
+"""
+
+import hashlib
+import math
+import os
+import tempfile
+from array import array
+from functools import cached_property
+from operator import itemgetter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .routing import (
+    LANDMARK_COUNT, REACHABILITY_CACHE_SIZE, LandmarkTable, ReachabilityIndex, RouteCache
+)
+
+LANDMARK_CACHE_DIR = os.path.join('.cache', 'landmarks')  # Pasta por omissao da cache de landmarks
+LANDMARK_CACHE_FILES = 8  # Ficheiros de landmarks mantidos por pasta de cache (os mais recentes)
+LANDMARK_CACHE_MIN_NODES = 2000  # Redes menores: calcular e mais rapido do que ler o ficheiro
+
+
+def _int_array(values) -> array:
+    """array('i') com o conteudo de um array NumPy (copia binaria, sem ciclo Python)"""
+    return array('i', np.ascontiguousarray(values, dtype=np.intc).tobytes())
+
+
+def _float_array(values) -> array:
+    """array('d') com o conteudo de um array NumPy"""
+    return array('d', np.ascontiguousarray(values, dtype=np.float64).tobytes())
+
+
+class CSRGraph:
+    """Grafo dirigido indexado por inteiros em formato CSR
+
+    Os vizinhos do no i ocupam as posicoes offsets[i]..offsets[i+1]-1 dos
+    arrays targets/edge_ids/weights/distances/speed_limits/road_types. Os
+    dicionarios positions, edges, adjacency, predecessors e edge_index sao
+    vistas de compatibilidade construidas no primeiro acesso, uma unica vez,
+    e partilhadas (nao devem ser alteradas).
+    """
+
+    def __init__(self, node_ids: List[str], xs, ys, edge_list):
+        """
+        Args:
+            node_ids: IDs dos nos (a posicao na lista e o indice inteiro)
+            xs, ys: Coordenadas dos nos (mesma ordem de node_ids)
+            edge_list: Lista de (edge_id, from_id, to_id, weight, distance, speed_limit[, road_type])
+        """
+        self.node_ids = list(node_ids)
+        self.node_index: Dict[str, int] = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        self.xs = array('d', xs)
+        self.ys = array('d', ys)
+
+        num_nodes = len(self.node_ids)
+        num_edges = len(edge_list)
+        node_index = self.node_index
+
+        # Colunas da lista de arestas (itemgetter: ciclos em C, sem geradores Python)
+        edge_ids, from_ids, to_ids = (list(map(itemgetter(column), edge_list)) for column in range(3))
+        sources = np.fromiter(map(node_index.__getitem__, from_ids), dtype=np.intc, count=num_edges)
+        targets = np.fromiter(map(node_index.__getitem__, to_ids), dtype=np.intc, count=num_edges)
+        weights, distances, speed_limits = (
+            np.fromiter(map(itemgetter(column), edge_list), dtype=np.float64, count=num_edges) for column in range(3, 6)
+        )
+        if min(map(len, edge_list), default=7) > 6:
+            road_types = list(map(itemgetter(6), edge_list))
+        else:
+            road_types = [edge[6] if len(edge) > 6 else None for edge in edge_list]
+
+        # Ordem CSR: por no de origem e, dentro do no, por edge_id (ordenacao estavel em duas passagens)
+        by_id = np.array(sorted(range(num_edges), key=edge_ids.__getitem__), dtype=np.intp)
+        order = by_id[np.argsort(sources[by_id], kind='stable')]
+
+        # Contagem de arestas por no -> offsets
+        offsets = np.zeros(num_nodes + 1, dtype=np.intc)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+        self.offsets = _int_array(offsets)
+
+        self.sources = _int_array(sources[order])
+        self.targets = _int_array(targets[order])
+        order = order.tolist()
+        self.edge_ids = list(map(edge_ids.__getitem__, order))
+        self.weights = _float_array(weights[order])
+        self.distances = _float_array(distances[order])
+        self.speed_limits = _float_array(speed_limits[order])
+        self.road_types = list(map(road_types.__getitem__, order))
+        self.edge_slot: Dict[object, int] = {edge_id: slot for slot, edge_id in enumerate(self.edge_ids)}
+
+        # Menor custo por pixel (escala de heuristica admissivel)
+        positive = distances > 0
+        self.min_cost_per_pixel = float((weights[positive] / distances[positive]).min()) if positive.any() else 0.0
+
+        self.landmarks: Optional[LandmarkTable] = None  # Preenchido por build_landmarks()
+        self._reachability: Dict[frozenset, ReachabilityIndex] = {}  # {bloqueios: indice}
+
+    @classmethod
+    def from_network(cls, nodes, edges):
+        """Constroi o grafo a partir de {node_id: (x, y)} e {edge_id: {'from', 'to', 'weight'}}"""
+        node_ids = list(nodes.keys())
+        xs = [nodes[node_id][0] for node_id in node_ids]
+        ys = [nodes[node_id][1] for node_id in node_ids]
+        edge_list = []
+        for edge_id, edge in edges.items():
+            from_pos = nodes[edge['from']]
+            to_pos = nodes[edge['to']]
+            distance = edge.get('distance')
+            if distance is None:
+                distance = math.hypot(to_pos[0] - from_pos[0], to_pos[1] - from_pos[1])
+            edge_list.append((
+                edge_id, edge['from'], edge['to'],
+                edge.get('weight', 100.0), distance, edge.get('speed_limit', 0), edge.get('type')
+            ))
+        return cls(node_ids, xs, ys, edge_list)
+
+    @cached_property
+    def positions(self) -> Dict[str, Tuple[float, float]]:
+        return {node_id: (self.xs[i], self.ys[i]) for i, node_id in enumerate(self.node_ids)}
+
+    @cached_property
+    def edges(self) -> Dict[object, dict]:
+        return {
+            self.edge_ids[slot]: {
+                'from': self.node_ids[self.sources[slot]],
+                'to': self.node_ids[self.targets[slot]],
+                'weight': self.weights[slot]
+            }
+            for slot in range(len(self.edge_ids))
+        }
+
+    @cached_property
+    def adjacency(self) -> Dict[str, List[Tuple[str, object]]]:
+        return {
+            node_id: [
+                (self.node_ids[self.targets[slot]], self.edge_ids[slot])
+                for slot in range(self.offsets[i], self.offsets[i + 1])
+            ]
+            for i, node_id in enumerate(self.node_ids)
+        }
+
+    @cached_property
+    def predecessors(self) -> Dict[str, List[Tuple[str, object]]]:
+        predecessors = {node_id: [] for node_id in self.node_ids}
+        for slot in range(len(self.edge_ids)):
+            predecessors[self.node_ids[self.targets[slot]]].append(
+                (self.node_ids[self.sources[slot]], self.edge_ids[slot])
+            )
+        return predecessors
+
+    @cached_property
+    def incoming(self) -> Tuple[array, array]:
+        """CSR inverso (in_offsets, in_slots)
+
+        As posicoes CSR das arestas que chegam ao no i ocupam
+        in_slots[in_offsets[i]..in_offsets[i+1]-1].
+        """
+        targets = np.frombuffer(self.targets, dtype=np.intc)
+        in_offsets = np.zeros(len(self.node_ids) + 1, dtype=np.intc)
+        np.cumsum(np.bincount(targets, minlength=len(self.node_ids)), out=in_offsets[1:])
+        # Ordenacao estavel: dentro de cada no, as arestas ficam pela ordem CSR
+        return _int_array(in_offsets), _int_array(np.argsort(targets, kind='stable'))
+
+    @cached_property
+    def edge_index(self) -> Dict[Tuple[str, str], object]:
+        node_ids = self.node_ids
+        return {
+            (node_ids[source], node_ids[target]): edge_id
+            for source, target, edge_id in zip(self.sources, self.targets, self.edge_ids)
+        }
+
+    @cached_property
+    def light_keys(self) -> List[str]:
+        """Semaforo que controla cada aresta ("<no destino>_<orientacao>")
+
+        Movimento horizontal e controlado pelo semaforo vertical e vice-versa
+        (como no MoveBehaviour).
+        """
+        keys = []
+        for slot in range(len(self.edge_ids)):
+            source, target = self.sources[slot], self.targets[slot]
+            horizontal = abs(self.xs[target] - self.xs[source]) > abs(self.ys[target] - self.ys[source])
+            keys.append(f"{self.node_ids[target]}_{'vertical' if horizontal else 'horizontal'}")
+        return keys
+
+    @cached_property
+    def slots_by_light(self) -> Dict[str, List[int]]:
+        """{chave do semaforo: posicoes CSR das arestas que controla}"""
+        slots = {}
+        for slot, light_key in enumerate(self.light_keys):
+            slots.setdefault(light_key, []).append(slot)
+        return slots
+
+    @cached_property
+    def corner_nodes(self) -> frozenset:
+        """Nos mais proximos dos quatro cantos da caixa envolvente da rede
+
+        Numa grelha sao os cantos exatos; numa rede lida de ficheiro, o no
+        mais proximo de cada canto (desempate pela ordem dos nos).
+        """
+        if not self.node_ids:
+            return frozenset()
+        min_x, max_x = min(self.xs), max(self.xs)
+        min_y, max_y = min(self.ys), max(self.ys)
+        corners = set()
+        for corner_x in (min_x, max_x):
+            for corner_y in (min_y, max_y):
+                nearest = min(
+                    range(len(self.node_ids)),
+                    key=lambda i: (self.xs[i] - corner_x) ** 2 + (self.ys[i] - corner_y) ** 2
+                )
+                corners.add(self.node_ids[nearest])
+        return frozenset(corners)
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_ids)
+
+    @cached_property
+    def fingerprint(self) -> str:
+        """Impressao digital da topologia e dos pesos (chave da cache de landmarks)"""
+        digest = hashlib.sha1()
+        for values in (self.offsets, self.targets, self.weights):
+            digest.update(values.tobytes())
+        return digest.hexdigest()
+
+    def build_landmarks(self, count=LANDMARK_COUNT, cache_dir=None):
+        """Pre-calcula as tabelas ALT (uma vez por rede, partilhadas)
+
+        Com cache_dir (e pelo menos LANDMARK_CACHE_MIN_NODES nos), as tabelas
+        sao lidas de/escritas em cache_dir/landmarks_<fingerprint>_<count>.npz;
+        um ficheiro ilegivel e ignorado e recalculado.
+        """
+        if self.landmarks is None:
+            path = None
+            if cache_dir and self.num_nodes >= LANDMARK_CACHE_MIN_NODES:
+                path = os.path.join(cache_dir, f"landmarks_{self.fingerprint}_{count}.npz")
+                self.landmarks = _load_landmarks(path, self.num_nodes)
+            if self.landmarks is None:
+                self.landmarks = LandmarkTable(self, count)
+                if path is not None:
+                    _save_landmarks(path, self.landmarks)
+        return self.landmarks
+
+    def reachability(self, blocked_edges=()) -> ReachabilityIndex:
+        """Indice de alcancabilidade para um conjunto de bloqueios (memorizado)"""
+        key = frozenset(blocked_edges)
+        index = self._reachability.get(key)
+        if index is None:
+            if len(self._reachability) >= REACHABILITY_CACHE_SIZE:
+                del self._reachability[next(iter(self._reachability))]
+            index = ReachabilityIndex(self, key)
+            self._reachability[key] = index
+        return index
+
+    def find_slot(self, from_node, to_node) -> Optional[int]:
+        """Posicao CSR da aresta from_node -> to_node (None se nao existir)"""
+        source = self.node_index.get(from_node)
+        target = self.node_index.get(to_node)
+        if source is None or target is None:
+            return None
+        for slot in range(self.offsets[source], self.offsets[source + 1]):
+            if self.targets[slot] == target:
+                return slot
+        return None
+
+    def edge_weight(self, edge_id, default=100.0):
+        """Peso base de uma aresta pelo seu ID"""
+        slot = self.edge_slot.get(edge_id)
+        return default if slot is None else self.weights[slot]
+
+
+def _load_landmarks(path, num_nodes) -> Optional[LandmarkTable]:
+    """Le as tabelas ALT guardadas (None se nao existirem ou nao servirem)"""
+    try:
+        with np.load(path) as data:
+            landmarks, dist_from, dist_to = data['landmarks'], data['dist_from'], data['dist_to']
+    except (OSError, ValueError, KeyError):
+        return None
+    if dist_from.shape != dist_to.shape or dist_from.shape != (len(landmarks), num_nodes):
+        return None
+    os.utime(path)  # Usado agora: fica entre os mais recentes da pasta
+    return LandmarkTable.from_tables(landmarks.tolist(), dist_from.tolist(), dist_to.tolist())
+
+
+def _save_landmarks(path, table: LandmarkTable) -> None:
+    """Escreve as tabelas ALT (atomico) e apaga os ficheiros mais antigos da pasta"""
+    if not table.landmarks:
+        return
+    cache_dir = os.path.dirname(path) or '.'
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            np.savez(
+                handle,
+                landmarks=np.array(table.landmarks, dtype=np.intc),
+                dist_from=np.array(table.dist_from, dtype=np.float64),
+                dist_to=np.array(table.dist_to, dtype=np.float64)
+            )
+        os.replace(tmp_path, path)
+        tmp_path = None
+        cached = sorted(
+            (
+                entry for entry in os.scandir(cache_dir)
+                if entry.name.startswith('landmarks_') and entry.name.endswith('.npz')
+            ),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in cached[:-LANDMARK_CACHE_FILES]:
+            os.remove(entry.path)
+    except OSError as e:
+        print(f"⚠️ Cache de landmarks nao escrita ({path}): {e}")
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# Registo por processo: {network_id: CSRGraph} e {network_id: RouteCache}
+_SHARED_GRAPHS: Dict[str, CSRGraph] = {}
+_ROUTE_CACHES: Dict[str, RouteCache] = {}
+
+
+def register_shared_graph(road_graph: CSRGraph, network_id: Optional[str] = None) -> str:
+    """Regista o grafo para ser reutilizado por todos os agentes do processo"""
+    if network_id is None:
+        network_id = f"net_{id(road_graph):x}"
+    _SHARED_GRAPHS[network_id] = road_graph
+    return network_id
+
+
+def get_shared_graph(network_id) -> Optional[CSRGraph]:
+    """Devolve o grafo registado neste processo (ou None)"""
+    if network_id is None:
+        return None
+    return _SHARED_GRAPHS.get(network_id)
+
+
+def register_route_cache(network_id, route_cache: RouteCache) -> None:
+    """Publica a cache de rotas de uma rede para os agentes do processo"""
+    _ROUTE_CACHES[network_id] = route_cache
+
+
+def get_route_cache(network_id) -> Optional[RouteCache]:
+    """Devolve a cache de rotas registada para a rede (ou None)"""
+    if network_id is None:
+        return None
+    return _ROUTE_CACHES.get(network_id)
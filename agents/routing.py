@@ -0,0 +1,817 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estruturas de roteamento partilhadas pelos agentes
+- build_edge_index: indice (from, to) -> edge_id para consultas O(1)
+- LandmarkTable: heuristica ALT (landmarks + desigualdade triangular)
+- RouteCache: cache LRU de rotas por (origem, destino, versao da rede,
+  perfil de custo do veiculo)
+- ReachabilityIndex: componentes fortemente conexas sem as arestas
+  bloqueadas, para responder "o destino e alcancavel?" sem pesquisar a rede
+- LightSchedule: calendario deterministico de fases de um semaforo, para
+  prever a espera no instante de chegada (roteamento dependente do tempo)
+- EdgeCostModel: funcao de custo unica das arestas (peso base, trafego e
+  semaforos), usada por todos os planeadores e pelas metricas de custo
+- shortest_path_trees / tree_next_hops / tree_route: roteamento em lote
+  (uma arvore -> destino por grupo, Dijkstra sobre as arestas de chegada
+  que para quando os nos das rotas do grupo ficam fixados; cada grupo de
+  veiculos recebe apenas o recorte da arvore que lhe interessa)
+- DStarLitePlanner: planeador incremental (D* Lite) que repara rotas
+  apos alteracoes de custo/bloqueio sem refazer a pesquisa completa
+"""
+
+import heapq
+import math
+from array import array
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .lru_cache import LRUCache
+
+
+INF = float('inf')
+
+LANDMARK_COUNT = 8  # Numero de landmarks por rede (limitado ao numero de nos)
+ROUTE_CACHE_CAPACITY = 512  # Entradas maximas na cache de rotas
+REACHABILITY_CACHE_SIZE = 4  # Indices de alcancabilidade memorizados por grafo
+REACHABILITY_MEMO_SIZE = 4096  # Pares de componentes memorizados por indice
+TRAFFIC_DELAY_COST = 5  # Custo por unidade de atraso reportado numa aresta
+SEMAPHORE_WAIT_COST = 40.0  # Custo por segundo de espera prevista num semaforo
+RED_LIGHT_PENALTY = 200  # Semaforo sem calendario publicado: custo pelo estado conhecido
+YELLOW_LIGHT_PENALTY = 50
+
+
+def build_edge_index(graph) -> Dict[Tuple[str, str], object]:
+    """Constroi indice {(from_node, to_node): edge_id} a partir do grafo de adjacencia"""
+    edge_index = {}
+    for from_node, neighbors in graph.items():
+        for to_node, edge_id in neighbors:
+            edge_index[(from_node, to_node)] = edge_id
+    return edge_index
+
+
+def _csr_dijkstra(num_nodes, offsets, targets, weights, source):
+    """Dijkstra de um no para todos sobre arrays CSR (pesos base)"""
+    dist = [INF] * num_nodes
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        for slot in range(offsets[node], offsets[node + 1]):
+            neighbor = targets[slot]
+            nd = d + weights[slot]
+            if nd < dist[neighbor]:
+                dist[neighbor] = nd
+                heapq.heappush(heap, (nd, neighbor))
+    return dist
+
+
+class LandmarkTable:
+    """Tabelas de distancias de/para landmarks (heuristica ALT)
+
+    As distancias sao calculadas com os pesos base, por isso o limite
+    inferior continua admissivel quando bloqueios ou penalidades apenas
+    aumentam os custos.
+    """
+
+    def __init__(self, road_graph, count=LANDMARK_COUNT):
+        num_nodes = road_graph.num_nodes
+        offsets, targets, weights = road_graph.offsets, road_graph.targets, road_graph.weights
+
+        # CSR inverso (arestas de chegada) para distancias ate ao landmark
+        rev_offsets, in_slots = road_graph.incoming
+        rev_targets = array('i', [road_graph.sources[slot] for slot in in_slots])
+        rev_weights = array('d', [weights[slot] for slot in in_slots])
+
+        self.landmarks: List[int] = []
+        self.dist_from: List[List[float]] = []  # d(landmark, v)
+        self.dist_to: List[List[float]] = []    # d(v, landmark)
+        if num_nodes == 0:
+            return
+
+        # Selecao "farthest": cada landmark maximiza a distancia aos anteriores
+        min_dist = _csr_dijkstra(num_nodes, offsets, targets, weights, 0)
+        chosen = set()
+        for _ in range(min(count, num_nodes)):
+            candidates = [i for i in range(num_nodes) if min_dist[i] < INF and i not in chosen]
+            if not candidates:
+                break
+            landmark = max(candidates, key=min_dist.__getitem__)
+            dist_from = _csr_dijkstra(num_nodes, offsets, targets, weights, landmark)
+            dist_to = _csr_dijkstra(num_nodes, rev_offsets, rev_targets, rev_weights, landmark)
+            self.landmarks.append(landmark)
+            chosen.add(landmark)
+            self.dist_from.append(dist_from)
+            self.dist_to.append(dist_to)
+            if len(self.landmarks) == 1:
+                min_dist = list(dist_from)
+            else:
+                min_dist = list(map(min, min_dist, dist_from))
+
+    @classmethod
+    def from_tables(cls, landmarks, dist_from, dist_to):
+        """Tabela a partir de distancias ja calculadas (cache em disco)"""
+        table = cls.__new__(cls)
+        table.landmarks = list(landmarks)
+        table.dist_from = [list(row) for row in dist_from]
+        table.dist_to = [list(row) for row in dist_to]
+        return table
+
+    def lower_bound(self, a_idx, b_idx):
+        """Limite inferior de d(a, b) pela desigualdade triangular"""
+        best = 0.0
+        for dist_from, dist_to in zip(self.dist_from, self.dist_to):
+            from_a, from_b = dist_from[a_idx], dist_from[b_idx]
+            if from_a < INF and from_b < INF and from_b - from_a > best:
+                best = from_b - from_a
+            to_a, to_b = dist_to[a_idx], dist_to[b_idx]
+            if to_a < INF and to_b < INF and to_a - to_b > best:
+                best = to_a - to_b
+        return best
+
+    def heuristic_to(self, goal_idx):
+        """Devolve h(v) = limite inferior de d(v, goal) com as colunas do destino pre-lidas"""
+        columns = [
+            (dist_from, dist_from[goal_idx], dist_to, dist_to[goal_idx])
+            for dist_from, dist_to in zip(self.dist_from, self.dist_to)
+        ]
+
+        def heuristic(node_idx):
+            best = 0.0
+            for dist_from, from_goal, dist_to, to_goal in columns:
+                from_node = dist_from[node_idx]
+                if from_goal < INF and from_node < INF and from_goal - from_node > best:
+                    best = from_goal - from_node
+                to_node = dist_to[node_idx]
+                if to_node < INF and to_goal < INF and to_node - to_goal > best:
+                    best = to_node - to_goal
+            return best
+
+        return heuristic
+
+
+class RouteCache:
+    """Cache LRU de rotas partilhada, chaveada por (origem, destino, versao, perfil)
+
+    A versao e incrementada pelo dono da cache (coordenador) sempre que a
+    rede muda de forma relevante; entradas de versoes antigas deixam de
+    ser encontradas e sao descartadas. O perfil identifica tudo o resto de
+    que o custo depende (classe do veiculo, velocidade, instante de partida
+    quando ha calendarios de semaforos): so veiculos com o mesmo perfil
+    partilham rotas.
+    """
+
+    def __init__(self, capacity=ROUTE_CACHE_CAPACITY):
+        self.version = 0
+        # {(origem, destino, versao, perfil): (rota, custos)}
+        self._entries = LRUCache(capacity)
+
+    @property
+    def hits(self):
+        return self._entries.hits
+
+    @property
+    def misses(self):
+        return self._entries.misses
+
+    @property
+    def evictions(self):
+        return self._entries.evictions
+
+    def get(self, origin, destination, version, profile=()):
+        """Devolve (rota, custos) ou None"""
+        return self._entries.get((origin, destination, version, profile))
+
+    def put(self, origin, destination, version, route, costs, profile=()):
+        """Guarda uma rota calculada (ignorada se a versao ja estiver ultrapassada)"""
+        if version < self.version:
+            return
+        self._entries.put((origin, destination, version, profile), (tuple(route), dict(costs)))
+
+    def bump_version(self):
+        """Invalida todas as rotas em cache (nova versao da rede)"""
+        self.version += 1
+        self._entries.clear()
+        return self.version
+
+    def stats(self):
+        """Contadores para exportar para o dashboard"""
+        return dict(self._entries.stats(), version=self.version)
+
+
+class LightSchedule:
+    """Ciclo de fases de um semaforo (verde -> amarelo -> vermelho)
+
+    As duracoes sao em ticks do LightCycleBehaviour (tick segundos cada). O
+    calendario e ancorado num instante conhecido: fase e ticks restantes.
+    """
+
+    PHASES = ('green', 'yellow', 'red')
+
+    def __init__(self, green_time, yellow_time, red_time, tick, state, remaining, anchor_time):
+        self.durations = {'green': green_time, 'yellow': yellow_time, 'red': red_time}
+        self.tick = tick
+        self.cycle = green_time + yellow_time + red_time
+        self.period = self.cycle * tick  # Duracao (s) de um ciclo completo
+        self.anchor(state, remaining, anchor_time)
+
+    @classmethod
+    def from_message(cls, data):
+        """Constroi o calendario a partir de uma mensagem light_schedule"""
+        return cls(
+            data['green_time'], data['yellow_time'], data['red_time'], data['tick'],
+            data['state'], data['timer'], data['timestamp']
+        )
+
+    @property
+    def plan(self):
+        """Plano de fases (duracoes e tick), sem a ancora"""
+        return (self.durations['green'], self.durations['yellow'], self.durations['red'], self.tick)
+
+    def anchor(self, state, remaining, anchor_time):
+        """Re-ancora o calendario: `state` com `remaining` ticks em anchor_time"""
+        start = 0
+        for phase in self.PHASES:
+            if phase == state:
+                break
+            start += self.durations[phase]
+        duration = self.durations.get(state, 0)
+        self._offset = start + duration - min(max(remaining, 0), duration)
+        self.anchor_time = anchor_time
+
+    def _position(self, at_time):
+        """Posicao no ciclo (ticks desde o inicio do verde) no instante dado"""
+        if self.cycle <= 0:
+            return 0.0
+        return (self._offset + (at_time - self.anchor_time) / self.tick) % self.cycle
+
+    def state_at(self, at_time):
+        """Fase prevista no instante dado"""
+        position = self._position(at_time)
+        if position < self.durations['green']:
+            return 'green'
+        if position < self.durations['green'] + self.durations['yellow']:
+            return 'yellow'
+        return 'red'
+
+    def remaining_at(self, at_time):
+        """Tempo (s) ate ao fim da fase prevista no instante dado"""
+        position = self._position(at_time)
+        phase_end = 0
+        for phase in self.PHASES:
+            phase_end += self.durations[phase]
+            if position < phase_end:
+                break
+        return (phase_end - position) * self.tick
+
+    def wait_at(self, at_time):
+        """Espera prevista (s) ate ao proximo verde para quem chega no instante dado"""
+        position = self._position(at_time)
+        if position < self.durations['green']:
+            return 0.0
+        return (self.cycle - position) * self.tick
+
+
+class EdgeCostModel:
+    """Funcao de custo unica das arestas
+
+    custo = peso base + atraso reportado * TRAFFIC_DELAY_COST + semaforo. O
+    semaforo que controla a direcao do movimento custa a espera prevista no
+    instante de chegada * SEMAPHORE_WAIT_COST (calendario publicado) ou, sem
+    calendario, a penalidade do estado conhecido; ambulancias ignoram-nos.
+
+    O A* propaga o instante de chegada ao longo da pesquisa; as pesquisas
+    estaticas (D* Lite, arvores em lote) avaliam a mesma funcao no instante
+    de partida. Os dicionarios do dono sao lidos por referencia.
+    """
+
+    def __init__(self, road_graph, traffic_reports, light_schedules, light_states, ignore_lights=False):
+        """
+        Args:
+            road_graph: CSRGraph partilhado
+            traffic_reports: {edge_id: reporte com 'delay'}
+            light_schedules: {node_orientation: LightSchedule}
+            light_states: {node_orientation (ou node_id): {'state': ...}} (sem calendario)
+            ignore_lights: True para ambulancias
+        """
+        self.road_graph = road_graph
+        self.traffic_reports = traffic_reports
+        self.light_schedules = light_schedules
+        self.light_states = light_states
+        self.ignore_lights = ignore_lights
+
+    def traffic(self, edge_id):
+        """Penalidade por trafego reportado na aresta"""
+        report = self.traffic_reports.get(edge_id)
+        if not report:
+            return 0
+        return (report.get('delay') or 0) * TRAFFIC_DELAY_COST
+
+    def semaphore(self, slot, arrival_time):
+        """(penalidade, espera prevista em s) do semaforo no fim da aresta para quem chega em arrival_time"""
+        if self.ignore_lights:
+            return 0.0, 0.0
+        light_key = self.road_graph.light_keys[slot]
+        schedule = self.light_schedules.get(light_key)
+        if schedule is not None:
+            wait = schedule.wait_at(arrival_time)
+            return wait * SEMAPHORE_WAIT_COST, wait
+        node_id = self.road_graph.node_ids[self.road_graph.targets[slot]]
+        for key in (light_key, node_id):
+            light = self.light_states.get(key)
+            if light is None:
+                continue
+            state = light.get('state')
+            if state == 'red':
+                return RED_LIGHT_PENALTY, 0.0
+            if state == 'yellow':
+                return YELLOW_LIGHT_PENALTY, 0.0
+            return 0.0, 0.0
+        return 0.0, 0.0
+
+    def cost(self, slot, arrival_time):
+        """Custo total da aresta (peso base + penalidades)"""
+        return (self.road_graph.weights[slot] + self.traffic(self.road_graph.edge_ids[slot])
+                + self.semaphore(slot, arrival_time)[0])
+
+    def route_costs(self, path, depart_time, px_per_second):
+        """(total, base, trafego, semaforo) de uma rota, propagando o instante de chegada como o A*"""
+        road_graph = self.road_graph
+        arrival = depart_time
+        base = traffic = semaphore = 0.0
+        for from_node, to_node in zip(path, path[1:]):
+            slot = road_graph.find_slot(from_node, to_node)
+            if slot is None:
+                continue
+            arrival += road_graph.distances[slot] / px_per_second
+            penalty, wait = self.semaphore(slot, arrival)
+            arrival += wait
+            base += road_graph.weights[slot]
+            traffic += self.traffic(road_graph.edge_ids[slot])
+            semaphore += penalty
+        return base + traffic + semaphore, base, traffic, semaphore
+
+    def slot_costs(self, at_time):
+        """Custos de todas as arestas (por posicao CSR) no instante dado
+
+        So as arestas com trafego reportado ou que entram num semaforo
+        conhecido sao avaliadas individualmente.
+        """
+        road_graph = self.road_graph
+        costs = list(road_graph.weights)
+        for edge_id in self.traffic_reports:
+            slot = road_graph.edge_slot.get(edge_id)
+            if slot is not None:
+                costs[slot] += self.traffic(edge_id)
+        if not self.ignore_lights:
+            light_slots = set()
+            for key in set(self.light_schedules) | set(self.light_states):
+                if key in road_graph.slots_by_light:
+                    light_slots.update(road_graph.slots_by_light[key])
+                elif key in road_graph.node_index:
+                    for orientation in ('horizontal', 'vertical'):
+                        light_slots.update(road_graph.slots_by_light.get(f"{key}_{orientation}", ()))
+            for slot in light_slots:
+                costs[slot] += self.semaphore(slot, at_time)[0]
+        return costs
+
+
+def _strongly_connected_components(num_nodes, offsets, targets, skip_slots):
+    """Tarjan iterativo sobre arrays CSR, ignorando as posicoes em skip_slots
+
+    As componentes sao numeradas em ordem topologica inversa: todas as
+    componentes alcancaveis a partir de c tem numero <= c.
+
+    Returns:
+        (component, num_components) com component[i] = componente do no i
+    """
+    index = [-1] * num_nodes
+    low = [0] * num_nodes
+    on_stack = [False] * num_nodes
+    component = [-1] * num_nodes
+    stack = []
+    counter = 0
+    num_components = 0
+
+    for root in range(num_nodes):
+        if index[root] != -1:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, offsets[root])]
+
+        while work:
+            node, slot = work[-1]
+            end = offsets[node + 1]
+            descended = False
+            while slot < end:
+                current_slot = slot
+                slot += 1
+                if current_slot in skip_slots:
+                    continue
+                target = targets[current_slot]
+                if index[target] == -1:
+                    work[-1] = (node, slot)
+                    index[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, offsets[target]))
+                    descended = True
+                    break
+                if on_stack[target] and index[target] < low[node]:
+                    low[node] = index[target]
+            if descended:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component[member] = num_components
+                    if member == node:
+                        break
+                num_components += 1
+
+    return component, num_components
+
+
+class ReachabilityIndex:
+    """Alcancabilidade dirigida da rede com um conjunto de arestas bloqueadas
+
+    Calcula as componentes fortemente conexas (Tarjan, O(V + E)) e guarda o
+    grafo condensado em CSR, sem duplicados. Nos na mesma componente (o caso
+    comum numa rede viaria) respondem em O(1); entre componentes, a consulta
+    percorre o grafo condensado a partir da origem, podando as componentes
+    que pela ordem topologica ja nao podem chegar ao destino, e o resultado
+    fica memorizado (no maximo REACHABILITY_MEMO_SIZE pares). A memoria e
+    O(V + E) por indice, em vez de um bitset de C bits por componente.
+
+    O indice e reconstruido por inteiro para cada conjunto de bloqueios (o
+    CSRGraph memoriza os ultimos REACHABILITY_CACHE_SIZE) e partilhado pelos
+    veiculos; uma disrupcao muda o conjunto uma vez, nao a cada tick.
+    """
+
+    def __init__(self, road_graph, blocked_edges=()):
+        self.node_index = road_graph.node_index
+        self.blocked_edges = frozenset(blocked_edges)
+        offsets = road_graph.offsets
+        targets = road_graph.targets
+        skip_slots = {road_graph.edge_slot[e] for e in self.blocked_edges if e in road_graph.edge_slot}
+
+        self.component, self.num_components = _strongly_connected_components(
+            road_graph.num_nodes, offsets, targets, skip_slots
+        )
+
+        # Grafo condensado: sucessores distintos de cada componente
+        successors = [set() for _ in range(self.num_components)]
+        component = self.component
+        for node_idx in range(road_graph.num_nodes):
+            comp = component[node_idx]
+            for slot in range(offsets[node_idx], offsets[node_idx + 1]):
+                if slot not in skip_slots and component[targets[slot]] != comp:
+                    successors[comp].add(component[targets[slot]])
+        self.dag_offsets = [0]
+        self.dag_targets = []
+        for comp_successors in successors:
+            self.dag_targets.extend(comp_successors)
+            self.dag_offsets.append(len(self.dag_targets))
+        self._memo = LRUCache(REACHABILITY_MEMO_SIZE)  # {(componente, componente): alcancavel}
+
+    def reachable(self, start, goal) -> bool:
+        """True se existe caminho start -> goal (nos desconhecidos: True)"""
+        a = self.node_index.get(start)
+        b = self.node_index.get(goal)
+        if a is None or b is None:
+            return True
+        return self.components_reachable(self.component[a], self.component[b])
+
+    def components_reachable(self, source, target) -> bool:
+        """Alcancabilidade entre componentes no grafo condensado (memorizada)"""
+        if source == target:
+            return True
+        # Numeracao topologica inversa: so componentes >= target chegam a target
+        if target > source:
+            return False
+        key = (source, target)
+        found = self._memo.get(key)
+        if found is not None:
+            return found
+
+        found = False
+        seen = {source}
+        stack = [source]
+        while stack and not found:
+            comp = stack.pop()
+            for i in range(self.dag_offsets[comp], self.dag_offsets[comp + 1]):
+                succ = self.dag_targets[i]
+                if succ == target:
+                    found = True
+                    break
+                if succ > target and succ not in seen:
+                    seen.add(succ)
+                    stack.append(succ)
+
+        self._memo.put(key, found)
+        return found
+
+
+def shortest_path_trees(road_graph, destinations, blocked_edges=(), costs=None, starts=None):
+    """Arvores de caminhos mais curtos (nos -> destino) em lote
+
+    Um Dijkstra por destino sobre as arestas de chegada (CSRGraph.incoming),
+    com os custos por aresta e as arestas bloqueadas com custo infinito.
+    Com starts, a pesquisa de cada destino para assim que os seus nos de
+    partida ficam fixados: o trabalho e limitado a regiao que os grupos
+    atravessam, nao a rede inteira.
+
+    Args:
+        costs: Custo por posicao CSR (EdgeCostModel.slot_costs); None = pesos base
+        starts: {destination: nos de partida}; None = arvores completas
+
+    Returns:
+        {destination: (dist, next_hop)} com listas indexadas por no;
+        next_hop[i] e o indice do proximo no (-1 no destino, se inalcancavel
+        ou fora da regiao pesquisada).
+    """
+    if road_graph is None:
+        return {}
+    dest_ids = [d for d in dict.fromkeys(destinations) if d in road_graph.node_index]
+    if not dest_ids or road_graph.num_edges == 0:
+        return {}
+
+    costs = list(road_graph.weights) if costs is None else list(costs)
+    for edge_id in blocked_edges:
+        slot = road_graph.edge_slot.get(edge_id)
+        if slot is not None:
+            costs[slot] = INF
+
+    node_index = road_graph.node_index
+    trees = {}
+    for destination in dest_ids:
+        pending = None
+        if starts is not None:
+            pending = {node_index[n] for n in starts.get(destination, ()) if n in node_index}
+        trees[destination] = _tree_to(road_graph, node_index[destination], costs, pending)
+    return trees
+
+
+def _tree_to(road_graph, destination, costs, pending):
+    """Dijkstra do destino para tras; para quando os nos em pending estao fixados"""
+    num_nodes = road_graph.num_nodes
+    in_offsets, in_slots = road_graph.incoming
+    sources = road_graph.sources
+    dist = [INF] * num_nodes
+    next_hop = [-1] * num_nodes
+    dist[destination] = 0.0
+    if pending is not None:
+        pending.discard(destination)
+        if not pending:
+            return dist, next_hop
+    heap = [(0.0, destination)]
+    while heap:
+        d, node = heapq.heappop(heap)
+        if d > dist[node]:
+            continue
+        if pending is not None:
+            pending.discard(node)
+            if not pending:
+                break
+        for i in range(in_offsets[node], in_offsets[node + 1]):
+            slot = in_slots[i]
+            previous = sources[slot]
+            nd = d + costs[slot]
+            if nd < dist[previous]:
+                dist[previous] = nd
+                next_hop[previous] = node
+                heapq.heappush(heap, (nd, previous))
+    return dist, next_hop
+
+
+def tree_next_hops(road_graph, next_hop, starts) -> Dict[str, str]:
+    """Recorte de uma arvore: {no: proximo no} so nos caminhos a partir de starts
+
+    Evita enviar o array completo (um salto por no da rede) aos veiculos.
+    """
+    node_ids = road_graph.node_ids
+    hops = {}
+    for start in starts:
+        current = road_graph.node_index.get(start)
+        while current is not None and node_ids[current] not in hops:
+            following = int(next_hop[current])
+            if following < 0:
+                break
+            hops[node_ids[current]] = node_ids[following]
+            current = following
+    return hops
+
+
+def tree_route(next_hops, start, destination) -> List[str]:
+    """Extrai a rota start -> destination de um recorte {no: proximo no}"""
+    path = [start]
+    current = start
+    for _ in range(len(next_hops) + 1):
+        if current == destination:
+            return path
+        current = next_hops.get(current)
+        if current is None:
+            return []
+        path.append(current)
+    return []
+
+
+class DStarLitePlanner:
+    """Planeador D* Lite para um destino fixo
+
+    A pesquisa e feita do destino para a origem, por isso a origem (posicao
+    atual do veiculo) pode mudar entre chamadas sem invalidar o estado.
+    Quando arestas mudam de custo (ex: bloqueios), apenas os vertices
+    afetados sao reavaliados. Os custos memorizados incluem penalidades de
+    trafego e semaforos: refresh_costs() reavalia-os antes de cada reparacao.
+    """
+
+    def __init__(self, road_graph, goal, edge_cost: Callable[[str, str, object], float]):
+        """
+        Args:
+            road_graph: CSRGraph partilhado (adjacencia, predecessores, posicoes)
+            goal: No de destino
+            edge_cost: Funcao (from_node, to_node, edge_id) -> custo (inf se bloqueada)
+        """
+        self.road_graph = road_graph
+        self.graph = road_graph.adjacency
+        self.predecessors = road_graph.predecessors  # A pesquisa corre no sentido inverso
+        self.nodes = road_graph.positions
+        self.goal = goal
+        self.edge_cost = edge_cost
+
+        # Escala da heuristica: menor custo por pixel garante admissibilidade
+        self.heuristic_scale = road_graph.min_cost_per_pixel
+        self.node_index = road_graph.node_index
+        self.landmarks = road_graph.landmarks  # LandmarkTable (ou None)
+
+        self.g: Dict[str, float] = {}
+        self.rhs: Dict[str, float] = {goal: 0.0}
+        self.km = 0.0
+        self.last_start: Optional[str] = None
+        self.cost_cache: Dict[object, float] = {}  # Custos usados na pesquisa {edge_id: custo}
+        self.pending_edges = set()  # Arestas alteradas ainda nao processadas
+        self.path_cost = INF
+        self.expanded = 0  # Vertices expandidos na ultima chamada a plan()
+
+        self._open: Dict[str, Tuple[float, float]] = {}
+        self._heap: List[Tuple[Tuple[float, float], str]] = []
+        self._start: Optional[str] = None
+
+    def heuristic(self, node1, node2):
+        """Maximo entre ALT e distancia euclidiana escalada (admissivel e consistente)"""
+        x1, y1 = self.nodes[node1]
+        x2, y2 = self.nodes[node2]
+        estimate = math.hypot(x2 - x1, y2 - y1) * self.heuristic_scale
+        if self.landmarks is not None:
+            estimate = max(estimate, self.landmarks.lower_bound(self.node_index[node1], self.node_index[node2]))
+        return estimate
+
+    def _cost(self, from_node, to_node, edge_id):
+        cost = self.cost_cache.get(edge_id)
+        if cost is None:
+            cost = self.edge_cost(from_node, to_node, edge_id)
+            self.cost_cache[edge_id] = cost
+        return cost
+
+    def _calculate_key(self, node):
+        g_rhs = min(self.g.get(node, INF), self.rhs.get(node, INF))
+        return (g_rhs + self.heuristic(self._start, node) + self.km, g_rhs)
+
+    def _push(self, node):
+        key = self._calculate_key(node)
+        self._open[node] = key
+        heapq.heappush(self._heap, (key, node))
+
+    def _top_key(self):
+        while self._heap:
+            key, node = self._heap[0]
+            if self._open.get(node) == key:
+                return key
+            heapq.heappop(self._heap)  # Entrada obsoleta
+        return (INF, INF)
+
+    def _update_vertex(self, node):
+        if node != self.goal:
+            best = INF
+            for neighbor, edge_id in self.graph.get(node, []):
+                cost = self._cost(node, neighbor, edge_id)
+                if cost < INF:
+                    best = min(best, cost + self.g.get(neighbor, INF))
+            self.rhs[node] = best
+        self._open.pop(node, None)
+        if self.g.get(node, INF) != self.rhs.get(node, INF):
+            self._push(node)
+
+    def update_edges(self, edge_ids: Iterable):
+        """Regista arestas cujo custo mudou (processadas no proximo plan)"""
+        self.pending_edges.update(edge_ids)
+
+    def refresh_costs(self):
+        """Reavalia no proximo plan todos os custos memorizados
+
+        Trafego e semaforos mudam sem aviso ao planeador; so os vertices
+        cujas arestas mudaram efetivamente de custo sao atualizados.
+        """
+        self.pending_edges.update(self.cost_cache)
+
+    def _apply_pending_edges(self):
+        road_graph = self.road_graph
+        for edge_id in self.pending_edges:
+            slot = road_graph.edge_slot.get(edge_id)
+            if slot is None:
+                continue
+            from_node = road_graph.node_ids[road_graph.sources[slot]]
+            to_node = road_graph.node_ids[road_graph.targets[slot]]
+            old_cost = self.cost_cache.pop(edge_id, None)
+            new_cost = self._cost(from_node, to_node, edge_id)
+            if old_cost != new_cost:
+                self._update_vertex(from_node)
+        self.pending_edges.clear()
+
+    def _compute_shortest_path(self):
+        start = self._start
+        while True:
+            top_key = self._top_key()
+            if not self._heap:
+                break
+            if (top_key >= self._calculate_key(start)
+                    and self.rhs.get(start, INF) == self.g.get(start, INF)):
+                break
+            k_old, node = heapq.heappop(self._heap)
+            del self._open[node]
+            self.expanded += 1
+            k_new = self._calculate_key(node)
+            g_node = self.g.get(node, INF)
+            rhs_node = self.rhs.get(node, INF)
+            if k_old < k_new:
+                self._push(node)
+            elif g_node > rhs_node:
+                self.g[node] = rhs_node
+                for pred, _edge_id in self.predecessors.get(node, []):
+                    self._update_vertex(pred)
+            else:
+                self.g[node] = INF
+                self._update_vertex(node)
+                for pred, _edge_id in self.predecessors.get(node, []):
+                    self._update_vertex(pred)
+
+    def plan(self, start) -> List[str]:
+        """Calcula (ou repara) a rota de start ate ao destino
+
+        Returns:
+            Lista de nos [start, ..., goal] ou [] se nao houver caminho
+        """
+        if start not in self.graph or self.goal not in self.graph:
+            return []
+
+        self.expanded = 0
+        self._start = start
+        if self.last_start is None:
+            self.last_start = start
+            self._push(self.goal)
+        elif start != self.last_start:
+            self.km += self.heuristic(self.last_start, start)
+            self.last_start = start
+
+        if self.pending_edges:
+            self._apply_pending_edges()
+
+        self._compute_shortest_path()
+        return self._extract_path(start)
+
+    def _extract_path(self, start):
+        self.path_cost = self.g.get(start, INF)
+        if self.path_cost == INF:
+            return []
+
+        path = [start]
+        current = start
+        visited = {start}
+        while current != self.goal:
+            best_node = None
+            best_value = INF
+            for neighbor, edge_id in self.graph.get(current, []):
+                cost = self._cost(current, neighbor, edge_id)
+                value = cost + self.g.get(neighbor, INF)
+                if value < best_value:
+                    best_value = value
+                    best_node = neighbor
+            if best_node is None or best_node in visited:
+                return []
+            visited.add(best_node)
+            path.append(best_node)
+            current = best_node
+        return path
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cenarios reprodutiveis da simulacao (ficheiros JSON)
+- Scenario: rede (grelha ou ficheiros, pesos), semaforos (nos e planos),
+  frota e disrupcoes agendadas, com uma semente global
+- add_scenario_arguments / scenario_from_args: opcoes de linha de comandos
+  do cenario e da rede (partilhadas pela simulacao e pelo provisionamento)
+- Valores omitidos no ficheiro sao sorteados com um random.Random(seed) e
+  registados, pelo que save() escreve o cenario completamente resolvido (os
+  pesos sorteados das ruas so sao registados com record_weights, ver
+  edge_weight: numa rede grande seriam uma entrada por rua)
+
+Formato (todas as secoes sao opcionais):
+    {
+      "name": "default",
+      "seed": 42,
+      "network": {"type": "grid", "size": 6, "spacing": 200,
+                  "weight_jitter": [0.8, 1.5], "weights": {"0_0|0_1": 6.1}},
+      "lights": {"nodes": ["1_1", ...], "green": [5, 12], "red": [5, 10],
+                 "yellow": [1, 2], "plans": {"1_1_horizontal": {"green": 8, "red": 6, "yellow": 1}}},
+      "fleet": {"cars": 10, "ambulances": 4, "journey": {"from": "0_0", "to": "5_5"},
+                "vehicles": [{"id": "v1", "type": "car", "from": "0_3", "to": "4_1"}, ...]},
+      "disruptions": [{"at": 30, "roads": 3}, {"at": 90, "clear": true}]
+    }
+
+Rede externa: "network": {"type": "file", "nodes": "nodes.csv", "edges": "edges.csv",
+"bidirectional": true} (caminhos relativos ao ficheiro do cenario; ver network_loader).
+Sem "lights.nodes", os semaforos sao sorteados entre os cruzamentos da rede
+("min_degree" vizinhos, fracao "fraction", no maximo "max"); sem "fleet.cars" /
+"fleet.ambulances", a frota e proporcional ao numero de nos (10 carros e 4
+ambulancias na grelha 6x6).
+"""
+
+import copy
+import json
+import os
+import random
+from typing import Dict, List, Optional
+
+from .network_loader import DEFAULT_GRID_SIZE, intersection_nodes
+
+DEFAULT_LIGHT_NODES = [
+    # Cantos principais (4)
+    "1_1", "1_4", "4_1", "4_4",
+    # Internos críticos (6)
+    "2_2", "2_3", "3_2", "3_3", "1_3", "3_1"
+]
+
+# Frota proporcional à rede (10 carros e 4 ambulâncias na grelha 6x6)
+CARS_PER_NODE = 10 / 36
+AMBULANCES_PER_NODE = 4 / 36
+
+LIGHT_ORIENTATIONS = ('horizontal', 'vertical')
+SERVICE_USERNAMES = ['coordinator', 'disruptor', 'dashboard']  # Agentes fixos (senha = utilizador)
+
+DEFAULT_SCENARIO = {
+    "name": "default",
+    "seed": None,
+    "network": {"type": "grid", "size": DEFAULT_GRID_SIZE, "weight_jitter": [0.8, 1.5]},
+    "lights": {"green": [5, 12], "red": [5, 10], "yellow": [1, 2],
+               "min_degree": 3, "fraction": 0.3},
+    "fleet": {},
+    "disruptions": []
+}
+
+
+def light_username(node_id, orientation):
+    """Utilizador XMPP de um semaforo: tl_<no>_h / tl_<no>_v"""
+    return f"tl_{node_id}_{orientation[0]}"
+
+
+def vehicle_username(spec):
+    """Utilizador XMPP de um veiculo da frota: vehicle_<n> (v<n>) e amb_<n> (AMB<n>)"""
+    if spec.get('jid'):
+        return spec['jid']
+    if spec['type'] == 'ambulance':
+        return f"amb_{spec['id'][3:]}"
+    return f"vehicle_{spec['id'][1:]}"
+
+
+class Scenario:
+    """Cenario com semente: cada valor e lido do ficheiro ou sorteado e registado
+
+    A mesma semente (e o mesmo ficheiro) produz a mesma rede, frota e planos
+    de semaforos; seed_runtime() semeia tambem o random global usado pelos
+    agentes em tempo de execucao (novos destinos, ruas bloqueadas).
+    """
+
+    def __init__(self, data: Optional[dict] = None, seed: Optional[int] = None, base_dir="."):
+        self.data = copy.deepcopy(DEFAULT_SCENARIO)
+        for section, value in (data or {}).items():
+            if isinstance(value, dict) and isinstance(self.data.get(section), dict):
+                self.data[section].update(value)
+            else:
+                self.data[section] = value
+        if seed is not None:
+            self.data['seed'] = seed
+        self.seed = self.data.get('seed')
+        self.rng = random.Random(self.seed)
+        self.base_dir = base_dir  # Pasta do ficheiro do cenário (caminhos relativos da rede)
+        self.record_weights = False  # Registar os pesos sorteados em network.weights (--save-scenario)
+
+    @classmethod
+    def load(cls, path, seed=None):
+        """Lê um cenario JSON (seed, se dado, substitui a do ficheiro)"""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), seed=seed, base_dir=os.path.dirname(os.path.abspath(path)))
+
+    def save(self, path):
+        """Escreve o cenario resolvido (pesos, planos e frota explicitos)"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+
+    @property
+    def name(self):
+        return self.data.get('name', 'default')
+
+    def resolve_path(self, path):
+        """Caminho de um ficheiro da rede (relativo ao ficheiro do cenario)"""
+        return path if os.path.isabs(path) else os.path.join(self.base_dir, path)
+
+    def set_network(self, **spec):
+        """Substitui a rede (opcoes da linha de comandos)
+
+        Os valores resolvidos para a rede anterior (pesos, nos com semaforos,
+        planos e viagens da frota) deixam de se aplicar e sao descartados.
+        """
+        network = self.data['network']
+        network.pop('weights', None)
+        if spec.get('type') == 'file':
+            for key in ('size', 'spacing'):
+                network.pop(key, None)
+        network.update(spec)
+        for key in ('nodes', 'plans'):
+            self.data['lights'].pop(key, None)
+        for key in ('vehicles', 'journey'):
+            self.data['fleet'].pop(key, None)
+
+    def seed_runtime(self):
+        """Semeia o random global (decisoes dos agentes durante a execucao)"""
+        if self.seed is not None:
+            random.seed(self.seed)
+
+    def edge_weight(self, from_id, to_id, base_weight, drawn=None):
+        """Peso de uma rua (o mesmo nos dois sentidos)
+
+        Pesos explicitos do cenario tem prioridade. Os sorteados so ficam em
+        network.weights com record_weights; quem pede o mesmo par nos dois
+        sentidos passa um dicionario `drawn` (temporario, da carga da rede)
+        para reutilizar o valor sorteado.
+        """
+        network = self.data['network']
+        key = "|".join(sorted((from_id, to_id)))
+        weight = network.get('weights', {}).get(key)
+        if weight is None and drawn is not None:
+            weight = drawn.get(key)
+        if weight is None:
+            low, high = network.get('weight_jitter', [0.8, 1.5])
+            weight = base_weight * self.rng.uniform(low, high)
+            if drawn is not None:
+                drawn[key] = weight
+            if self.record_weights:
+                network.setdefault('weights', {})[key] = weight
+        return weight
+
+    def light_nodes(self, road_graph) -> List[str]:
+        """Nos com semaforos: os do cenario ou sorteados entre os cruzamentos da rede"""
+        lights = self.data['lights']
+        if 'nodes' not in lights:
+            network = self.data['network']
+            if network.get('type', 'grid') == 'grid' and network.get('size', DEFAULT_GRID_SIZE) == DEFAULT_GRID_SIZE:
+                nodes = list(DEFAULT_LIGHT_NODES)
+            else:
+                candidates = intersection_nodes(road_graph, lights.get('min_degree', 3))
+                nodes = [n for n in candidates if self.rng.random() < lights.get('fraction', 0.3)]
+                if lights.get('max') is not None:
+                    nodes = nodes[:lights['max']]
+            lights['nodes'] = nodes
+        return [node_id for node_id in lights['nodes'] if node_id in road_graph.node_index]
+
+    def light_plan(self, node_id, orientation) -> Dict[str, int]:
+        """Tempos {green, red, yellow} (s) de um semaforo"""
+        lights = self.data['lights']
+        plans = lights.setdefault('plans', {})
+        key = f"{node_id}_{orientation}"
+        if key not in plans:
+            plans[key] = {
+                'green': self.rng.randint(*lights.get('green', [5, 12])),
+                'red': self.rng.randint(*lights.get('red', [5, 10])),
+                'yellow': self.rng.randint(*lights.get('yellow', [1, 2]))
+            }
+        return plans[key]
+
+    def vehicles(self, node_ids, point_a, point_b) -> List[dict]:
+        """Frota: [{id, type, from, to}] (v0 journey, v1.. carros, AMB0.. ambulancias)"""
+        fleet = self.data['fleet']
+        if 'vehicles' not in fleet:
+            nodes_list = list(node_ids)
+            fleet.setdefault('cars', max(1, round(len(nodes_list) * CARS_PER_NODE)))
+            fleet.setdefault('ambulances', max(1, round(len(nodes_list) * AMBULANCES_PER_NODE)))
+            journey = fleet.get('journey') or {'from': point_a, 'to': point_b}
+            vehicles = [{'id': 'v0', 'type': 'journey', 'from': journey['from'], 'to': journey['to']}]
+            for i in range(1, fleet['cars'] + 1):
+                vehicles.append(self._random_trip(f"v{i}", 'car', nodes_list))
+            for i in range(fleet['ambulances']):
+                vehicles.append(self._random_trip(f"AMB{i}", 'ambulance', nodes_list))
+            fleet['vehicles'] = vehicles
+        return fleet['vehicles']
+
+    def agent_usernames(self, road_graph) -> List[str]:
+        """Utilizadores XMPP de todos os agentes (servicos, pares de semaforos e frota)
+
+        Resolve o cenario pela mesma ordem que a simulacao (nos e planos dos
+        semaforos antes da frota), pelo que a mesma semente da os mesmos JIDs.
+        """
+        usernames = list(SERVICE_USERNAMES)
+        for node_id in self.light_nodes(road_graph):
+            for orientation in LIGHT_ORIENTATIONS:
+                self.light_plan(node_id, orientation)
+                usernames.append(light_username(node_id, orientation))
+        node_ids = road_graph.node_ids
+        for spec in self.vehicles(node_ids, node_ids[0], node_ids[-1]):
+            usernames.append(vehicle_username(spec))
+        return usernames
+
+    def _random_trip(self, vehicle_id, vehicle_type, nodes_list):
+        # Mesmos sorteios que choice(nodes) e choice(nodes sem a origem), sem copiar a lista
+        start = self.rng.randrange(len(nodes_list))
+        end = self.rng.randrange(len(nodes_list) - 1)
+        if end >= start:
+            end += 1
+        return {'id': vehicle_id, 'type': vehicle_type, 'from': nodes_list[start], 'to': nodes_list[end]}
+
+    def disruptions(self) -> List[dict]:
+        """Disrupcoes agendadas, por ordem de instante (s simulados apos o arranque)"""
+        return sorted(self.data.get('disruptions', []), key=lambda event: event.get('at', 0))
+
+
+def add_scenario_arguments(parser):
+    """Opcoes do cenario e da rede (simulacao e scripts/provision_agents.py)"""
+    parser.add_argument(
+        '--scenario',
+        default=None,
+        help='Ficheiro JSON do cenário (rede, frota, semáforos, disrupções); ver scenarios/'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='Semente global (substitui a do cenário)'
+    )
+    parser.add_argument(
+        '--grid-size',
+        type=int,
+        default=None,
+        help='Gera uma grelha N x N (substitui a rede do cenário)'
+    )
+    parser.add_argument(
+        '--nodes',
+        default=None,
+        help='Ficheiro de nós (CSV id,x,y / JSON Lines / JSON); requer --edges'
+    )
+    parser.add_argument(
+        '--edges',
+        default=None,
+        help='Ficheiro de arestas (CSV from,to[,weight,type,...] / JSON Lines / JSON)'
+    )
+    parser.add_argument(
+        '--bidirectional',
+        action='store_true',
+        help='Cria também o sentido inverso de cada aresta de --edges'
+    )
+
+
+def scenario_from_args(parser, args):
+    """Cenario resultante de --scenario/--seed e das opcoes de rede"""
+    if args.scenario:
+        scenario = Scenario.load(args.scenario, seed=args.seed)
+    else:
+        scenario = Scenario(seed=args.seed)
+    if args.nodes or args.edges:
+        if not (args.nodes and args.edges):
+            parser.error("--nodes e --edges têm de ser dados em conjunto")
+        scenario.set_network(type='file', nodes=os.path.abspath(args.nodes), edges=os.path.abspath(args.edges),
+                             bidirectional=args.bidirectional)
+    elif args.grid_size:
+        scenario.set_network(type='grid', size=args.grid_size)
+    return scenario
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Relogio da simulacao lido por todos os behaviours
+- RealTimeClock (padrao): tempo de parede (time.time / asyncio.sleep)
+- SteppedClock: tempo virtual em passos fixos; quando as tarefas prontas
+  terminam, salta diretamente para o proximo temporizador (mais rapido que
+  o tempo real, ordem dos temporizadores deterministica)
+- ClockedPeriodicBehaviour: PeriodicBehaviour com o periodo medido no relogio
+- sim_time() / sim_sleep(): leitura e espera no relogio atual
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+
+from spade.behaviour import PeriodicBehaviour
+
+from .spade_compat import require_tested_spade
+
+SETTLE_PASSES = 20  # Passagens do loop asyncio antes de avançar o relógio em passos
+
+
+class RealTimeClock:
+    """Tempo de parede (comportamento original)"""
+
+    realtime = True
+
+    def time(self):
+        return time.time()
+
+    async def sleep(self, delay):
+        await asyncio.sleep(delay)
+
+
+class SteppedClock:
+    """Tempo virtual que avanca em multiplos de step
+
+    run() corre no loop dos agentes: deixa correr as tarefas prontas, avanca o
+    tempo ate ao proximo temporizador (arredondado a um passo) e acorda-o.
+    Temporizadores com o mesmo instante acordam pela ordem de registo.
+    """
+
+    realtime = False
+
+    def __init__(self, step=0.05, start=0.0):
+        self.step = step
+        self.start = start
+        self.ticks = 0  # Passos decorridos (o tempo é start + ticks * step, sem deriva)
+        self._timers = []  # heap (instante, seq, future)
+        self._seq = itertools.count()
+        self.running = False
+        self.finished = False  # Duração pedida a run() atingida
+
+    def time(self):
+        return self.start + self.ticks * self.step
+
+    async def sleep(self, delay):
+        if delay <= 0:
+            await asyncio.sleep(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._timers, (self.time() + delay, next(self._seq), future))
+        await future
+
+    def _wake_due(self):
+        now = self.time() + 1e-9
+        while self._timers and self._timers[0][0] <= now:
+            _, _, future = heapq.heappop(self._timers)
+            if not future.done():
+                future.set_result(None)
+
+    async def run(self, duration=None):
+        """Avanca o relogio ate stop() ou ate duration segundos simulados"""
+        self.running = True
+        end_ticks = self.ticks + math.ceil(duration / self.step) if duration else None
+        print(f"⏩ Relógio em passos de {self.step}s" + (f" durante {duration:.0f}s simulados" if duration else ""))
+        while self.running:
+            for _ in range(SETTLE_PASSES):
+                await asyncio.sleep(0)
+            if self._timers:
+                due = self._timers[0][0]
+                if due > self.time():
+                    self.ticks += max(1, math.ceil((due - self.time()) / self.step - 1e-9))
+            else:
+                self.ticks += 1  # Nada agendado: o tempo avança um passo (a duração continua a contar)
+            if end_ticks is not None and self.ticks >= end_ticks:
+                self.ticks = end_ticks
+                self.finished = True
+                break
+            self._wake_due()
+        self.running = False
+
+    def stop(self):
+        self.running = False
+
+
+_clock = RealTimeClock()
+
+
+def set_clock(clock):
+    """Define o relogio usado pelos agentes (antes de os iniciar)"""
+    global _clock
+    if not clock.realtime:
+        require_tested_spade("O relógio em passos")
+    _clock = clock
+
+
+def get_clock():
+    return _clock
+
+
+def sim_time():
+    """Instante atual no relogio da simulacao (s)"""
+    return _clock.time()
+
+
+async def sim_sleep(delay):
+    """Espera delay segundos no relogio da simulacao"""
+    await _clock.sleep(delay)
+
+
+class ClockedPeriodicBehaviour(PeriodicBehaviour):
+    """PeriodicBehaviour cujo periodo e medido no relogio da simulacao
+
+    Com o relogio de parede mantem o agendamento do SPADE; com o relogio em
+    passos espera no SteppedClock, que avanca sem esperar pelo tempo real.
+    Substitui o metodo interno _run (chamado pelo ciclo _step do
+    CyclicBehaviour), por isso set_clock exige a serie testada do SPADE
+    (spade_compat).
+    """
+
+    _sim_next = None  # Próxima ativação (relógio da simulação)
+
+    async def _run(self):
+        """Uma ativacao por iteracao do ciclo do CyclicBehaviour (_step)"""
+        clock = _clock
+        if clock.realtime:
+            return await super()._run()
+
+        if self._sim_next is None:
+            self._sim_next = clock.time()
+        delay = self._sim_next - clock.time()
+        if delay > 0:
+            await clock.sleep(delay)
+            return
+        await self.run()
+        period = self.period.total_seconds()
+        self._sim_next += period
+        if self._sim_next <= clock.time():
+            self._sim_next = clock.time() + period  # Ativações perdidas não se acumulam
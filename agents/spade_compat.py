@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compatibilidade com o SPADE
+- O transporte local (transport.TransportAgent) e o relogio em passos
+  (sim_clock.ClockedPeriodicBehaviour, que substitui PeriodicBehaviour._run)
+  usam detalhes internos do SPADE que nao fazem parte da API publica; foram
+  escritos e testados com a serie TESTED_SPADE_SERIES (requirements.txt
+  fixa spade==4.1.0)
+- require_tested_spade: falha cedo, com uma mensagem clara, noutra versao
+  (em vez de agentes que arrancam sem behaviours, nunca param ou correm ao
+  ritmo do relogio de parede)
+"""
+
+import spade
+
+TESTED_SPADE_SERIES = "4.1"
+
+
+def spade_is_tested(version=None):
+    """True se a versao (por omissao a instalada) pertence a serie testada"""
+    version = spade.__version__ if version is None else version
+    return version == TESTED_SPADE_SERIES or version.startswith(TESTED_SPADE_SERIES + ".")
+
+
+def require_tested_spade(feature):
+    """Levanta RuntimeError se o SPADE instalado nao for da serie testada"""
+    if not spade_is_tested():
+        raise RuntimeError(
+            f"{feature} depende de detalhes internos do SPADE {TESTED_SPADE_SERIES}.x; "
+            f"instalado: {spade.__version__}. Instale spade=={TESTED_SPADE_SERIES}.0 (requirements.txt) "
+            f"ou reveja agents/spade_compat.py"
+        )
@@ -9,6 +9,7 @@ Agentes SPADE para Simulacao de Trafego
 
 import asyncio
 import json
+import logging
 import math
 import heapq
 import random
@@ -18,17 +19,351 @@ try:
 except Exception:
     MetricsCollector = None
 from typing import Dict, List, Tuple, Optional
-from spade.agent import Agent
-from spade.behaviour import CyclicBehaviour, OneShotBehaviour, PeriodicBehaviour
+from spade.behaviour import CyclicBehaviour, OneShotBehaviour
 from spade.message import Message
 from spade.template import Template
 
+from .road_network import (
+    LANDMARK_CACHE_DIR, CSRGraph, get_route_cache, get_shared_graph, register_route_cache, register_shared_graph
+)
+from .routing import (
+    DStarLitePlanner, EdgeCostModel, LightSchedule, RouteCache, shortest_path_trees, tree_next_hops, tree_route
+)
+from .sim_clock import ClockedPeriodicBehaviour, sim_time
+from .spatial_index import UniformGrid
+from .movement import KernelField
+from .transport import TransportAgent
+from .world_state import WorldStateTable
 
-class VehicleAgent(Agent):
+logger = logging.getLogger(__name__)  # Detalhe por destinatário/aresta (nível DEBUG)
+
+# Limiares para incrementar a versão da rede (invalida a cache de rotas)
+TRAFFIC_VERSION_DELTA = 20  # Variação mínima de atraso reportado numa aresta
+VERSION_MIN_INTERVAL = 2.0  # Intervalo mínimo (s) entre versões por tráfego ou semáforos
+
+# Roteamento dependente do tempo (fases previstas dos semáforos)
+MOVE_PERIOD = 0.05  # Período (s) do MoveBehaviour dos veículos
+LIGHT_TICK = 0.5  # Período (s) de um tick do LightCycleBehaviour
+
+STATE_BUS_PERIOD = 0.1  # Período (s) de publicação dos deltas de estado (10 Hz)
+
+# Cedência de passagem a ambulâncias
+AMBULANCE_YIELD_RADIUS = 150  # Raio (px) em torno do próximo nó para ceder passagem
+AMBULANCE_MAX_AGE = 1.0  # Idade máxima (s) de uma posição de ambulância
+
+
+class VehicleStepMixin:
+    """Passos discretos do movimento de um veículo (partilhados pelos behaviours)
+    
+    - route_step(): reporta a rota, verifica bloqueios e (re)calcula a rota
+    - arrive(): chegada a um nó (avança na rota; no destino troca A e B)
+    Usado pelo MoveBehaviour (modo por veículo) e pelo KernelStepBehaviour
+    (modo MovementKernel).
+    """
+    
+    async def route_step(self):
+        """Prepara o movimento deste tick
+        
+        Returns:
+            str: nó alvo na rota, ou None se o veículo não se deve mover
+        """
+        # Reportar nova rota ao coordenador (replaneamento seletivo em disrupções)
+        if self.agent.route is not self.agent._reported_route:
+            await self._report_route()
+        
+        if not self.agent.moving or self.agent.arrival_time is not None:
+            return
+        
+        # 🚧 VERIFICAÇÃO CRÍTICA 1: Verificar se o veículo está NUMA aresta bloqueada
+        # Isso captura veículos que já estavam em movimento quando a via foi bloqueada
+        if self.agent.route and self.agent.route_index < len(self.agent.route):
+            current = self.agent.current_node
+            next_node = self.agent.route[self.agent.route_index]
+            
+            is_blocked, edge_id = self.agent.is_edge_blocked(current, next_node)
+            if is_blocked:
+                print(f"🚨 {self.agent.vehicle_id} ({self.agent.vehicle_type}): ARESTA ATUAL {current}->{next_node} (edge {edge_id}) ESTÁ BLOQUEADA!")
+                print(f"🚨 {self.agent.vehicle_id}: Forçando recálculo de rota...")
+                # Forçar recálculo (veículo continua tentando a cada frame)
+                self.agent.route = []  # Limpar rota atual
+                return  # Retorna para recalcular no próximo frame
+        
+        # Se nao tem rota, calcular
+        if not self.agent.route:
+            # 🧭 Destino inalcançável: aguardar até a conectividade mudar (sem A*)
+            if self.agent.reachability is not None and self.agent.reachability is self.agent._unreachable_index:
+                return
+            if not self.agent.destination_reachable():
+                self.agent._unreachable_index = self.agent.reachability
+                print(f"🧭 {self.agent.vehicle_id}: {self.agent.end_node} inalcançável a partir de {self.agent.current_node}")
+                
+                # Veículos normais: escolher novo destino alcançável
+                if self.agent.vehicle_id != 'v0' and self.agent.vehicle_type != 'ambulance':
+                    available_nodes = [
+                        n for n in self.agent.nodes
+                        if n != self.agent.current_node and self.agent.destination_reachable(n)
+                    ]
+                    if available_nodes:
+                        new_destination = random.choice(available_nodes)
+                        print(f"🔄 {self.agent.vehicle_id}: Mudando destino de {self.agent.end_node} para {new_destination}")
+                        self.agent.end_node = new_destination
+                        self.agent._unreachable_index = None
+                else:
+                    print(f"⏳ {self.agent.vehicle_id} ({self.agent.vehicle_type}): Aguardando mudança de conectividade...")
+                return
+            
+            # Evitar recálculo excessivo - adicionar delay entre tentativas
+            if not hasattr(self.agent, '_last_route_attempt'):
+                self.agent._last_route_attempt = 0
+            
+            current_time = sim_time()
+            # Só tentar recalcular a cada 0.5 segundos para evitar spam
+            if current_time - self.agent._last_route_attempt < 0.5:
+                return
+            
+            self.agent._last_route_attempt = current_time
+            
+            # Medir latência do A*
+            start_astar = time.perf_counter()
+            self.agent.route = self.agent.plan_route(
+                self.agent.current_node,
+                self.agent.end_node
+            )
+            end_astar = time.perf_counter()
+            latency_ms = (end_astar - start_astar) * 1000
+            
+            if self.agent.route:
+                self.agent.route_index = 0
+                self.agent.target_node = self.agent.route[0] if len(self.agent.route) > 0 else None
+                
+                # Enviar métricas após recálculo bem-sucedido
+                if self.agent.metrics:
+                    try:
+                        new_cost = getattr(self.agent, 'route_total_cost', 0.0)
+                        base_cost = getattr(self.agent, 'route_base_cost', 0.0)
+                        sem_penalty = getattr(self.agent, 'route_semaphore_penalty_cost', 0.0)
+                        traffic_penalty = getattr(self.agent, 'route_traffic_penalty_cost', 0.0)
+                        
+                        # Log CSV
+                        original_cost = getattr(self.agent, '_last_route_cost', new_cost)
+                        self.agent.metrics.log_route_costs(self.agent.vehicle_id, original_cost, new_cost)
+                        self.agent.metrics.log_semaphore_penalty(self.agent.vehicle_id, base_cost, sem_penalty)
+                        self.agent.metrics.log_traffic_penalty(self.agent.vehicle_id, base_cost, traffic_penalty)
+                        self.agent.metrics.flush()
+                        
+                        # Enviar latência do A*
+                        await self._send_latency_to_dashboard(latency_ms)
+                        
+                        # Enviar via XMPP para dashboard
+                        await self._send_metrics_to_dashboard(original_cost, new_cost, sem_penalty, traffic_penalty)
+                        
+                        # Salvar custo atual para próxima comparação
+                        self.agent._last_route_cost = new_cost
+                    except Exception as e:
+                        print(f"❌ {self.agent.vehicle_id}: Erro ao enviar métricas: {e}")
+            # Sem rota (destino alcançável segundo o índice): nova tentativa após o intervalo
+        
+        if not self.agent.route or self.agent.route_index >= len(self.agent.route):
+            return None
+        target_node = self.agent.route[self.agent.route_index]
+        if target_node not in self.agent.nodes:
+            return None
+        return target_node
+    
+    async def arrive(self, target_node):
+        """Chegada a target_node: avança na rota ou, no destino, inicia a viagem de volta"""
+        target_x, target_y = self.agent.nodes[target_node]
+        # Chegou ao no
+        prev_node = self.agent.current_node
+        self.agent.current_node = target_node
+        self.agent.x = target_x
+        self.agent.y = target_y
+        self.agent.route_index += 1
+        
+        # 🚧 VERIFICAÇÃO CRÍTICA 2: Antes de avançar, verificar se a PRÓXIMA aresta está bloqueada
+        if self.agent.route_index < len(self.agent.route):
+            next_target = self.agent.route[self.agent.route_index]
+            
+            # Usar o método auxiliar para verificar se está bloqueada
+            is_blocked, edge_id = self.agent.is_edge_blocked(target_node, next_target)
+            if is_blocked:
+                print(f"⛔ {self.agent.vehicle_id} ({self.agent.vehicle_type}): PRÓXIMA via {target_node}->{next_target} (edge {edge_id}) está BLOQUEADA!")
+                print(f"⛔ {self.agent.vehicle_id}: Parando no nó {target_node} e recalculando...")
+                self.agent.route = []  # Forçar recálculo completo
+                return  # Retorna para recalcular no próximo frame
+        
+        # Acumular custo da aresta percorrida (para journey vehicle)
+        if self.agent.vehicle_id == 'v0' and prev_node and self.agent.edge_start_node:
+            # Encontrar a aresta entre edge_start_node e current_node
+            edge_id = self.agent.edge_index.get((self.agent.edge_start_node, target_node))
+            if edge_id is not None:
+                self.agent.route_cost_traveled += self.agent.road_graph.edge_weight(edge_id)
+            # Atualizar para próxima aresta
+            self.agent.edge_start_node = target_node
+        
+        if self.agent.route_index >= len(self.agent.route):
+            # Chegou ao destino - FAZER LOOP A→B→A
+            
+            # Guardar destino atual antes da troca
+            destination_reached = self.agent.end_node
+            self.agent.trips_completed += 1
+            
+            # Trocar origem e destino (inverter o caminho)
+            temp = self.agent.start_node
+            self.agent.start_node = self.agent.end_node
+            self.agent.end_node = temp
+            
+            # Registrar custo original da rota antes de recalcular
+            original_cost = getattr(self.agent, 'route_total_cost', 0.0)
+            
+            # CORREÇÃO: Recalcular rota a partir do nó ATUAL (que é o destino alcançado)
+            # para garantir que a rota começa do ponto onde o veículo está
+            new_route = self.agent.plan_route(self.agent.current_node, self.agent.end_node)
+            
+            if new_route and len(new_route) > 0:
+                self.agent.route = new_route
+                self.agent.route_index = 0
+                self.agent.target_node = self.agent.route[0]
+                # Registrar custos da nova rota e penalidades de semáforo
+                if self.agent.metrics:
+                    try:
+                        new_cost = getattr(self.agent, 'route_total_cost', 0.0)
+                        base_cost = getattr(self.agent, 'route_base_cost', 0.0)
+                        sem_penalty = getattr(self.agent, 'route_semaphore_penalty_cost', 0.0)
+                        traffic_penalty = getattr(self.agent, 'route_traffic_penalty_cost', 0.0)
+                        self.agent.metrics.log_route_costs(self.agent.vehicle_id, original_cost, new_cost)
+                        self.agent.metrics.log_semaphore_penalty(self.agent.vehicle_id, base_cost, sem_penalty)
+                        self.agent.metrics.log_traffic_penalty(self.agent.vehicle_id, base_cost, traffic_penalty)
+                        self.agent.metrics.flush()
+                        
+                        # Enviar métricas para dashboard via XMPP
+                        await self._send_metrics_to_dashboard(original_cost, new_cost, sem_penalty, traffic_penalty)
+                    except Exception:
+                        pass
+                # Registrar custos da nova rota
+                if self.agent.metrics:
+                    try:
+                        new_cost = getattr(self.agent, 'route_total_cost', 0.0)
+                        self.agent.metrics.log_route_costs(self.agent.vehicle_id, original_cost, new_cost)
+                        self.agent.metrics.flush()
+                    except Exception:
+                        pass
+                
+                # Log apenas para alguns veículos (evitar spam)
+                if self.agent.vehicle_id in ['v0', 'AMB0']:
+                    print(f"🔄 {self.agent.vehicle_id}: Chegou a {destination_reached}, voltando para {self.agent.end_node}")
+            else:
+                # SEM ROTA DISPONÍVEL - evitar loop infinito
+                # Tentar rota alternativa para um nó adjacente primeiro
+                print(f"⚠️ {self.agent.vehicle_id}: Sem rota direta de {self.agent.current_node} para {self.agent.end_node}")
+                
+                # Tentar encontrar um nó adjacente não bloqueado como destino temporário
+                alternative_found = False
+                if self.agent.current_node in self.agent.graph:
+                    for neighbor, edge_id in self.agent.graph[self.agent.current_node]:
+                        if edge_id not in self.agent.blocked_edges:
+                            # Tentar rota até este vizinho primeiro
+                            alt_route = self.agent.calculate_route_astar(self.agent.current_node, neighbor)
+                            if alt_route and len(alt_route) > 0:
+                                self.agent.route = alt_route
+                                self.agent.route_index = 0
+                                self.agent.target_node = self.agent.route[0]
+                                alternative_found = True
+                                print(f"🔀 {self.agent.vehicle_id}: Usando rota alternativa via {neighbor}")
+                                break
+                
+                if not alternative_found:
+                    # Última opção: manter posição e aguardar mudança de bloqueios
+                    print(f"🛑 {self.agent.vehicle_id}: Completamente bloqueado em {self.agent.current_node}, aguardando...")
+                    self.agent.route = []
+                    self.agent.waiting_time += 1
+        else:
+            self.agent.target_node = self.agent.route[self.agent.route_index]
+    
+    async def _report_route(self):
+        """Envia ao coordenador as arestas da rota atual"""
+        self.agent._reported_route = self.agent.route
+        msg = Message(to="coordinator@localhost")
+        msg.set_metadata("performative", "inform")
+        msg.body = json.dumps({
+            "type": "route_update",
+            "vehicle_id": self.agent.vehicle_id,
+            "vehicle_type": self.agent.vehicle_type,
+            "end_node": self.agent.end_node,
+            "edges": self.agent.remaining_route_edges()
+        })
+        await self.send(msg)
+    
+    async def _send_latency_to_dashboard(self, latency_ms):
+        """Envia latência de recálculo A* para o dashboard"""
+        try:
+            msg = Message(to="dashboard@localhost")
+            msg.set_metadata("performative", "inform")
+            msg.body = json.dumps({
+                "type": "metric_latency",
+                "vehicle_id": self.agent.vehicle_id,
+                "latency_ms": latency_ms
+            })
+            await self.send(msg)
+            print(f"📊 {self.agent.vehicle_id}: Latência enviada para dashboard ({latency_ms:.2f}ms)")
+        except Exception as e:
+            print(f"❌ {self.agent.vehicle_id}: Erro ao enviar latência: {e}")
+    
+    async def _send_metrics_to_dashboard(self, original_cost, new_cost, sem_penalty, traffic_penalty):
+        """Envia métricas para o dashboard via XMPP"""
+        try:
+            # Métrica de rota (custos)
+            route_msg = Message(to="dashboard@localhost")
+            route_msg.set_metadata("performative", "inform")
+            route_msg.body = json.dumps({
+                "type": "metric_route",
+                "vehicle_id": self.agent.vehicle_id,
+                "original_cost": original_cost,
+                "recalculated_cost": new_cost,
+                "deviation": new_cost / original_cost if original_cost > 0 else 1.0
+            })
+            await self.send(route_msg)
+            print(f"📊 {self.agent.vehicle_id}: Rota enviada para dashboard (orig={original_cost:.1f}, rec={new_cost:.1f})")
+            
+            # Métrica de semáforo
+            sem_msg = Message(to="dashboard@localhost")
+            sem_msg.set_metadata("performative", "inform")
+            sem_msg.body = json.dumps({
+                "type": "metric_semaphore",
+                "vehicle_id": self.agent.vehicle_id,
+                "penalty": sem_penalty
+            })
+            await self.send(sem_msg)
+            print(f"📊 {self.agent.vehicle_id}: Semáforo enviado para dashboard (pen={sem_penalty:.1f})")
+            
+            # Métrica de tráfego
+            traffic_msg = Message(to="dashboard@localhost")
+            traffic_msg.set_metadata("performative", "inform")
+            traffic_msg.body = json.dumps({
+                "type": "metric_traffic",
+                "vehicle_id": self.agent.vehicle_id,
+                "penalty": traffic_penalty
+            })
+            await self.send(traffic_msg)
+            print(f"📊 {self.agent.vehicle_id}: Tráfego enviado para dashboard (pen={traffic_penalty:.1f})")
+        except Exception as e:
+            print(f"❌ {self.agent.vehicle_id}: Erro ao enviar métricas: {e}")
+
+class VehicleAgent(TransportAgent):
     """Agente Veiculo com roteamento inteligente"""
     
-    def __init__(self, jid, password, vehicle_id, start_node, end_node, vehicle_type='car'):
+    # Estado de movimento: nos arrays do MovementKernel quando este está ligado
+    x = KernelField()
+    y = KernelField()
+    speed = KernelField()
+    waiting_time = KernelField()
+    total_travel_time = KernelField()
+    
+    def __init__(self, jid, password, vehicle_id, start_node, end_node, vehicle_type='car', kernel=None):
         super().__init__(jid, password)
+        self.kernel = kernel  # MovementKernel partilhado (None = MoveBehaviour próprio)
+        self.kernel_slot = None  # Índice do veículo nos arrays do kernel
+        self.kernel_wakeup = None  # Evento com que o kernel pede um passo discreto
         self.vehicle_id = vehicle_id
         self.vehicle_type = vehicle_type  # 'car', 'ambulance', 'journey'
         self.start_node = start_node
@@ -58,6 +393,8 @@ class VehicleAgent(Agent):
         self.total_travel_time = 0
         self.moving = True
         self.arrival_time = None
+        self.trips_completed = 0  # Destinos alcançados (modo headless termina por nº de viagens)
+        self.ready = asyncio.Event()  # Definido quando o coordenador responde a request_network
         
         # Rastreamento de custo da rota (peso das arestas)
         self.route_total_cost = 0  # Custo total da rota planejada
@@ -67,12 +404,23 @@ class VehicleAgent(Agent):
         
         # Dados da rede (serão recebidos do coordenador)
         self.nodes = {}
-        self.edges = {}
-        self.graph = {}
+        self.edge_index = {}  # {(from_node, to_node): edge_id} construído ao receber a rede
+        self.road_graph = None  # CSRGraph partilhado (nodes/edge_index/graph são vistas dele)
         self.traffic_reports = {}  # Cache local de reportes de trafego
         self.traffic_lights = {}   # Cache local de semaforos
+        self.light_schedules = {}  # {node_orientation: LightSchedule} publicados pelos semáforos
+        self.route_window = 0.0  # Ciclo (s) mais longo publicado: janela de partida na cache de rotas
+        self.cost_model = None  # EdgeCostModel sobre as caches acima (criado com o grafo)
+        self.plan_time = 0.0  # Instante em que as pesquisas estáticas (D* Lite) avaliam os custos
         self.nearby_ambulances = {}  # Cache de ambulâncias próximas {ambulance_id: {'x': x, 'y': y, 'timestamp': time}}
+        self.ambulance_grid = UniformGrid(AMBULANCE_YIELD_RADIUS)  # Índice espacial das ambulâncias
         self.blocked_edges = set()  # Arestas bloqueadas pelo disruptor
+        self.route_planner = None  # Planeador incremental (D* Lite) para o destino atual
+        self.reachability = None  # Índice de alcançabilidade (SCC) para os bloqueios atuais
+        self._unreachable_index = None  # Índice em que o destino se mostrou inalcançável
+        self.route_cache = None  # Cache de rotas partilhada do coordenador (mesmo processo)
+        self.network_version = 0  # Última versão da rede anunciada pelo coordenador
+        self._reported_route = None  # Última rota reportada ao coordenador (índice aresta -> veículos)
         # Coletor de métricas (opcional)
         self.metrics = MetricsCollector(output_dir="metrics") if MetricsCollector else None
         
@@ -81,8 +429,14 @@ class VehicleAgent(Agent):
         print(f"VehicleAgent {self.vehicle_id} ({self.vehicle_type}) iniciado: {self.start_node} -> {self.end_node}")
         
         # Behaviour para movimento (MAIS RÁPIDO: 20 Hz)
-        move_behaviour = self.MoveBehaviour(period=0.05)  # Reduzido de 0.1 para 0.05
-        self.add_behaviour(move_behaviour)
+        if self.kernel is not None:
+            # Movimento vetorizado no MovementKernel; aqui só os passos discretos
+            self.kernel_wakeup = asyncio.Event()
+            self.kernel.register(self)
+            self.add_behaviour(self.KernelStepBehaviour())
+        else:
+            move_behaviour = self.MoveBehaviour(period=MOVE_PERIOD)  # Reduzido de 0.1 para 0.05
+            self.add_behaviour(move_behaviour)
         
         # Behaviour para receber mensagens (SEM TEMPLATE para aceitar TODAS)
         receive_behaviour = self.ReceiveMessagesBehaviour()
@@ -101,6 +455,16 @@ class VehicleAgent(Agent):
         request_behaviour = self.RequestNetworkBehaviour()
         self.add_behaviour(request_behaviour)
     
+    @property
+    def route(self):
+        return self._route
+    
+    @route.setter
+    def route(self, route):
+        self._route = route
+        if self.kernel_slot is not None:
+            self.kernel.wake(self.kernel_slot)
+    
     def update_speed_multiplier(self, multiplier):
         """Atualiza multiplicador de velocidade dinamicamente"""
         self.speed_multiplier = multiplier
@@ -119,33 +483,136 @@ class VehicleAgent(Agent):
             })
             await self.send(msg)
     
+    def repeat_request(self):
+        """Repete request_network (sem confirmação dentro do prazo do arranque)"""
+        self.add_behaviour(self.RequestNetworkBehaviour())
+    
+    def set_road_graph(self, road_graph):
+        """Associa o grafo CSR (partilhado no processo) e as vistas usadas a cada passo"""
+        self.road_graph = road_graph
+        self.nodes = road_graph.positions
+        self.edge_index = road_graph.edge_index
+        self.route_planner = None
+        self.reachability = road_graph.reachability(self.blocked_edges)
+        self.cost_model = EdgeCostModel(
+            road_graph, self.traffic_reports, self.light_schedules, self.traffic_lights,
+            ignore_lights=self.vehicle_type == 'ambulance'
+        )
+    
+    @property
+    def graph(self):
+        """Adjacência {node_id: [(vizinho, edge_id)]} (vista do CSRGraph, construída no primeiro uso)"""
+        return self.road_graph.adjacency if self.road_graph is not None else {}
+    
+    def update_reachability(self):
+        """Atualiza o índice de alcançabilidade após mudança de bloqueios"""
+        if self.road_graph is not None:
+            self.reachability = self.road_graph.reachability(self.blocked_edges)
+    
+    def destination_reachable(self, goal=None, start=None):
+        """Consulta O(1): existe caminho do nó atual (ou start) até goal?"""
+        if self.reachability is None:
+            return True
+        return self.reachability.reachable(
+            self.current_node if start is None else start,
+            self.end_node if goal is None else goal
+        )
+    
+    def route_profile(self):
+        """Parte da chave da cache de rotas que depende do veículo
+        
+        Ambulâncias ignoram semáforos; com calendários publicados o custo
+        depende também da velocidade e do instante de partida. A partida conta
+        por janelas de um ciclo completo (o mais longo publicado): dentro de
+        uma janela os veículos com a mesma velocidade partilham a rota, cujas
+        esperas foram previstas para a primeira partida.
+        """
+        if self.vehicle_type == 'ambulance':
+            return ('ambulance',)
+        if not self.light_schedules:
+            return ('lights',)
+        window = int(sim_time() // self.route_window) if self.route_window > 0 else 0
+        return ('lights', round(self.travel_speed()), window)
+    
+    def plan_route(self, start, goal):
+        """Rota via cache partilhada (origem, destino, versão da rede, perfil) ou A* em caso de falha"""
+        cache = self.route_cache
+        profile = self.route_profile()
+        if cache is not None:
+            entry = cache.get(start, goal, self.network_version, profile)
+            if entry is not None:
+                path, costs = entry
+                for attr, value in costs.items():
+                    setattr(self, attr, value)
+                self.route_cost_traveled = 0
+                self.edge_start_node = path[0]
+                return list(path)
+        
+        # Evitar pesquisas fúteis: destino desconectado pelos bloqueios
+        if not self.destination_reachable(goal, start):
+            return []
+        
+        path = self.calculate_route_astar(start, goal)
+        if path and cache is not None:
+            cache.put(start, goal, self.network_version, path, {
+                'route_total_cost': self.route_total_cost,
+                'route_base_cost': self.route_base_cost,
+                'route_penalty_cost': self.route_penalty_cost,
+                'route_traffic_penalty_cost': self.route_traffic_penalty_cost,
+                'route_semaphore_penalty_cost': self.route_semaphore_penalty_cost
+            }, profile)
+        return path
+    
     def calculate_route_astar(self, start, goal):
-        """Algoritmo A* para calcular rota otima"""
-        if not self.graph or start not in self.graph or goal not in self.graph:
+        """Algoritmo A* para calcular rota otima (sobre o grafo CSR)"""
+        road_graph = self.road_graph
+        if road_graph is None or start not in road_graph.node_index or goal not in road_graph.node_index:
             return []
         
-        def heuristic(node1, node2):
-            x1, y1 = self.nodes[node1]
-            x2, y2 = self.nodes[node2]
-            return math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
+        node_ids = road_graph.node_ids
+        xs, ys = road_graph.xs, road_graph.ys
+        offsets, targets = road_graph.offsets, road_graph.targets
+        edge_ids, weights = road_graph.edge_ids, road_graph.weights
+        start_idx = road_graph.node_index[start]
+        goal_idx = road_graph.node_index[goal]
+        goal_x, goal_y = xs[goal_idx], ys[goal_idx]
+        
+        # Heuristica ALT (landmarks pre-calculados na rede) + euclidiana escalada para custo
+        scale = road_graph.min_cost_per_pixel
+        landmark_heuristic = road_graph.landmarks.heuristic_to(goal_idx) if road_graph.landmarks else None
+        
+        def heuristic(node_idx):
+            estimate = math.sqrt((goal_x - xs[node_idx])**2 + (goal_y - ys[node_idx])**2) * scale
+            if landmark_heuristic is not None:
+                estimate = max(estimate, landmark_heuristic(node_idx))
+            return estimate
         
+        cost_model = self.cost_model
+        num_nodes = road_graph.num_nodes
         open_set = []
-        heapq.heappush(open_set, (0, start))
-        came_from = {}
-        g_score = {node: float('inf') for node in self.graph}
-        g_score[start] = 0
-        f_score = {node: float('inf') for node in self.graph}
-        f_score[start] = heuristic(start, goal)
+        heapq.heappush(open_set, (heuristic(start_idx), start_idx))
+        came_from = [-1] * num_nodes
+        g_score = [float('inf')] * num_nodes
+        g_score[start_idx] = 0
+        # Componentes do custo acumulado (decomposição sai da própria pesquisa)
+        base_g = [0.0] * num_nodes
+        traffic_g = [0.0] * num_nodes
+        semaphore_g = [0.0] * num_nodes
+        # Instante previsto de chegada a cada nó (fases previstas dos semáforos)
+        arrival = [0.0] * num_nodes
+        arrival[start_idx] = sim_time()
+        distances = road_graph.distances
+        px_per_second = self.travel_speed()
         
         blocked_count = 0  # Contador de arestas bloqueadas
         
         while open_set:
             current = heapq.heappop(open_set)[1]
             
-            if current == goal:
+            if current == goal_idx:
                 path = []
-                while current in came_from:
-                    path.append(current)
+                while current != start_idx:
+                    path.append(node_ids[current])
                     current = came_from[current]
                 path.append(start)
                 path = path[::-1]
@@ -157,13 +624,10 @@ class VehicleAgent(Agent):
                     node_to = path[i + 1]
                     
                     # Verificar se esta aresta está bloqueada
-                    if node_from in self.graph:
-                        for neighbor, edge_id in self.graph[node_from]:
-                            if neighbor == node_to and edge_id in self.blocked_edges:
-                                print(f"❌ A*: {self.vehicle_id} - ROTA INVÁLIDA! Contém aresta bloqueada {edge_id} ({node_from}->{node_to})")
-                                route_is_valid = False
-                                break
-                    if not route_is_valid:
+                    edge_id = self.edge_index.get((node_from, node_to))
+                    if edge_id is not None and edge_id in self.blocked_edges:
+                        print(f"❌ A*: {self.vehicle_id} - ROTA INVÁLIDA! Contém aresta bloqueada {edge_id} ({node_from}->{node_to})")
+                        route_is_valid = False
                         break
                 
                 # Se a rota contém bloqueios, retornar vazio (forçar novo cálculo)
@@ -171,111 +635,221 @@ class VehicleAgent(Agent):
                     print(f"⛔ A*: {self.vehicle_id} - Rota rejeitada por conter vias bloqueadas")
                     return []
                 
-                # Calcular custo total da rota (soma dos pesos das arestas)
-                if len(path) > 0:
-                    # Custo agregado calculado por g_score
-                    self.route_total_cost = g_score[goal]
-                    self.route_cost_traveled = 0
-                    self.edge_start_node = start
-                    # Calcular custos base e penalidades separadamente para métricas
-                    base_cost_total = 0.0
-                    penalty_cost_total = 0.0
-                    traffic_penalty_total = 0.0
-                    semaphore_penalty_total = 0.0
-                    for i in range(len(path) - 1):
-                        node_from = path[i]
-                        node_to = path[i + 1]
-                        # Encontrar edge_id
-                        edge_id = None
-                        for neighbor, e_id in self.graph.get(node_from, []):
-                            if neighbor == node_to:
-                                edge_id = e_id
-                                break
-                        if edge_id is None:
-                            continue
-                        # Peso base da aresta
-                        edge_weight_base = self.edges.get(edge_id, {}).get('weight', 100.0)
-                        base_cost_total += edge_weight_base
-                        # Penalidade por trafego
-                        traffic_delay = self.traffic_reports.get(edge_id, {}).get('delay', 0)
-                        traffic_pen = traffic_delay * 5
-                        penalty_cost_total += traffic_pen
-                        traffic_penalty_total += traffic_pen
-                        # Penalidade por semáforo
-                        # Considera estado do semáforo no nó de chegada
-                        # Suporta formato com orientação e sem orientação
-                        sem_penalty = 0
-                        # Preferência: semáforos com orientação
-                        if f"{node_to}_horizontal" in self.traffic_lights:
-                            state = self.traffic_lights[f"{node_to}_horizontal"].get('state', 'green')
-                            if state == 'red':
-                                sem_penalty = max(sem_penalty, 200)
-                            elif state == 'yellow':
-                                sem_penalty = max(sem_penalty, 50)
-                        if f"{node_to}_vertical" in self.traffic_lights:
-                            state = self.traffic_lights[f"{node_to}_vertical"].get('state', 'green')
-                            if state == 'red':
-                                sem_penalty = max(sem_penalty, 200)
-                            elif state == 'yellow':
-                                sem_penalty = max(sem_penalty, 50)
-                        # Fallback: semáforo sem orientação
-                        if node_to in self.traffic_lights:
-                            state = self.traffic_lights[node_to].get('state', 'green')
-                            if state == 'red':
-                                sem_penalty = max(sem_penalty, 200)
-                            elif state == 'yellow':
-                                sem_penalty = max(sem_penalty, 50)
-                        penalty_cost_total += sem_penalty
-                        semaphore_penalty_total += sem_penalty
-                    # Guardar métricas separadas
-                    self.route_base_cost = base_cost_total
-                    self.route_penalty_cost = penalty_cost_total
-                    self.route_traffic_penalty_cost = traffic_penalty_total
-                    self.route_semaphore_penalty_cost = semaphore_penalty_total
+                # Custos da rota: exatamente os componentes otimizados pelo A*
+                self.edge_start_node = path[0]
+                self._store_route_costs(
+                    g_score[goal_idx], base_g[goal_idx], traffic_g[goal_idx], semaphore_g[goal_idx]
+                )
                 
                 if blocked_count > 0:
                     print(f"🛤️  {self.vehicle_id}: Rota calculada evitando {blocked_count} vias bloqueadas")
                 
                 return path
             
-            for neighbor, edge_id in self.graph.get(current, []):
+            for slot in range(offsets[current], offsets[current + 1]):
+                neighbor = targets[slot]
+                edge_id = edge_ids[slot]
                 # 🚧 VERIFICAR SE A VIA ESTÁ BLOQUEADA - IGNORAR COMPLETAMENTE
                 if edge_id in self.blocked_edges:
                     blocked_count += 1
-                    # Log para debug (apenas primeiras vezes)
-                    if blocked_count <= 3:
-                        print(f"🚫 A*: {self.vehicle_id} pulou aresta bloqueada {edge_id} ({current}->{neighbor})")
+                    logger.debug("🚫 A*: %s pulou aresta bloqueada %s (%s->%s)",
+                                 self.vehicle_id, edge_id, node_ids[current], node_ids[neighbor])
                     continue  # Pular esta aresta completamente
                 
-                # Peso base da aresta
-                edge_weight = self.edges.get(edge_id, {}).get('weight', 100.0)
-                
-                # Adicionar penalidade por trafego
-                if edge_id in self.traffic_reports:
-                    delay = self.traffic_reports[edge_id].get('delay', 0)
-                    edge_weight += delay * 5
-                
-                # Adicionar penalidade por semaforos vermelhos
-                if neighbor in self.traffic_lights:
-                    state = self.traffic_lights[neighbor].get('state', 'green')
-                    if state == 'red':
-                        edge_weight += 200
-                    elif state == 'yellow':
-                        edge_weight += 50
+                # Peso base + penalidades de trafego e semaforo (no instante previsto de chegada)
+                traffic_pen = cost_model.traffic(edge_id)
+                arrival_time = arrival[current] + distances[slot] / px_per_second
+                sem_pen, wait = cost_model.semaphore(slot, arrival_time)
+                arrival_time += wait
+                edge_weight = weights[slot] + traffic_pen + sem_pen
                 
                 tentative_g_score = g_score[current] + edge_weight
                 
                 if tentative_g_score < g_score[neighbor]:
                     came_from[neighbor] = current
                     g_score[neighbor] = tentative_g_score
-                    f_score[neighbor] = tentative_g_score + heuristic(neighbor, goal)
-                    heapq.heappush(open_set, (f_score[neighbor], neighbor))
+                    base_g[neighbor] = base_g[current] + weights[slot]
+                    traffic_g[neighbor] = traffic_g[current] + traffic_pen
+                    semaphore_g[neighbor] = semaphore_g[current] + sem_pen
+                    arrival[neighbor] = arrival_time
+                    heapq.heappush(open_set, (tentative_g_score + heuristic(neighbor), neighbor))
         
         # Se chegou aqui, não há caminho disponível
         if blocked_count > 0:
             print(f"⛔ {self.vehicle_id}: Sem rota disponível! Bloqueios impediram acesso ao destino ({blocked_count} vias bloqueadas)")
         return []
     
+    def _record_route_costs(self, path):
+        """Guarda custo total e decomposicao (base/trafego/semaforo) de uma rota
+        
+        Usado para rotas que nao vieram do A* (D* Lite, lote); a decomposicao
+        usa a mesma funcao de custo do A*, a partir do instante atual, e o
+        total e sempre a soma dos componentes.
+        """
+        self.edge_start_node = path[0]
+        self._store_route_costs(*self.cost_model.route_costs(path, sim_time(), self.travel_speed()))
+    
+    def _store_route_costs(self, total_cost, base_cost, traffic_penalty, semaphore_penalty):
+        """Guarda as métricas de custo da rota atual"""
+        self.route_total_cost = total_cost
+        self.route_cost_traveled = 0
+        self.route_base_cost = base_cost
+        self.route_penalty_cost = traffic_penalty + semaphore_penalty
+        self.route_traffic_penalty_cost = traffic_penalty
+        self.route_semaphore_penalty_cost = semaphore_penalty
+    
+    def travel_speed(self):
+        """Velocidade de deslocação em px/s (mesma fórmula do MoveBehaviour)"""
+        return max(0.1 * (self.speed / 60.0) / MOVE_PERIOD, 1e-6)
+    
+    def add_light_schedule(self, light_key, schedule):
+        """Guarda o calendário publicado de um semáforo (substitui o anterior)"""
+        self.light_schedules[light_key] = schedule
+        self.route_window = max(self.route_window, schedule.period)
+    
+    def apply_traffic_report(self, report):
+        """Atualiza a cache local de tráfego com um reporte"""
+        edge_id = report.get('edge_id')
+        if edge_id is not None:
+            self.traffic_reports[edge_id] = report
+    
+    def apply_light_update(self, node_id, orientation, state, position=None, timestamp=None):
+        """Atualiza a cache local de semáforos (chave node_id + orientação)"""
+        if not node_id:
+            return
+        position = position or {}
+        light_key = f"{node_id}_{orientation}"
+        self.traffic_lights[light_key] = {
+            'state': state,
+            'x': position.get('x', 0),
+            'y': position.get('y', 0),
+            'orientation': orientation,
+            'node_id': node_id
+        }
+        if self.kernel is not None:
+            self.kernel.set_light(light_key, state)
+        
+        # A fase começou em `timestamp`: corrigir deriva do calendário
+        schedule = self.light_schedules.get(light_key)
+        if schedule is not None and state in schedule.durations:
+            schedule.anchor(state, schedule.durations[state], timestamp or sim_time())
+    
+    def apply_ambulance_position(self, data):
+        """Atualiza a cache de ambulâncias próximas (e o seu índice espacial)"""
+        ambulance_id = data.get('ambulance_id')
+        if ambulance_id:
+            x = data.get('x') or 0
+            y = data.get('y') or 0
+            self.nearby_ambulances[ambulance_id] = {
+                'x': x,
+                'y': y,
+                'current_node': data.get('current_node'),
+                'speed': data.get('speed', 0),
+                'timestamp': sim_time()
+            }
+            self.ambulance_grid.insert(ambulance_id, x, y)
+            if self.kernel is not None:
+                self.kernel.set_ambulance(ambulance_id, x, y)
+    
+    def ambulance_near(self, x, y, radius=AMBULANCE_YIELD_RADIUS):
+        """Ambulância recente a menos de radius px de (x, y), ou None
+        
+        Consulta apenas as células da grelha vizinhas do ponto; posições com
+        mais de AMBULANCE_MAX_AGE segundos são descartadas ao serem encontradas.
+        """
+        now = sim_time()
+        for ambulance_id in self.ambulance_grid.query(x, y, radius):
+            data = self.nearby_ambulances.get(ambulance_id)
+            if data is None or now - data['timestamp'] >= AMBULANCE_MAX_AGE:
+                self.ambulance_grid.remove(ambulance_id)
+                self.nearby_ambulances.pop(ambulance_id, None)
+                continue
+            return ambulance_id
+        return None
+    
+    def edge_cost(self, from_node, to_node, edge_id):
+        """Custo de uma aresta usado na pesquisa (inf se bloqueada)
+        
+        Mesma funcao de custo do A*, avaliada em plan_time (pesquisa estatica).
+        """
+        if edge_id in self.blocked_edges:
+            return float('inf')
+        
+        slot = self.road_graph.edge_slot.get(edge_id)
+        if slot is None:
+            return float('inf')
+        return self.cost_model.cost(slot, self.plan_time)
+    
+    def repair_route(self, changed_edges):
+        """Repara a rota com D* Lite apos mudanca de bloqueios
+        
+        Reutiliza o estado de pesquisa do planeador quando o destino nao mudou,
+        reavaliando apenas os vertices afetados pelas arestas alteradas e pelas
+        penalidades de trafego/semaforos que mudaram desde a ultima reparacao.
+        
+        Args:
+            changed_edges: IDs das arestas que foram bloqueadas ou desbloqueadas
+            
+        Returns:
+            bool: True se a rota foi reparada; False para recorrer ao A* completo
+        """
+        road_graph = self.road_graph
+        if road_graph is None or self.current_node not in road_graph.node_index or self.end_node not in road_graph.node_index:
+            return False
+        
+        self.plan_time = sim_time()
+        planner = self.route_planner
+        if planner is None or planner.goal != self.end_node:
+            planner = DStarLitePlanner(self.road_graph, self.end_node, self.edge_cost)
+            self.route_planner = planner
+        else:
+            planner.update_edges(changed_edges)
+            planner.refresh_costs()
+        
+        try:
+            path = planner.plan(self.current_node)
+        except Exception as e:
+            print(f"⚠️ {self.vehicle_id}: Falha no D* Lite ({e}), a usar A* completo")
+            self.route_planner = None
+            return False
+        
+        if not path:
+            return False
+        
+        self.route = path
+        self.route_index = 0
+        self.target_node = path[0]
+        self._record_route_costs(path)
+        print(f"🔧 {self.vehicle_id}: Rota reparada (D* Lite, {planner.expanded} nós expandidos)")
+        return True
+    
+    def apply_route_tree(self, next_hops, changed_edges=()):
+        """Adota a rota extraida de uma arvore de caminhos calculada em lote
+        
+        Args:
+            next_hops: Recorte da arvore para o destino atual {no: proximo no}
+            changed_edges: Arestas alteradas (mantem o D* Lite sincronizado)
+            
+        Returns:
+            bool: True se a arvore deu uma rota valida a partir do no atual
+            (False se o no atual nao estiver no recorte)
+        """
+        if self.road_graph is None or not isinstance(next_hops, dict):
+            return False
+        
+        path = tree_route(next_hops, self.current_node, self.end_node)
+        if len(path) < 2:
+            return False
+        
+        if self.route_planner is not None:
+            self.route_planner.update_edges(changed_edges)
+        self.route = path
+        self.route_index = 0
+        self.target_node = path[0]
+        self._record_route_costs(path)
+        print(f"🌳 {self.vehicle_id}: Rota recebida do roteamento em lote ({len(path)} nós)")
+        return True
+    
     def is_edge_blocked(self, from_node, to_node):
         """Verifica se a aresta entre dois nós está bloqueada
         
@@ -286,424 +860,171 @@ class VehicleAgent(Agent):
         Returns:
             tuple: (is_blocked, edge_id) onde is_blocked é bool e edge_id é o ID da aresta (ou None)
         """
-        if from_node not in self.graph:
+        # Procurar a aresta entre from_node e to_node (indice O(1))
+        edge_id = self.edge_index.get((from_node, to_node))
+        if edge_id is None:
             return (False, None)
         
-        # Procurar a aresta entre from_node e to_node
-        for neighbor, edge_id in self.graph[from_node]:
-            if neighbor == to_node:
-                # Verificar se está bloqueada
-                is_blocked = edge_id in self.blocked_edges
-                return (is_blocked, edge_id)
-        
-        return (False, None)
+        return (edge_id in self.blocked_edges, edge_id)
+    
+    def remaining_route_edges(self):
+        """IDs das arestas ainda por percorrer (incluindo a aresta atual)"""
+        edge_ids = []
+        prev_node = self.current_node
+        for node in self.route[self.route_index:]:
+            edge_id = self.edge_index.get((prev_node, node))
+            if edge_id is not None:
+                edge_ids.append(edge_id)
+            prev_node = node
+        return edge_ids
+    
+    def route_crosses_blocked(self):
+        """Verifica se o resto da rota atravessa alguma aresta bloqueada"""
+        return any(edge_id in self.blocked_edges for edge_id in self.remaining_route_edges())
     
-    class MoveBehaviour(PeriodicBehaviour):
+    class MoveBehaviour(VehicleStepMixin, ClockedPeriodicBehaviour):
         """Behaviour para movimentacao do veiculo"""
         
         async def run(self):
             """Atualiza posicao do veiculo"""
-            if not self.agent.moving or self.agent.arrival_time is not None:
+            target_node = await self.route_step()
+            if target_node is None:
                 return
             
-            # 🚧 VERIFICAÇÃO CRÍTICA 1: Verificar se o veículo está NUMA aresta bloqueada
-            # Isso captura veículos que já estavam em movimento quando a via foi bloqueada
-            if self.agent.route and self.agent.route_index < len(self.agent.route):
+            target_x, target_y = self.agent.nodes[target_node]
+            dx = target_x - self.agent.x
+            dy = target_y - self.agent.y
+            distance = math.sqrt(dx**2 + dy**2)
+            
+            if distance > 2:
+                # 🚧 VERIFICAÇÃO CRÍTICA 3: ANTES DE MOVER, verificar se a aresta não está bloqueada
+                # Esta é uma verificação extra de segurança antes de qualquer movimento
                 current = self.agent.current_node
-                next_node = self.agent.route[self.agent.route_index]
-                
-                is_blocked, edge_id = self.agent.is_edge_blocked(current, next_node)
+                is_blocked, edge_id = self.agent.is_edge_blocked(current, target_node)
                 if is_blocked:
-                    print(f"🚨 {self.agent.vehicle_id} ({self.agent.vehicle_type}): ARESTA ATUAL {current}->{next_node} (edge {edge_id}) ESTÁ BLOQUEADA!")
-                    print(f"🚨 {self.agent.vehicle_id}: Forçando recálculo de rota...")
-                    # Forçar recálculo (veículo continua tentando a cada frame)
-                    self.agent.route = []  # Limpar rota atual
-                    return  # Retorna para recalcular no próximo frame
-            
-            # Se nao tem rota, calcular
-            if not self.agent.route:
-                # Evitar recálculo excessivo - adicionar delay entre tentativas
-                if not hasattr(self.agent, '_last_route_attempt'):
-                    self.agent._last_route_attempt = 0
-                
-                current_time = time.time()
-                # Só tentar recalcular a cada 0.5 segundos para evitar spam
-                if current_time - self.agent._last_route_attempt < 0.5:
+                    print(f"🛑 {self.agent.vehicle_id} ({self.agent.vehicle_type}): Tentou mover em aresta BLOQUEADA {current}->{target_node} (edge {edge_id})")
+                    print(f"🛑 {self.agent.vehicle_id}: Cancelando movimento e forçando recálculo...")
+                    self.agent.route = []
                     return
                 
-                self.agent._last_route_attempt = current_time
+                # SISTEMA DE RESPEITO AOS SEMÁFOROS E PRIORIDADE DE AMBULÂNCIAS
+                should_stop = False
+                stop_reason = ""
+                stop_distance = 0  # Distância ao nó quando parou
                 
-                # Medir latência do A*
-                start_astar = time.perf_counter()
-                self.agent.route = self.agent.calculate_route_astar(
-                    self.agent.current_node,
-                    self.agent.end_node
-                )
-                end_astar = time.perf_counter()
-                latency_ms = (end_astar - start_astar) * 1000
+                # 🚑 PRIORIDADE ABSOLUTA: Verificar se há ambulâncias próximas
+                # REGRA: Só ceder passagem se estiver PERTO DE UM NÓ (cruzamento)
+                if self.agent.vehicle_type != 'ambulance' and self.agent.nearby_ambulances:
+                    # Verificar distância ao próximo nó (target_node)
+                    if target_node in self.agent.nodes:
+                        target_x, target_y = self.agent.nodes[target_node]
+                        dist_to_next_node = math.sqrt((target_x - self.agent.x)**2 + (target_y - self.agent.y)**2)
+                        
+                        # Só ceder passagem se estiver PERTO do nó (50px ou menos)
+                        if dist_to_next_node <= 50:
+                            # Ambulância recente perto do PRÓXIMO NÓ (raio de 150px do nó)?
+                            amb_id = self.agent.ambulance_near(target_x, target_y)
+                            if amb_id is not None:
+                                should_stop = True
+                                stop_reason = f"AMBULANCIA_{amb_id}"
+                                stop_distance = dist_to_next_node
+                                if self.agent.waiting_time % 30 == 1:
+                                    print(f"🚑 {self.agent.vehicle_id} CEDENDO PASSAGEM para {amb_id} no nó {target_node} (dist ao nó={dist_to_next_node:.0f}px)")
                 
-                if self.agent.route:
-                    self.agent.route_index = 0
-                    self.agent.target_node = self.agent.route[0] if len(self.agent.route) > 0 else None
-                    
-                    # Enviar métricas após recálculo bem-sucedido
-                    if self.agent.metrics:
-                        try:
-                            new_cost = getattr(self.agent, 'route_total_cost', 0.0)
-                            base_cost = getattr(self.agent, 'route_base_cost', 0.0)
-                            sem_penalty = getattr(self.agent, 'route_semaphore_penalty_cost', 0.0)
-                            traffic_penalty = getattr(self.agent, 'route_traffic_penalty_cost', 0.0)
-                            
-                            # Log CSV
-                            original_cost = getattr(self.agent, '_last_route_cost', new_cost)
-                            self.agent.metrics.log_route_costs(self.agent.vehicle_id, original_cost, new_cost)
-                            self.agent.metrics.log_semaphore_penalty(self.agent.vehicle_id, base_cost, sem_penalty)
-                            self.agent.metrics.log_traffic_penalty(self.agent.vehicle_id, base_cost, traffic_penalty)
-                            self.agent.metrics.flush()
-                            
-                            # Enviar latência do A*
-                            await self._send_latency_to_dashboard(latency_ms)
-                            
-                            # Enviar via XMPP para dashboard
-                            await self._send_metrics_to_dashboard(original_cost, new_cost, sem_penalty, traffic_penalty)
-                            
-                            # Salvar custo atual para próxima comparação
-                            self.agent._last_route_cost = new_cost
-                        except Exception as e:
-                            print(f"❌ {self.agent.vehicle_id}: Erro ao enviar métricas: {e}")
-                    
-                    # Reset contador de falhas
-                    if hasattr(self.agent, '_route_fail_count'):
-                        self.agent._route_fail_count = 0
-                else:
-                    # Não há rota disponível (possivelmente devido a bloqueios)
-                    # Contar falhas consecutivas
-                    if not hasattr(self.agent, '_route_fail_count'):
-                        self.agent._route_fail_count = 0
-                    self.agent._route_fail_count += 1
-                    
-                    # Após 5 falhas consecutivas, tentar destino alternativo
-                    if self.agent._route_fail_count >= 5:
-                        print(f"⚠️ {self.agent.vehicle_id}: {self.agent._route_fail_count} tentativas falhadas para {self.agent.end_node}")
+                # 🚦 AMBULÂNCIAS IGNORAM SEMÁFOROS (modo urgência)
+                if not should_stop and self.agent.vehicle_type != 'ambulance':
+                    # Calcular distância ao próximo nó (target_node)
+                    if target_node in self.agent.nodes:
+                        target_x, target_y = self.agent.nodes[target_node]
+                        dist_to_next_node = math.sqrt((target_x - self.agent.x)**2 + (target_y - self.agent.y)**2)
                         
-                        # Para veículos normais: escolher novo destino aleatório
-                        if self.agent.vehicle_id != 'v0' and self.agent.vehicle_type != 'ambulance':
-                            nodes_list = list(self.agent.nodes.keys())
-                            available_nodes = [n for n in nodes_list if n != self.agent.current_node]
+                        # SÓ VERIFICAR SEMÁFORO SE ESTIVER PERTO DO NÓ (dentro de 60px)
+                        if dist_to_next_node <= 60:
+                            # DETERMINAR DIREÇÃO DO MOVIMENTO (horizontal ou vertical)
+                            abs_dx = abs(dx)
+                            abs_dy = abs(dy)
                             
-                            if available_nodes:  # Verificar se há nós disponíveis
-                                new_destination = random.choice(available_nodes)
-                                print(f"🔄 {self.agent.vehicle_id}: Mudando destino de {self.agent.end_node} para {new_destination}")
-                                self.agent.end_node = new_destination
-                                self.agent._route_fail_count = 0
-                                # Tentar calcular rota imediatamente para o novo destino
-                                return
+                            # LÓGICA CORRETA:
+                            # - Movimento HORIZONTAL → verifica semáforo VERTICAL (controla tráfego horizontal)
+                            # - Movimento VERTICAL → verifica semáforo HORIZONTAL (controla tráfego vertical)
+                            if abs_dx > abs_dy:
+                                light_orientation = 'vertical'
                             else:
-                                print(f"⚠️ {self.agent.vehicle_id}: Sem destinos alternativos disponíveis!")
-                        else:
-                            # Journey vehicle e ambulâncias: aguardar e resetar contador
-                            self.agent._route_fail_count = 0
-                            # Exibir mensagem apenas a cada 60 frames para não poluir o console
-                            if not hasattr(self.agent, '_retry_counter'):
-                                self.agent._retry_counter = 0
-                            self.agent._retry_counter += 1
-                            if self.agent._retry_counter % 60 == 1:
-                                print(f"⏳ {self.agent.vehicle_id} ({self.agent.vehicle_type}): Aguardando rota disponível... (tentativa {self.agent._retry_counter//60})")
-                    return
-            
-            # Mover ao longo da rota
-            if self.agent.route and self.agent.route_index < len(self.agent.route):
-                target_node = self.agent.route[self.agent.route_index]
-                
-                if target_node not in self.agent.nodes:
-                    return
-                
-                target_x, target_y = self.agent.nodes[target_node]
-                dx = target_x - self.agent.x
-                dy = target_y - self.agent.y
-                distance = math.sqrt(dx**2 + dy**2)
-                
-                if distance > 2:
-                    # 🚧 VERIFICAÇÃO CRÍTICA 3: ANTES DE MOVER, verificar se a aresta não está bloqueada
-                    # Esta é uma verificação extra de segurança antes de qualquer movimento
-                    current = self.agent.current_node
-                    is_blocked, edge_id = self.agent.is_edge_blocked(current, target_node)
-                    if is_blocked:
-                        print(f"🛑 {self.agent.vehicle_id} ({self.agent.vehicle_type}): Tentou mover em aresta BLOQUEADA {current}->{target_node} (edge {edge_id})")
-                        print(f"🛑 {self.agent.vehicle_id}: Cancelando movimento e forçando recálculo...")
-                        self.agent.route = []
-                        return
-                    
-                    # SISTEMA DE RESPEITO AOS SEMÁFOROS E PRIORIDADE DE AMBULÂNCIAS
-                    should_stop = False
-                    stop_reason = ""
-                    stop_distance = 0  # Distância ao nó quando parou
-                    
-                    # 🚑 PRIORIDADE ABSOLUTA: Verificar se há ambulâncias próximas
-                    # REGRA: Só ceder passagem se estiver PERTO DE UM NÓ (cruzamento)
-                    if self.agent.vehicle_type != 'ambulance':
-                        # Limpar ambulâncias antigas (mais de 1 segundo)
-                        current_time = time.time()
-                        self.agent.nearby_ambulances = {
-                            amb_id: data for amb_id, data in self.agent.nearby_ambulances.items()
-                            if current_time - data['timestamp'] < 1.0
-                        }
-                        
-                        # Verificar distância ao próximo nó (target_node)
-                        if target_node in self.agent.nodes:
-                            target_x, target_y = self.agent.nodes[target_node]
-                            dist_to_next_node = math.sqrt((target_x - self.agent.x)**2 + (target_y - self.agent.y)**2)
+                                light_orientation = 'horizontal'
                             
-                            # Só ceder passagem se estiver PERTO do nó (50px ou menos)
-                            if dist_to_next_node <= 50:
-                                # Verificar se há ambulância próxima ao PRÓXIMO NÓ (raio de 150px do nó)
-                                for amb_id, amb_data in self.agent.nearby_ambulances.items():
-                                    amb_x = amb_data['x']
-                                    amb_y = amb_data['y']
-                                    
-                                    # Distância da ambulância ao próximo nó
-                                    amb_dist_to_node = math.sqrt((amb_x - target_x)**2 + (amb_y - target_y)**2)
-                                    
-                                    # Se ambulância está perto do cruzamento (150px), ceder passagem
-                                    if amb_dist_to_node < 150:
-                                        should_stop = True
-                                        stop_reason = f"AMBULANCIA_{amb_id}"
-                                        stop_distance = dist_to_next_node
-                                        if self.agent.waiting_time % 30 == 1:
-                                            print(f"🚑 {self.agent.vehicle_id} CEDENDO PASSAGEM para {amb_id} no nó {target_node} (dist ao nó={dist_to_next_node:.0f}px)")
-                                        break
-                    
-                    # 🚦 AMBULÂNCIAS IGNORAM SEMÁFOROS (modo urgência)
-                    if not should_stop and self.agent.vehicle_type != 'ambulance':
-                        # Calcular distância ao próximo nó (target_node)
-                        if target_node in self.agent.nodes:
-                            target_x, target_y = self.agent.nodes[target_node]
-                            dist_to_next_node = math.sqrt((target_x - self.agent.x)**2 + (target_y - self.agent.y)**2)
+                            # Criar chave para buscar o semáforo correto
+                            light_key = f"{target_node}_{light_orientation}"
                             
-                            # SÓ VERIFICAR SEMÁFORO SE ESTIVER PERTO DO NÓ (dentro de 60px)
-                            if dist_to_next_node <= 60:
-                                # DETERMINAR DIREÇÃO DO MOVIMENTO (horizontal ou vertical)
-                                abs_dx = abs(dx)
-                                abs_dy = abs(dy)
+                            # Verificar se existe semáforo com essa orientação nesse nó
+                            if light_key in self.agent.traffic_lights:
+                                light_data = self.agent.traffic_lights[light_key]
+                                light_state = light_data.get('state', 'green')
                                 
-                                # LÓGICA CORRETA:
-                                # - Movimento HORIZONTAL → verifica semáforo VERTICAL (controla tráfego horizontal)
-                                # - Movimento VERTICAL → verifica semáforo HORIZONTAL (controla tráfego vertical)
-                                if abs_dx > abs_dy:
-                                    light_orientation = 'vertical'
-                                else:
-                                    light_orientation = 'horizontal'
+                                # DEBUG: Log ocasionalmente
+                                # if self.agent.vehicle_id == 'v0' and self.agent.waiting_time % 60 == 0:
+                                #     movement_dir = 'horizontal' if abs_dx > abs_dy else 'vertical'
+                                #     print(f"🚦 DEBUG {self.agent.vehicle_id}: movimento={movement_dir}, verifica semáforo={light_key} ({light_orientation}), estado={light_state}, dist ao nó={dist_to_next_node:.0f}px")
                                 
-                                # Criar chave para buscar o semáforo correto
-                                light_key = f"{target_node}_{light_orientation}"
+                                # REGRAS DE PARADA (baseadas na distância ao NÓ):
+                                # 1. VERMELHO: Para se estiver a menos de 50px do nó
+                                if light_state == 'red' and dist_to_next_node < 50:
+                                    should_stop = True
+                                    stop_reason = f"RED_{light_orientation[0].upper()}"
+                                    stop_distance = dist_to_next_node
                                 
-                                # Verificar se existe semáforo com essa orientação nesse nó
-                                if light_key in self.agent.traffic_lights:
-                                    light_data = self.agent.traffic_lights[light_key]
-                                    light_state = light_data.get('state', 'green')
-                                    
-                                    # DEBUG: Log ocasionalmente
-                                    # if self.agent.vehicle_id == 'v0' and self.agent.waiting_time % 60 == 0:
-                                    #     movement_dir = 'horizontal' if abs_dx > abs_dy else 'vertical'
-                                    #     print(f"🚦 DEBUG {self.agent.vehicle_id}: movimento={movement_dir}, verifica semáforo={light_key} ({light_orientation}), estado={light_state}, dist ao nó={dist_to_next_node:.0f}px")
-                                    
-                                    # REGRAS DE PARADA (baseadas na distância ao NÓ):
-                                    # 1. VERMELHO: Para se estiver a menos de 50px do nó
-                                    if light_state == 'red' and dist_to_next_node < 50:
-                                        should_stop = True
-                                        stop_reason = f"RED_{light_orientation[0].upper()}"
-                                        stop_distance = dist_to_next_node
-                                    
-                                    # 2. AMARELO: Para se estiver a menos de 30px do nó (muito perto)
-                                    elif light_state == 'yellow' and dist_to_next_node < 30:
-                                        should_stop = True
-                                        stop_reason = f"YELLOW_CLOSE_{light_orientation[0].upper()}"
-                                        stop_distance = dist_to_next_node
-                                    
-                                    # 3. VELOCIDADE ALTA + AMARELO: Para se vem muito rápido e está perto
-                                    elif light_state == 'yellow' and self.agent.speed > 250 and dist_to_next_node < 60:
-                                        should_stop = True
-                                        stop_reason = f"YELLOW_FAST_{light_orientation[0].upper()}"
-                                        stop_distance = dist_to_next_node
-                    
-                    if should_stop:
-                        # PARAR e incrementar tempo de espera
-                        self.agent.waiting_time += 1
-                        # Debug: mostrar porque parou (menos frequente)
-                        if self.agent.waiting_time % 40 == 1:  # Log a cada 40 frames
-                            dist_info = f" (dist={stop_distance:.0f}px)" if stop_distance > 0 else ""
-                            print(f"🛑 {self.agent.vehicle_id} PAROU: {stop_reason} no {target_node}{dist_info}")
-                    else:
-                        # MOVER em direção ao alvo
-                        speed_factor = 0.1 * (self.agent.speed / 60.0)
-                        self.agent.x += (dx / distance) * speed_factor
-                        self.agent.y += (dy / distance) * speed_factor
+                                # 2. AMARELO: Para se estiver a menos de 30px do nó (muito perto)
+                                elif light_state == 'yellow' and dist_to_next_node < 30:
+                                    should_stop = True
+                                    stop_reason = f"YELLOW_CLOSE_{light_orientation[0].upper()}"
+                                    stop_distance = dist_to_next_node
+                                
+                                # 3. VELOCIDADE ALTA + AMARELO: Para se vem muito rápido e está perto
+                                elif light_state == 'yellow' and self.agent.speed > 250 and dist_to_next_node < 60:
+                                    should_stop = True
+                                    stop_reason = f"YELLOW_FAST_{light_orientation[0].upper()}"
+                                    stop_distance = dist_to_next_node
+                
+                if should_stop:
+                    # PARAR e incrementar tempo de espera
+                    self.agent.waiting_time += 1
+                    # Debug: mostrar porque parou (menos frequente)
+                    if self.agent.waiting_time % 40 == 1:  # Log a cada 40 frames
+                        dist_info = f" (dist={stop_distance:.0f}px)" if stop_distance > 0 else ""
+                        print(f"🛑 {self.agent.vehicle_id} PAROU: {stop_reason} no {target_node}{dist_info}")
                 else:
-                    # Chegou ao no
-                    prev_node = self.agent.current_node
-                    self.agent.current_node = target_node
-                    self.agent.x = target_x
-                    self.agent.y = target_y
-                    self.agent.route_index += 1
-                    
-                    # 🚧 VERIFICAÇÃO CRÍTICA 2: Antes de avançar, verificar se a PRÓXIMA aresta está bloqueada
-                    if self.agent.route_index < len(self.agent.route):
-                        next_target = self.agent.route[self.agent.route_index]
-                        
-                        # Usar o método auxiliar para verificar se está bloqueada
-                        is_blocked, edge_id = self.agent.is_edge_blocked(target_node, next_target)
-                        if is_blocked:
-                            print(f"⛔ {self.agent.vehicle_id} ({self.agent.vehicle_type}): PRÓXIMA via {target_node}->{next_target} (edge {edge_id}) está BLOQUEADA!")
-                            print(f"⛔ {self.agent.vehicle_id}: Parando no nó {target_node} e recalculando...")
-                            self.agent.route = []  # Forçar recálculo completo
-                            return  # Retorna para recalcular no próximo frame
-                    
-                    # Acumular custo da aresta percorrida (para journey vehicle)
-                    if self.agent.vehicle_id == 'v0' and prev_node and self.agent.edge_start_node:
-                        # Encontrar a aresta entre edge_start_node e current_node
-                        for neighbor, edge_id in self.agent.graph.get(self.agent.edge_start_node, []):
-                            if neighbor == target_node:
-                                edge_data = self.agent.edges.get(edge_id, {})
-                                edge_weight = edge_data.get('weight', 100.0)
-                                self.agent.route_cost_traveled += edge_weight
-                                break
-                        # Atualizar para próxima aresta
-                        self.agent.edge_start_node = target_node
-                    
-                    if self.agent.route_index >= len(self.agent.route):
-                        # Chegou ao destino - FAZER LOOP A→B→A
-                        
-                        # Guardar destino atual antes da troca
-                        destination_reached = self.agent.end_node
-                        
-                        # Trocar origem e destino (inverter o caminho)
-                        temp = self.agent.start_node
-                        self.agent.start_node = self.agent.end_node
-                        self.agent.end_node = temp
-                        
-                        # Registrar custo original da rota antes de recalcular
-                        original_cost = getattr(self.agent, 'route_total_cost', 0.0)
-                        
-                        # CORREÇÃO: Recalcular rota a partir do nó ATUAL (que é o destino alcançado)
-                        # para garantir que a rota começa do ponto onde o veículo está
-                        new_route = self.agent.calculate_route_astar(self.agent.current_node, self.agent.end_node)
-                        
-                        if new_route and len(new_route) > 0:
-                            self.agent.route = new_route
-                            self.agent.route_index = 0
-                            self.agent.target_node = self.agent.route[0]
-                            # Registrar custos da nova rota e penalidades de semáforo
-                            if self.agent.metrics:
-                                try:
-                                    new_cost = getattr(self.agent, 'route_total_cost', 0.0)
-                                    base_cost = getattr(self.agent, 'route_base_cost', 0.0)
-                                    sem_penalty = getattr(self.agent, 'route_semaphore_penalty_cost', 0.0)
-                                    traffic_penalty = getattr(self.agent, 'route_traffic_penalty_cost', 0.0)
-                                    self.agent.metrics.log_route_costs(self.agent.vehicle_id, original_cost, new_cost)
-                                    self.agent.metrics.log_semaphore_penalty(self.agent.vehicle_id, base_cost, sem_penalty)
-                                    self.agent.metrics.log_traffic_penalty(self.agent.vehicle_id, base_cost, traffic_penalty)
-                                    self.agent.metrics.flush()
-                                    
-                                    # Enviar métricas para dashboard via XMPP
-                                    await self._send_metrics_to_dashboard(original_cost, new_cost, sem_penalty, traffic_penalty)
-                                except Exception:
-                                    pass
-                            # Registrar custos da nova rota
-                            if self.agent.metrics:
-                                try:
-                                    new_cost = getattr(self.agent, 'route_total_cost', 0.0)
-                                    self.agent.metrics.log_route_costs(self.agent.vehicle_id, original_cost, new_cost)
-                                    self.agent.metrics.flush()
-                                except Exception:
-                                    pass
-                            
-                            # Log apenas para alguns veículos (evitar spam)
-                            if self.agent.vehicle_id in ['v0', 'AMB0']:
-                                print(f"🔄 {self.agent.vehicle_id}: Chegou a {destination_reached}, voltando para {self.agent.end_node}")
-                        else:
-                            # SEM ROTA DISPONÍVEL - evitar loop infinito
-                            # Tentar rota alternativa para um nó adjacente primeiro
-                            print(f"⚠️ {self.agent.vehicle_id}: Sem rota direta de {self.agent.current_node} para {self.agent.end_node}")
-                            
-                            # Tentar encontrar um nó adjacente não bloqueado como destino temporário
-                            alternative_found = False
-                            if self.agent.current_node in self.agent.graph:
-                                for neighbor, edge_id in self.agent.graph[self.agent.current_node]:
-                                    if edge_id not in self.agent.blocked_edges:
-                                        # Tentar rota até este vizinho primeiro
-                                        alt_route = self.agent.calculate_route_astar(self.agent.current_node, neighbor)
-                                        if alt_route and len(alt_route) > 0:
-                                            self.agent.route = alt_route
-                                            self.agent.route_index = 0
-                                            self.agent.target_node = self.agent.route[0]
-                                            alternative_found = True
-                                            print(f"🔀 {self.agent.vehicle_id}: Usando rota alternativa via {neighbor}")
-                                            break
-                            
-                            if not alternative_found:
-                                # Última opção: manter posição e aguardar mudança de bloqueios
-                                print(f"🛑 {self.agent.vehicle_id}: Completamente bloqueado em {self.agent.current_node}, aguardando...")
-                                self.agent.route = []
-                                self.agent.waiting_time += 1
-                    else:
-                        self.agent.target_node = self.agent.route[self.agent.route_index]
+                    # MOVER em direção ao alvo
+                    speed_factor = 0.1 * (self.agent.speed / 60.0)
+                    self.agent.x += (dx / distance) * speed_factor
+                    self.agent.y += (dy / distance) * speed_factor
+            else:
+                await self.arrive(target_node)
             
             self.agent.total_travel_time += 1
+    
+    class KernelStepBehaviour(VehicleStepMixin, CyclicBehaviour):
+        """Passos discretos do veículo com o MovementKernel (sem timer próprio)
         
-        async def _send_latency_to_dashboard(self, latency_ms):
-            """Envia latência de recálculo A* para o dashboard"""
-            try:
-                msg = Message(to="dashboard@localhost")
-                msg.set_metadata("performative", "inform")
-                msg.body = json.dumps({
-                    "type": "metric_latency",
-                    "vehicle_id": self.agent.vehicle_id,
-                    "latency_ms": latency_ms
-                })
-                await self.send(msg)
-                print(f"📊 {self.agent.vehicle_id}: Latência enviada para dashboard ({latency_ms:.2f}ms)")
-            except Exception as e:
-                print(f"❌ {self.agent.vehicle_id}: Erro ao enviar latência: {e}")
+        O kernel move o veículo e acorda este behaviour quando chega a um nó,
+        fica sem alvo ou a rota muda.
+        """
         
-        async def _send_metrics_to_dashboard(self, original_cost, new_cost, sem_penalty, traffic_penalty):
-            """Envia métricas para o dashboard via XMPP"""
-            try:
-                # Métrica de rota (custos)
-                route_msg = Message(to="dashboard@localhost")
-                route_msg.set_metadata("performative", "inform")
-                route_msg.body = json.dumps({
-                    "type": "metric_route",
-                    "vehicle_id": self.agent.vehicle_id,
-                    "original_cost": original_cost,
-                    "recalculated_cost": new_cost,
-                    "deviation": new_cost / original_cost if original_cost > 0 else 1.0
-                })
-                await self.send(route_msg)
-                print(f"📊 {self.agent.vehicle_id}: Rota enviada para dashboard (orig={original_cost:.1f}, rec={new_cost:.1f})")
-                
-                # Métrica de semáforo
-                sem_msg = Message(to="dashboard@localhost")
-                sem_msg.set_metadata("performative", "inform")
-                sem_msg.body = json.dumps({
-                    "type": "metric_semaphore",
-                    "vehicle_id": self.agent.vehicle_id,
-                    "penalty": sem_penalty
-                })
-                await self.send(sem_msg)
-                print(f"📊 {self.agent.vehicle_id}: Semáforo enviado para dashboard (pen={sem_penalty:.1f})")
-                
-                # Métrica de tráfego
-                traffic_msg = Message(to="dashboard@localhost")
-                traffic_msg.set_metadata("performative", "inform")
-                traffic_msg.body = json.dumps({
-                    "type": "metric_traffic",
-                    "vehicle_id": self.agent.vehicle_id,
-                    "penalty": traffic_penalty
-                })
-                await self.send(traffic_msg)
-                print(f"📊 {self.agent.vehicle_id}: Tráfego enviado para dashboard (pen={traffic_penalty:.1f})")
-            except Exception as e:
-                print(f"❌ {self.agent.vehicle_id}: Erro ao enviar métricas: {e}")
+        async def run(self):
+            kernel = self.agent.kernel
+            slot = self.agent.kernel_slot
+            await self.agent.kernel_wakeup.wait()
+            self.agent.kernel_wakeup.clear()
+            kernel.pending[slot] = False
+            
+            arrived_node = kernel.take_arrival(slot)
+            if arrived_node is not None:
+                await self.arrive(arrived_node)
+            
+            target_node = await self.route_step()
+            if target_node is None:
+                kernel.set_target(slot, None)
+            else:
+                target_x, target_y = self.agent.nodes[target_node]
+                kernel.set_target(slot, target_node, target_x, target_y)
     
     class ReceiveMessagesBehaviour(CyclicBehaviour):
         """Behaviour para receber mensagens"""
@@ -715,30 +1036,58 @@ class VehicleAgent(Agent):
                     data = json.loads(msg.body)
                     msg_type = data.get('type')
                     
+                    # Versão da rede (chave da cache de rotas) acompanha o estado recebido
+                    if 'version' in data:
+                        self.agent.network_version = max(self.agent.network_version, data['version'])
+                    
                     if msg_type == 'network_data':
-                        # Receber dados da rede
-                        self.agent.nodes = data.get('nodes', {})
-                        edges_received = data.get('edges', {})
-                        # Converter chaves de string para int se necessário
-                        self.agent.edges = {}
-                        for key, value in edges_received.items():
-                            try:
-                                self.agent.edges[int(key)] = value
-                            except (ValueError, TypeError):
-                                self.agent.edges[key] = value
-                        self.agent.graph = data.get('graph', {})
+                        # Receber dados da rede: reutilizar o grafo do processo se existir
+                        road_graph = get_shared_graph(data.get('network_id'))
+                        if road_graph is None:
+                            edges_received = data.get('edges', {})
+                            # Converter chaves de string para int se necessário
+                            edges = {}
+                            for key, value in edges_received.items():
+                                try:
+                                    edges[int(key)] = value
+                                except (ValueError, TypeError):
+                                    edges[key] = value
+                            road_graph = CSRGraph.from_network(data.get('nodes', {}), edges)
+                            road_graph.build_landmarks(cache_dir=LANDMARK_CACHE_DIR)
+                            if data.get('network_id'):
+                                register_shared_graph(road_graph, data.get('network_id'))
+                        self.agent.set_road_graph(road_graph)
+                        self.agent.route_cache = get_route_cache(data.get('network_id'))
+                        for schedule in data.get('light_schedules', []):
+                            key = f"{schedule['node_id']}_{schedule['orientation']}"
+                            self.agent.add_light_schedule(key, LightSchedule.from_message(schedule))
                         
                         # Inicializar posicao
                         if self.agent.start_node in self.agent.nodes:
                             self.agent.x, self.agent.y = self.agent.nodes[self.agent.start_node]
                         
+                        self.agent.ready.set()
                         print(f"Vehicle {self.agent.vehicle_id} recebeu dados da rede")
                     
+                    elif msg_type == 'state_delta':
+                        # 📦 Delta do state bus: semáforos, tráfego e ambulâncias alterados
+                        for light in data.get('lights', []):
+                            self.agent.apply_light_update(
+                                light.get('node_id'), light.get('orientation'), light.get('state'),
+                                light.get('position'), light.get('timestamp')
+                            )
+                        for report in data.get('traffic', []):
+                            self.agent.apply_traffic_report(report)
+                        for ambulance in data.get('ambulances', []):
+                            self.agent.apply_ambulance_position(ambulance)
+                        # Snapshot inicial inclui os bloqueios em vigor
+                        if data.get('snapshot') and data.get('blocked_edges'):
+                            self.agent.blocked_edges = set(data['blocked_edges'])
+                            self.agent.update_reachability()
+                    
                     elif msg_type == 'traffic_report':
                         # Atualizar cache de trafego
-                        edge_id = data.get('edge_id')
-                        if edge_id:
-                            self.agent.traffic_reports[edge_id] = data
+                        self.agent.apply_traffic_report(data)
                     
                     elif msg_type == 'light_state':
                         # Atualizar cache de semaforos (formato antigo do coordinator)
@@ -751,23 +1100,17 @@ class VehicleAgent(Agent):
                     
                     elif msg_type == 'traffic_light_update':
                         # ATUALIZAÇÃO DIRETA DO SEMÁFORO via XMPP (PRIORIDADE!)
-                        node_id = data.get('node_id')
-                        orientation = data.get('orientation', 'unknown')  # 'horizontal' ou 'vertical'
-                        
-                        if node_id:
-                            position = data.get('position', {})
-                            
-                            # Criar chave única: node_id + orientação
-                            light_key = f"{node_id}_{orientation}"
-                            
-                            # Armazenar estado do semáforo com orientação
-                            self.agent.traffic_lights[light_key] = {
-                                'state': data.get('state'),
-                                'x': position.get('x', 0),
-                                'y': position.get('y', 0),
-                                'orientation': orientation,
-                                'node_id': node_id
-                            }
+                        self.agent.apply_light_update(
+                            data.get('node_id'),
+                            data.get('orientation', 'unknown'),  # 'horizontal' ou 'vertical'
+                            data.get('state'),
+                            data.get('position')
+                        )
+                    
+                    elif msg_type == 'light_schedule':
+                        # Calendário de fases de um semáforo (roteamento dependente do tempo)
+                        light_key = f"{data.get('node_id')}_{data.get('orientation')}"
+                        self.agent.add_light_schedule(light_key, LightSchedule.from_message(data))
                     
                     elif msg_type == 'recalculate_route':
                         # Forcar recalculo de rota
@@ -775,62 +1118,76 @@ class VehicleAgent(Agent):
                     
                     elif msg_type == 'ambulance_position':
                         # 🚑 RECEBER POSIÇÃO DE AMBULÂNCIA (PRIORIDADE!)
-                        ambulance_id = data.get('ambulance_id')
-                        if ambulance_id:
-                            self.agent.nearby_ambulances[ambulance_id] = {
-                                'x': data.get('x', 0),
-                                'y': data.get('y', 0),
-                                'current_node': data.get('current_node'),
-                                'speed': data.get('speed', 0),
-                                'timestamp': time.time()
-                            }
+                        self.agent.apply_ambulance_position(data)
                     
                     elif msg_type == 'blocked_edges_update':
                         # 🚧 RECEBER ATUALIZAÇÃO DE VIAS BLOQUEADAS
                         start_ts = time.perf_counter()
                         blocked = data.get('blocked_edges', [])
-                        old_count = len(self.agent.blocked_edges)
+                        old_blocked = self.agent.blocked_edges
+                        old_count = len(old_blocked)
                         self.agent.blocked_edges = set(blocked)
+                        if self.agent.kernel_slot is not None:
+                            # Revalidar a aresta atual no próximo tick do kernel
+                            self.agent.kernel.wake(self.agent.kernel_slot)
+                        changed_edges = old_blocked ^ self.agent.blocked_edges
+                        self.agent.update_reachability()
                         
-                        print(f"\n🚧 {self.agent.vehicle_id} ({self.agent.vehicle_type}): Atualização de bloqueios recebida")
-                        print(f"🚧 {self.agent.vehicle_id}: Tipo: {self.agent.vehicle_type} | Antes: {old_count} | Agora: {len(blocked)}")
-                        if len(blocked) > 0:
-                            print(f"🚧 {self.agent.vehicle_id}: Arestas bloqueadas: {sorted(list(self.agent.blocked_edges))}")
-                        
-                        # 🚨 VERIFICAÇÃO CRÍTICA IMEDIATA: Verificar se está ATUALMENTE numa via que foi bloqueada
-                        if self.agent.route and self.agent.route_index < len(self.agent.route):
-                            current_node = self.agent.current_node
-                            target_node = self.agent.route[self.agent.route_index]
+                        # 🎯 Replaneamento seletivo: o coordenador só pede replan aos veículos
+                        # cuja rota atravessa as novas vias bloqueadas
+                        if not data.get('replan', True) and not self.agent.route_crosses_blocked():
+                            if self.agent.route_planner is not None:
+                                self.agent.route_planner.update_edges(changed_edges)
+                            logger.debug("🚧 %s: Bloqueios atualizados (%d), rota não afetada", self.agent.vehicle_id, len(blocked))
+                        else:
+                            print(f"\n🚧 {self.agent.vehicle_id} ({self.agent.vehicle_type}): Atualização de bloqueios recebida")
+                            print(f"🚧 {self.agent.vehicle_id}: Tipo: {self.agent.vehicle_type} | Antes: {old_count} | Agora: {len(blocked)}")
+                            if len(blocked) > 0:
+                                print(f"🚧 {self.agent.vehicle_id}: Arestas bloqueadas: {sorted(list(self.agent.blocked_edges))}")
                             
-                            # Verificar se a aresta atual está na lista de bloqueios
-                            is_blocked, edge_id = self.agent.is_edge_blocked(current_node, target_node)
-                            if is_blocked:
-                                print(f"🚨 {self.agent.vehicle_id}: DETECTADO em via BLOQUEADA no momento da atualização!")
-                                print(f"🚨 {self.agent.vehicle_id}: Aresta {current_node}->{target_node} (edge {edge_id}) foi bloqueada")
-                                print(f"🚨 {self.agent.vehicle_id}: Interrompendo movimento e recalculando IMEDIATAMENTE!\n")
-                        
-                        print(f"🚧 {self.agent.vehicle_id}: Forçando recálculo de rota...\n")
-                        
-                        # Forçar recálculo de rota
-                        self.agent.route = []  # Força recálculo na próxima iteração
-                        end_ts = time.perf_counter()
-                        latency_ms = (end_ts - start_ts) * 1000
-                        if self.agent.metrics:
-                            try:
-                                self.agent.metrics.log_recalc_latency(self.agent.vehicle_id, start_ts, end_ts)
-                                self.agent.metrics.flush()
-                                
-                                # Enviar latência para dashboard via XMPP
-                                await self._send_latency_to_dashboard(latency_ms)
-                            except Exception:
+                            # 🚨 VERIFICAÇÃO CRÍTICA IMEDIATA: Verificar se está ATUALMENTE numa via que foi bloqueada
+                            if self.agent.route and self.agent.route_index < len(self.agent.route):
+                                current_node = self.agent.current_node
+                                target_node = self.agent.route[self.agent.route_index]
+                            
+                                # Verificar se a aresta atual está na lista de bloqueios
+                                is_blocked, edge_id = self.agent.is_edge_blocked(current_node, target_node)
+                                if is_blocked:
+                                    print(f"🚨 {self.agent.vehicle_id}: DETECTADO em via BLOQUEADA no momento da atualização!")
+                                    print(f"🚨 {self.agent.vehicle_id}: Aresta {current_node}->{target_node} (edge {edge_id}) foi bloqueada")
+                                    print(f"🚨 {self.agent.vehicle_id}: Interrompendo movimento e recalculando IMEDIATAMENTE!\n")
+                            
+                            # Rota do lote (árvore por destino) -> D* Lite -> A* completo
+                            route_tree = data.get('route_tree')
+                            if not self.agent.destination_reachable():
+                                print(f"🧭 {self.agent.vehicle_id}: Destino {self.agent.end_node} desconectado pelos bloqueios")
+                                self.agent.route = []
+                                if self.agent.route_planner is not None:
+                                    self.agent.route_planner.update_edges(changed_edges)
+                            elif (route_tree and route_tree.get('destination') == self.agent.end_node
+                                    and self.agent.apply_route_tree(route_tree.get('next_hop', {}), changed_edges)):
                                 pass
-                        
+                            elif not self.agent.repair_route(changed_edges):
+                                print(f"🚧 {self.agent.vehicle_id}: Forçando recálculo de rota...\n")
+                                self.agent.route = []  # Força recálculo na próxima iteração
+                            end_ts = time.perf_counter()
+                            latency_ms = (end_ts - start_ts) * 1000
+                            if self.agent.metrics:
+                                try:
+                                    self.agent.metrics.log_recalc_latency(self.agent.vehicle_id, start_ts, end_ts)
+                                    self.agent.metrics.flush()
+                            
+                                    # Enviar latência para dashboard via XMPP
+                                    await self._send_latency_to_dashboard(latency_ms)
+                                except Exception:
+                                    pass
+                            
                 except json.JSONDecodeError:
                     print(f"❌ Erro ao decodificar JSON: {msg.body}")
                 except Exception as e:
                     print(f"❌ Erro ao processar mensagem no veículo {self.agent.vehicle_id}: {e}")
     
-    class ReportTrafficBehaviour(PeriodicBehaviour):
+    class ReportTrafficBehaviour(ClockedPeriodicBehaviour):
         """Behaviour para reportar condicoes de trafego"""
         
         async def run(self):
@@ -842,7 +1199,7 @@ class VehicleAgent(Agent):
             if self.agent.route and self.agent.route_index < len(self.agent.route):
                 current = self.agent.current_node
                 next_node = self.agent.route[self.agent.route_index]
-                edge_id = f"{current}-{next_node}"
+                edge_id = self.agent.edge_index.get((current, next_node), f"{current}-{next_node}")
                 
                 # Calcular delay baseado no tempo de espera
                 delay = min(self.agent.waiting_time, 100)
@@ -914,7 +1271,7 @@ class VehicleAgent(Agent):
             except Exception as e:
                 print(f"❌ {self.agent.vehicle_id}: Erro ao enviar métricas: {e}")
     
-    class AmbulanceBroadcastBehaviour(PeriodicBehaviour):
+    class AmbulanceBroadcastBehaviour(ClockedPeriodicBehaviour):
         """Behaviour para ambulâncias enviarem broadcast de posição (PRIORIDADE)"""
         
         async def run(self):
@@ -928,12 +1285,13 @@ class VehicleAgent(Agent):
                 "x": self.agent.x,
                 "y": self.agent.y,
                 "current_node": self.agent.current_node,
+                "next_node": self.agent.target_node,
                 "speed": self.agent.speed
             })
             await self.send(msg)
 
 
-class TrafficLightAgent(Agent):
+class TrafficLightAgent(TransportAgent):
     """Agente de semaforo que controla um cruzamento"""
     
     def __init__(self, jid, password, node_id, orientation='horizontal', green_time=10, red_time=10, yellow_time=3, paired_light=None, offset_x=0, offset_y=0):
@@ -962,13 +1320,14 @@ class TrafficLightAgent(Agent):
         
         # Cache do estado do par (para coordenação)
         self.paired_state = None
+        self.ready = asyncio.Event()  # Definido quando o coordenador responde a request_position
     
     async def setup(self):
         """Configuracao inicial do semaforo"""
         print(f"TrafficLightAgent {self.node_id} iniciado")
         
         # Behaviour para ciclo de cores (MAIS RAPIDO - 0.5s)
-        cycle_behaviour = self.LightCycleBehaviour(period=0.5)
+        cycle_behaviour = self.LightCycleBehaviour(period=LIGHT_TICK)
         self.add_behaviour(cycle_behaviour)
         
         # Behaviour para receber mensagens
@@ -980,6 +1339,34 @@ class TrafficLightAgent(Agent):
         # Behaviour para solicitar posicao (executar uma vez)
         request_behaviour = self.RequestPositionBehaviour()
         self.add_behaviour(request_behaviour)
+        
+        # Publicar o calendário de fases (uma vez; de novo só se houver desvio)
+        schedule_behaviour = self.PublishScheduleBehaviour()
+        self.add_behaviour(schedule_behaviour)
+    
+    def schedule_message(self):
+        """Corpo da mensagem light_schedule com a fase atual como âncora"""
+        return json.dumps({
+            "type": "light_schedule",
+            "node_id": self.node_id,
+            "orientation": self.orientation,
+            "green_time": self.green_time,
+            "yellow_time": self.yellow_time,
+            "red_time": self.red_time,
+            "tick": LIGHT_TICK,
+            "state": self.state,
+            "timer": self.timer,
+            "timestamp": sim_time()
+        })
+    
+    class PublishScheduleBehaviour(OneShotBehaviour):
+        """Behaviour para publicar o calendário de fases ao coordenador"""
+        
+        async def run(self):
+            msg = Message(to="coordinator@localhost")
+            msg.set_metadata("performative", "inform")
+            msg.body = self.agent.schedule_message()
+            await self.send(msg)
     
     class RequestPositionBehaviour(OneShotBehaviour):
         """Behaviour para solicitar posicao inicial"""
@@ -994,7 +1381,11 @@ class TrafficLightAgent(Agent):
             })
             await self.send(msg)
     
-    class LightCycleBehaviour(PeriodicBehaviour):
+    def repeat_request(self):
+        """Repete request_position (sem confirmação dentro do prazo do arranque)"""
+        self.add_behaviour(self.RequestPositionBehaviour())
+    
+    class LightCycleBehaviour(ClockedPeriodicBehaviour):
         """Behaviour para ciclo de estados do semaforo com coordenação"""
         
         async def run(self):
@@ -1021,6 +1412,12 @@ class TrafficLightAgent(Agent):
                         self.agent.timer = 3  # Aguarda 3s e tenta novamente
                         agent_name = str(self.agent.jid).split('@')[0]
                         print(f"🚦 {agent_name} ({self.agent.orientation}) AGUARDANDO (par está VERDE)")
+                        
+                        # Desvio do calendário: republicar com a nova âncora
+                        msg = Message(to="coordinator@localhost")
+                        msg.set_metadata("performative", "inform")
+                        msg.body = self.agent.schedule_message()
+                        await self.send(msg)
                     else:
                         # Par não está verde, posso ir para verde
                         next_state = 'green'
@@ -1039,7 +1436,9 @@ class TrafficLightAgent(Agent):
                         "node_id": self.agent.node_id,
                         "state": self.agent.state,
                         "position": {"x": self.agent.x, "y": self.agent.y},
-                        "orientation": self.agent.orientation
+                        "orientation": self.agent.orientation,
+                        "timer": self.agent.timer,  # Duração da fase (ticks)
+                        "phase_start": sim_time()
                     })
                     await self.send(msg)
                     
@@ -1055,17 +1454,7 @@ class TrafficLightAgent(Agent):
                             "orientation": self.agent.orientation
                         })
                         await self.send(msg)
-            
-            # Também enviar estado para coordenador
-            msg = Message(to="coordinator@localhost")
-            msg.set_metadata("performative", "inform")
-            msg.body = json.dumps({
-                "type": "light_state",
-                "node_id": self.agent.node_id,
-                "state": self.agent.state,
-                "timer": self.agent.timer
-            })
-            await self.send(msg)
+            # Sem mensagens entre transições: o coordenador projeta o temporizador
     
     class ReceiveMessagesBehaviour(CyclicBehaviour):
         """Behaviour para receber mensagens, incluindo updates do semáforo par"""
@@ -1078,6 +1467,10 @@ class TrafficLightAgent(Agent):
                     msg_type = data.get('type')
                     
                     if msg_type == 'position_data':
+                        self.agent.ready.set()
+                        if not data.get('found', True):
+                            print(f"⚠️ TrafficLight {self.agent.node_id}: nó desconhecido na rede")
+                            return
                         # Receber posicao base do no
                         self.agent.x = data.get('x', 0.0)
                         self.agent.y = data.get('y', 0.0)
@@ -1095,19 +1488,46 @@ class TrafficLightAgent(Agent):
                     pass
 
 
-class CoordinatorAgent(Agent):
+class CoordinatorAgent(TransportAgent):
     """Agente Coordenador central"""
     
-    def __init__(self, jid, password, nodes, edges, graph):
+    def __init__(self, jid, password, road_graph):
         super().__init__(jid, password)
-        self.nodes = nodes
-        self.edges = edges
-        self.graph = graph
+        # Grafo CSR partilhado: veículos no mesmo processo reutilizam esta cópia
+        # (dicionários de nós/arestas só para a mensagem network_data)
+        self.road_graph = road_graph
+        self.network_id = register_shared_graph(road_graph)
+        self._network_payload = None  # (versão, corpo JSON de network_data) serializado uma vez por versão
+        # Cache de rotas partilhada: (origem, destino, versão da rede, perfil do veículo)
+        self.route_cache = RouteCache()
+        self._last_version_time = 0.0
+        self._pending_version_reason = None  # Mudança por tráfego/semáforos à espera do intervalo mínimo
+        register_route_cache(self.network_id, self.route_cache)
         self.vehicles = {}  # {vehicle_id: vehicle_agent_reference}
         self.traffic_lights = {}  # {node_id: traffic_light_agent_reference}
         self.traffic_reports = {}  # Cache de reportes
-        self.light_states = {}  # Cache de estados dos semaforos
+        self.light_states = {}  # {node_orientation: última transição (estado, timer, início da fase)}
+        self.light_projections = {}  # {node_orientation: LightSchedule} para projetar fase/temporizador
+        self.light_schedules = {}  # {node_orientation: mensagem light_schedule} (calendários publicados)
+        # Estado do mundo publicado em deltas a ritmo fixo (state bus)
+        self.world_state = WorldStateTable()
+        # Contadores do fan-out de broadcasts (um encode por broadcast)
+        self.broadcast_stats = {
+            'broadcasts': 0, 'messages': 0, 'encode_ms': 0.0, 'max_fanout': 0,
+            'ambulance_deliveries': 0, 'ambulance_suppressed': 0
+        }
         self.blocked_edges = set()  # Conjunto de arestas bloqueadas pelo disruptor
+        # Índice de rotas: {edge_id: {vehicle_jid}} e {vehicle_jid: {edge_id}}
+        self.edge_vehicles = {}
+        self.vehicle_routes = {}
+        self.vehicle_destinations = {}  # {vehicle_jid: end_node} (agrupamento do roteamento em lote)
+        self.vehicle_types = {}  # {vehicle_jid: vehicle_type} (classe de custo do roteamento em lote)
+        # Índice espacial: nós na grelha e {node_id: {vehicle_jid}} dos nós por percorrer
+        self.node_grid = UniformGrid(AMBULANCE_YIELD_RADIUS)
+        for node_id, x, y in zip(road_graph.node_ids, road_graph.xs, road_graph.ys):
+            self.node_grid.insert(node_id, x, y)
+        self.node_vehicles = {}
+        self.vehicle_route_nodes = {}
         self.statistics = {
             'total_arrivals': 0,
             'avg_travel_time': 0,
@@ -1129,14 +1549,300 @@ class CoordinatorAgent(Agent):
         template_request = Template()
         template_request.set_metadata("performative", "request")
         self.add_behaviour(request_behaviour, template_request)
+        
+        # Behaviour para publicar deltas do estado do mundo (10 Hz)
+        state_bus_behaviour = self.StateBusBehaviour(period=STATE_BUS_PERIOD)
+        self.add_behaviour(state_bus_behaviour)
+        
+        # Behaviour para exportar contadores (cache de rotas e fan-out de broadcasts)
+        metrics_behaviour = self.CoordinatorMetricsBehaviour(period=5.0)
+        self.add_behaviour(metrics_behaviour)
     
     def get_vehicle_state(self, vehicle_id):
         """Retorna estado de um veiculo (para Pygame)"""
         return self.vehicles.get(vehicle_id)
     
-    def get_light_state(self, node_id):
-        """Retorna estado de um semaforo (para Pygame)"""
-        return self.light_states.get(node_id)
+    def get_light_state(self, node_id, orientation='horizontal'):
+        """Retorna estado projetado de um semaforo (para Pygame), O(1) e sem mensagens
+        
+        Returns:
+            dict {'state', 'timer'} com os ticks restantes da fase, ou None
+        """
+        light_key = f"{node_id}_{orientation}"
+        now = sim_time()
+        projection = self.light_projections.get(light_key)
+        if projection is not None:
+            return {
+                'state': projection.state_at(now),
+                'timer': math.ceil(projection.remaining_at(now) / projection.tick)
+            }
+        
+        entry = self.light_states.get(light_key)
+        if entry is None:
+            return None
+        elapsed_ticks = (now - entry['phase_start']) / LIGHT_TICK
+        return {'state': entry['state'], 'timer': max(0, math.ceil(entry['timer'] - elapsed_ticks))}
+    
+    def record_light_phase(self, node_id, orientation, state, timer, phase_start):
+        """Regista uma transição de semáforo e re-ancora a sua projeção"""
+        light_key = f"{node_id}_{orientation}"
+        self.light_states[light_key] = {'state': state, 'timer': timer, 'phase_start': phase_start}
+        projection = self.light_projections.get(light_key)
+        if projection is not None and state in projection.durations and timer is not None:
+            projection.anchor(state, timer, phase_start)
+    
+    def record_light_schedule(self, data):
+        """Guarda um calendário publicado (mensagem light_schedule) e a sua projeção
+        
+        Só um plano de fases novo ou alterado pede nova versão da rede; uma
+        republicação com o mesmo plano (desvio da fase) apenas re-ancora.
+        """
+        light_key = f"{data.get('node_id')}_{data.get('orientation')}"
+        projection = LightSchedule.from_message(data)
+        previous = self.light_projections.get(light_key)
+        self.light_schedules[light_key] = data
+        self.light_projections[light_key] = projection
+        self._network_payload = None  # Novos veículos recebem o calendário
+        if previous is None or previous.plan != projection.plan:
+            self.request_version_bump(f"calendário {light_key}")
+    
+    @property
+    def network_version(self):
+        """Versão atual da rede (chave da cache de rotas)"""
+        return self.route_cache.version
+    
+    def bump_network_version(self, reason):
+        """Incrementa a versão da rede, invalidando rotas em cache"""
+        version = self.route_cache.bump_version()
+        print(f"🗂️  COORDENADOR: Versão da rede {version} ({reason})")
+        return version
+    
+    def request_version_bump(self, reason):
+        """Versão por tráfego ou semáforos: no máximo uma por VERSION_MIN_INTERVAL
+        
+        Dentro do intervalo o pedido fica pendente e é aplicado por
+        flush_version_bump (StateBusBehaviour), sem se perder.
+        """
+        self._pending_version_reason = reason
+        self.flush_version_bump()
+    
+    def flush_version_bump(self):
+        """Aplica o pedido de versão pendente, se o intervalo mínimo já passou"""
+        if self._pending_version_reason is None:
+            return
+        now = sim_time()
+        if now - self._last_version_time >= VERSION_MIN_INTERVAL:
+            self._last_version_time = now
+            reason, self._pending_version_reason = self._pending_version_reason, None
+            self.bump_network_version(reason)
+    
+    def update_vehicle_route(self, vehicle_jid, edge_ids):
+        """Atualiza o índice aresta -> veículos com a rota reportada"""
+        for edge_id in self.vehicle_routes.get(vehicle_jid, ()):
+            vehicles = self.edge_vehicles.get(edge_id)
+            if vehicles is not None:
+                vehicles.discard(vehicle_jid)
+                if not vehicles:
+                    del self.edge_vehicles[edge_id]
+        
+        route_edges = set(edge_ids)
+        self.vehicle_routes[vehicle_jid] = route_edges
+        for edge_id in route_edges:
+            self.edge_vehicles.setdefault(edge_id, set()).add(vehicle_jid)
+        
+        # Nós por percorrer (filtro espacial das posições de ambulâncias)
+        for node_id in self.vehicle_route_nodes.get(vehicle_jid, ()):
+            vehicles = self.node_vehicles.get(node_id)
+            if vehicles is not None:
+                vehicles.discard(vehicle_jid)
+                if not vehicles:
+                    del self.node_vehicles[node_id]
+        
+        road_graph = self.road_graph
+        route_nodes = set()
+        for edge_id in route_edges:
+            slot = road_graph.edge_slot.get(edge_id)
+            if slot is not None:
+                route_nodes.add(road_graph.node_ids[road_graph.sources[slot]])
+                route_nodes.add(road_graph.node_ids[road_graph.targets[slot]])
+        self.vehicle_route_nodes[vehicle_jid] = route_nodes
+        for node_id in route_nodes:
+            self.node_vehicles.setdefault(node_id, set()).add(vehicle_jid)
+    
+    def ambulance_recipients(self, ambulance):
+        """Veículos com algum nó por percorrer no raio de cedência da ambulância
+        
+        Considera a posição atual e o próximo nó da ambulância; veículos sem
+        rota conhecida recebem sempre (conservador).
+        """
+        points = [(ambulance.get('x') or 0, ambulance.get('y') or 0)]
+        next_index = self.road_graph.node_index.get(ambulance.get('next_node'))
+        if next_index is not None:
+            points.append((self.road_graph.xs[next_index], self.road_graph.ys[next_index]))
+        
+        recipients = {jid for jid in self.vehicles if jid not in self.vehicle_route_nodes}
+        for x, y in points:
+            for node_id in self.node_grid.query(x, y, AMBULANCE_YIELD_RADIUS):
+                recipients.update(self.node_vehicles.get(node_id, ()))
+        return recipients
+    
+    def batch_route_trees(self, vehicle_jids):
+        """Roteamento em lote: uma árvore de caminhos por destino e classe de custo
+        
+        Veículos com o mesmo destino e a mesma classe (ambulâncias ignoram
+        semáforos) partilham a árvore, calculada sobre o grafo CSR com a mesma
+        função de custo do A* (EdgeCostModel no instante atual). O Dijkstra de
+        cada grupo para quando os nós das rotas reportadas pelos seus veículos
+        ficam fixados, por isso o handler não percorre a rede inteira; cada
+        grupo recebe só esse recorte e o veículo extrai a rota do nó atual.
+        
+        Returns:
+            tuple: ({(destination, ignore_lights): {node_id: next_node_id}},
+                    {vehicle_jid: (destination, ignore_lights)})
+        """
+        groups = {}
+        for jid in vehicle_jids:
+            destination = self.vehicle_destinations.get(jid)
+            if destination is not None:
+                ignore_lights = self.vehicle_types.get(jid) == 'ambulance'
+                groups.setdefault((destination, ignore_lights), []).append(jid)
+        if not groups:
+            return {}, {}
+        
+        starts = {}
+        for key, jids in groups.items():
+            key_starts = starts.setdefault(key, set())
+            for jid in jids:
+                key_starts.update(self.vehicle_route_nodes.get(jid, ()))
+        
+        start_ts = time.perf_counter()
+        now = sim_time()
+        next_hops = {}
+        for ignore_lights in {key[1] for key in groups}:
+            cost_model = EdgeCostModel(
+                self.road_graph, self.traffic_reports, self.light_projections, self.light_states, ignore_lights
+            )
+            group_starts = {key[0]: starts[key] for key in groups if key[1] == ignore_lights}
+            trees = shortest_path_trees(
+                self.road_graph, group_starts, self.blocked_edges, cost_model.slot_costs(now), group_starts
+            )
+            for destination, (dist, next_hop) in trees.items():
+                key = (destination, ignore_lights)
+                next_hops[key] = tree_next_hops(self.road_graph, next_hop, starts[key])
+        if next_hops:
+            elapsed_ms = (time.perf_counter() - start_ts) * 1000
+            hops = sum(len(group_hops) for group_hops in next_hops.values())
+            print(f"🌳 COORDENADOR: {len(next_hops)} árvores de rotas em lote ({hops} saltos, {elapsed_ms:.1f} ms)")
+        vehicle_groups = {jid: key for key, jids in groups.items() if key in next_hops for jid in jids}
+        return next_hops, vehicle_groups
+    
+    def affected_vehicles(self, edge_ids):
+        """Veículos cuja rota atravessa alguma das arestas (ou sem rota conhecida)"""
+        affected = {jid for jid in self.vehicles if jid not in self.vehicle_routes}
+        for edge_id in edge_ids:
+            affected.update(self.edge_vehicles.get(edge_id, ()))
+        return affected
+    
+    async def fan_out(self, behaviour, payload, recipients=None):
+        """Broadcast: serializa o payload uma vez e envia o mesmo corpo em lote
+        
+        Args:
+            behaviour: Behaviour usado para enviar as mensagens
+            payload: Dicionário da mensagem (json.dumps uma única vez)
+            recipients: JIDs destino (por omissão, todos os veículos registados)
+        """
+        if recipients is None:
+            recipients = list(self.vehicles.keys())
+        
+        start_ts = time.perf_counter()
+        body = json.dumps(payload)
+        encode_ms = (time.perf_counter() - start_ts) * 1000
+        
+        stats = self.broadcast_stats
+        stats['broadcasts'] += 1
+        stats['messages'] += len(recipients)
+        stats['encode_ms'] += encode_ms
+        stats['max_fanout'] = max(stats['max_fanout'], len(recipients))
+        
+        messages = []
+        for vehicle_jid in recipients:
+            msg = Message(to=vehicle_jid)
+            msg.set_metadata("performative", "inform")
+            msg.body = body
+            messages.append(msg)
+        await asyncio.gather(*(behaviour.send(msg) for msg in messages))
+    
+    def fan_out_stats(self):
+        """Contadores do fan-out: tamanho médio/máximo e tempo de encode"""
+        stats = self.broadcast_stats
+        broadcasts = stats['broadcasts']
+        return {
+            'broadcasts': broadcasts,
+            'messages': stats['messages'],
+            'avg_fanout': stats['messages'] / broadcasts if broadcasts else 0.0,
+            'max_fanout': stats['max_fanout'],
+            'encode_ms_total': stats['encode_ms'],
+            'encode_ms_avg': stats['encode_ms'] / broadcasts if broadcasts else 0.0,
+            'encodes_saved': stats['messages'] - broadcasts,
+            'ambulance_deliveries': stats['ambulance_deliveries'],
+            'ambulance_suppressed': stats['ambulance_suppressed']
+        }
+    
+    class StateBusBehaviour(ClockedPeriodicBehaviour):
+        """Behaviour para publicar o delta do estado do mundo a todos os veículos"""
+        
+        async def run(self):
+            self.agent.flush_version_bump()
+            delta = self.agent.world_state.take_delta(self.agent.network_version)
+            if delta is None or not self.agent.vehicles:
+                return
+            
+            ambulances = delta.pop('ambulances')
+            if not ambulances:
+                await self.agent.fan_out(self, delta)
+                return
+            
+            # 🚑 Posições de ambulâncias só para os veículos no raio de cedência:
+            # agrupar veículos pelo subconjunto de ambulâncias que devem receber
+            per_vehicle = {jid: [] for jid in self.agent.vehicles}
+            for i, ambulance in enumerate(ambulances):
+                for jid in self.agent.ambulance_recipients(ambulance):
+                    if jid in per_vehicle:
+                        per_vehicle[jid].append(i)
+            
+            groups = {}
+            for jid, indices in per_vehicle.items():
+                groups.setdefault(tuple(indices), []).append(jid)
+            
+            stats = self.agent.broadcast_stats
+            has_other_changes = bool(delta['lights'] or delta['traffic'])
+            for indices, recipients in groups.items():
+                stats['ambulance_deliveries'] += len(indices) * len(recipients)
+                stats['ambulance_suppressed'] += (len(ambulances) - len(indices)) * len(recipients)
+                if not indices and not has_other_changes:
+                    continue
+                payload = dict(delta, ambulances=[ambulances[i] for i in indices])
+                await self.agent.fan_out(self, payload, recipients)
+    
+    class CoordinatorMetricsBehaviour(ClockedPeriodicBehaviour):
+        """Behaviour para enviar ao dashboard a cache de rotas e o fan-out"""
+        
+        async def run(self):
+            msg = Message(to="dashboard@localhost")
+            msg.set_metadata("performative", "inform")
+            msg.body = json.dumps({
+                "type": "metric_route_cache",
+                **self.agent.route_cache.stats()
+            })
+            await self.send(msg)
+            
+            msg = Message(to="dashboard@localhost")
+            msg.set_metadata("performative", "inform")
+            msg.body = json.dumps({
+                "type": "metric_broadcast",
+                **self.agent.fan_out_stats()
+            })
+            await self.send(msg)
     
     class ReceiveMessagesBehaviour(CyclicBehaviour):
         """Behaviour para receber informes"""
@@ -1151,59 +1857,64 @@ class CoordinatorAgent(Agent):
                     if msg_type == 'traffic_report':
                         # Armazenar reporte de trafego
                         edge_id = data.get('edge_id')
-                        if edge_id:
+                        if edge_id is not None:
+                            previous = self.agent.traffic_reports.get(edge_id, {})
                             self.agent.traffic_reports[edge_id] = data
                             
-                            # Broadcast para todos os veículos
-                            for vehicle_jid in self.agent.vehicles.keys():
-                                msg_reply = Message(to=vehicle_jid)
-                                msg_reply.set_metadata("performative", "inform")
-                                msg_reply.body = json.dumps({
-                                    "type": "traffic_report",
-                                    "vehicle_id": data.get('vehicle_id'),
-                                    "edge_id": edge_id,
-                                    "delay": data.get('delay'),
-                                    "speed": data.get('speed')
-                                })
-                                await self.send(msg_reply)
+                            # Variação significativa de atraso invalida rotas em cache
+                            delay_change = abs((data.get('delay') or 0) - (previous.get('delay') or 0))
+                            if delay_change >= TRAFFIC_VERSION_DELTA:
+                                self.agent.request_version_bump(f"tráfego em {edge_id}")
+                            
+                            # Publicado aos veículos no próximo delta do state bus
+                            self.agent.world_state.record_traffic(edge_id, {
+                                "vehicle_id": data.get('vehicle_id'),
+                                "edge_id": edge_id,
+                                "delay": data.get('delay'),
+                                "speed": data.get('speed')
+                            })
                     
-                    elif msg_type == 'light_state':
-                        # Armazenar estado do semaforo
-                        node_id = data.get('node_id')
-                        if node_id:
-                            self.agent.light_states[node_id] = {
-                                'state': data.get('state'),
-                                'timer': data.get('timer')
-                            }
+                    elif msg_type == 'light_schedule':
+                        # Calendário de fases: guardar e distribuir para todos os veículos
+                        self.agent.record_light_schedule(data)
+                        
+                        data['version'] = self.agent.network_version
+                        await self.agent.fan_out(self, data)
                     
                     elif msg_type == 'traffic_light_broadcast':
-                        # Receber broadcast de semáforo e distribuir para todos os veículos
-                        for vehicle_jid in self.agent.vehicles.keys():
-                            msg_reply = Message(to=vehicle_jid)
-                            msg_reply.set_metadata("performative", "inform")
-                            msg_reply.body = json.dumps({
-                                "type": "traffic_light_update",
-                                "node_id": data.get('node_id'),
-                                "state": data.get('state'),
-                                "position": data.get('position'),
-                                "orientation": data.get('orientation')
-                            })
-                            await self.send(msg_reply)
+                        # Receber broadcast de semáforo (distribuído no próximo delta do state bus)
+                        # Semáforos com calendário são previstos pelo A*: a mudança de fase
+                        # não invalida rotas; os restantes invalidam a cache (com limite)
+                        light_key = f"{data.get('node_id')}_{data.get('orientation')}"
+                        if light_key not in self.agent.light_schedules:
+                            self.agent.request_version_bump(f"semáforo {data.get('node_id')}")
+                        
+                        phase_start = data.get('phase_start') or sim_time()
+                        self.agent.record_light_phase(
+                            data.get('node_id'),
+                            data.get('orientation'),
+                            data.get('state'),
+                            data.get('timer'),
+                            phase_start
+                        )
+                        self.agent.world_state.record_light(
+                            data.get('node_id'),
+                            data.get('orientation'),
+                            data.get('state'),
+                            data.get('position'),
+                            phase_start
+                        )
                     
                     elif msg_type == 'ambulance_broadcast':
-                        # Receber broadcast de ambulância e distribuir para todos os veículos
-                        for vehicle_jid in self.agent.vehicles.keys():
-                            msg_reply = Message(to=vehicle_jid)
-                            msg_reply.set_metadata("performative", "inform")
-                            msg_reply.body = json.dumps({
-                                "type": "ambulance_position",
-                                "ambulance_id": data.get('ambulance_id'),
-                                "x": data.get('x'),
-                                "y": data.get('y'),
-                                "current_node": data.get('current_node'),
-                                "speed": data.get('speed')
-                            })
-                            await self.send(msg_reply)
+                        # Receber broadcast de ambulância (distribuído no próximo delta)
+                        self.agent.world_state.record_ambulance(data.get('ambulance_id'), {
+                            "ambulance_id": data.get('ambulance_id'),
+                            "x": data.get('x'),
+                            "y": data.get('y'),
+                            "current_node": data.get('current_node'),
+                            "next_node": data.get('next_node'),
+                            "speed": data.get('speed')
+                        })
                     
                     elif msg_type == 'road_disruption':
                         # Receber notificação de vias bloqueadas
@@ -1217,13 +1928,25 @@ class CoordinatorAgent(Agent):
                         print(f"📡 COORDENADOR: {len(self.agent.vehicles)} veículos registrados")
                         print("="*80 + "\n")
                         
+                        old_blocked = self.agent.blocked_edges
                         if active:
                             self.agent.blocked_edges = set(blocked)
                         else:
                             self.agent.blocked_edges = set()
+                        self.agent.world_state.set_blocked(self.agent.blocked_edges)
+                        self.agent.bump_network_version("disrupção")
                         
-                        # Broadcast para todos os veículos (CORRIGIDO: passar blocked como argumento)
-                        await self.agent.broadcast_blocked_edges(blocked)
+                        # Broadcast para todos os veículos; replan só para os afetados
+                        newly_blocked = self.agent.blocked_edges - old_blocked
+                        await self.agent.broadcast_blocked_edges(blocked, newly_blocked)
+                    
+                    elif msg_type == 'route_update':
+                        # Rota atual do veículo (índice para replaneamento seletivo)
+                        self.agent.update_vehicle_route(str(msg.sender), data.get('edges', []))
+                        if data.get('end_node') is not None:
+                            self.agent.vehicle_destinations[str(msg.sender)] = data['end_node']
+                        if data.get('vehicle_type') is not None:
+                            self.agent.vehicle_types[str(msg.sender)] = data['vehicle_type']
                     
                     elif msg_type == 'arrival':
                         # Processar chegada de veiculo
@@ -1246,37 +1969,66 @@ class CoordinatorAgent(Agent):
                 except json.JSONDecodeError:
                     pass
     
-    async def broadcast_blocked_edges(self, blocked_edges):
-        """Envia informação de bloqueios para todos os veículos usando behaviour"""
+    async def broadcast_blocked_edges(self, blocked_edges, newly_blocked=None):
+        """Envia informação de bloqueios para todos os veículos usando behaviour
+        
+        Apenas os veículos cuja rota atravessa arestas recém-bloqueadas recebem
+        pedido de replaneamento; os restantes só atualizam o conjunto de bloqueios.
+        """
+        affected = self.affected_vehicles(newly_blocked or ())
         print(f"\n📢 COORDENADOR: Iniciando broadcast de {len(blocked_edges)} bloqueios")
-        print(f"📢 COORDENADOR: Para {len(self.vehicles)} veículos: {list(self.vehicles.keys())}")
+        print(f"📢 COORDENADOR: Para {len(self.vehicles)} veículos ({len(affected)} afetados)")
+        logger.debug("📢 COORDENADOR: Veículos afetados: %s", sorted(affected))
         
         # Criar e adicionar behaviour para enviar mensagens
+        route_trees, route_groups = self.batch_route_trees(affected)
         behaviour = self.BroadcastBlockedEdgesBehaviour(
             list(self.vehicles.keys()), 
-            blocked_edges
+            blocked_edges,
+            self.network_version,
+            affected,
+            route_trees,
+            route_groups
         )
         self.add_behaviour(behaviour)
     
     class BroadcastBlockedEdgesBehaviour(OneShotBehaviour):
         """Behaviour one-shot para broadcast de bloqueios"""
         
-        def __init__(self, vehicle_jids, blocked_edges):
+        def __init__(self, vehicle_jids, blocked_edges, version, affected, route_trees=None, route_groups=None):
             super().__init__()
             self.vehicle_jids = vehicle_jids
             self.blocked_edges = blocked_edges
+            self.version = version
+            self.affected = affected
+            self.route_trees = route_trees or {}  # {(destino, ignora semáforos): {nó: próximo nó}}
+            self.route_groups = route_groups or {}  # {vehicle_jid: (destino, ignora semáforos)}
         
         async def run(self):
+            # Agrupar destinatários por corpo: sem replan, replan, replan com o
+            # recorte da árvore do seu grupo (cada grupo serializado uma única vez)
+            groups = {}
             for vehicle_jid in self.vehicle_jids:
-                msg = Message(to=vehicle_jid)
-                msg.set_metadata("performative", "inform")
-                msg.body = json.dumps({
+                replan = vehicle_jid in self.affected
+                group = self.route_groups.get(vehicle_jid) if replan else None
+                if group not in self.route_trees:
+                    group = None
+                groups.setdefault((replan, group), []).append(vehicle_jid)
+            
+            for (replan, group), recipients in groups.items():
+                payload = {
                     "type": "blocked_edges_update",
-                    "blocked_edges": self.blocked_edges
-                })
-                await self.send(msg)
-                print(f"📤 COORDENADOR: Mensagem enviada para {vehicle_jid}")
-            print(f"📡 Broadcast de bloqueios enviado para {len(self.vehicle_jids)} veículos")
+                    "blocked_edges": self.blocked_edges,
+                    "version": self.version,
+                    "replan": replan
+                }
+                if group is not None:
+                    payload["route_tree"] = {"destination": group[0], "next_hop": self.route_trees[group]}
+                await self.agent.fan_out(self, payload, recipients)
+                if replan:
+                    logger.debug("📤 COORDENADOR: Pedido de replan enviado para %s", ", ".join(recipients))
+            print(f"📡 Broadcast de bloqueios enviado para {len(self.vehicle_jids)} veículos "
+                  f"({len(self.affected & set(self.vehicle_jids))} com replan)")
     
     class RequestHandlerBehaviour(CyclicBehaviour):
         """Behaviour para responder a requisicoes"""
@@ -1296,44 +2048,67 @@ class CoordinatorAgent(Agent):
                         # Registrar veículo
                         self.agent.vehicles[vehicle_jid] = vehicle_id
                         
+                        version = self.agent.network_version
+                        if self.agent._network_payload is None or self.agent._network_payload[0] != version:
+                            # Nós/arestas para veículos noutro processo (os do mesmo processo usam network_id)
+                            road_graph = self.agent.road_graph
+                            self.agent._network_payload = (version, json.dumps({
+                                "type": "network_data",
+                                "network_id": self.agent.network_id,
+                                "version": version,
+                                "nodes": road_graph.positions,
+                                "edges": road_graph.edges,
+                                "light_schedules": list(self.agent.light_schedules.values())
+                            }))
+                        
                         reply = Message(to=vehicle_jid)
                         reply.set_metadata("performative", "inform")
-                        reply.body = json.dumps({
-                            "type": "network_data",
-                            "nodes": self.agent.nodes,
-                            "edges": self.agent.edges,
-                            "graph": self.agent.graph
-                        })
+                        reply.body = self.agent._network_payload[1]
                         await self.send(reply)
+                        
+                        # Estado atual completo; a partir daqui o veículo recebe deltas
+                        snapshot = Message(to=vehicle_jid)
+                        snapshot.set_metadata("performative", "inform")
+                        snapshot.body = json.dumps(self.agent.world_state.snapshot(version))
+                        await self.send(snapshot)
                         print(f"Enviando dados da rede para {vehicle_id} e registrando")
                     
                     elif msg_type == 'request_position':
-                        # Enviar posicao do no para semaforo
+                        # Enviar posicao do no para semaforo (sempre responde: confirma o arranque)
                         node_id = data.get('node_id')
-                        if node_id in self.agent.nodes:
-                            x, y = self.agent.nodes[node_id]
-                            reply = Message(to=str(msg.sender))
-                            reply.set_metadata("performative", "inform")
+                        reply = Message(to=str(msg.sender))
+                        reply.set_metadata("performative", "inform")
+                        node_index = self.agent.road_graph.node_index.get(node_id)
+                        if node_index is not None:
+                            x, y = self.agent.road_graph.xs[node_index], self.agent.road_graph.ys[node_index]
                             reply.body = json.dumps({
                                 "type": "position_data",
                                 "node_id": node_id,
+                                "found": True,
                                 "x": x,
                                 "y": y
                             })
-                            await self.send(reply)
                             print(f"Enviando posicao para semaforo {node_id}")
+                        else:
+                            reply.body = json.dumps({
+                                "type": "position_data",
+                                "node_id": node_id,
+                                "found": False
+                            })
+                        await self.send(reply)
                     
                 except json.JSONDecodeError:
                     pass
 
 
-class DisruptorAgent(Agent):
+class DisruptorAgent(TransportAgent):
     """Agente Disruptor - Gera bloqueios aleatórios em vias"""
     
-    def __init__(self, jid, password, edges):
+    def __init__(self, jid, password, road_graph):
         super().__init__(jid, password)
-        self.edges = edges  # Lista de todas as arestas disponíveis
+        self.road_graph = road_graph  # Grafo CSR com todas as arestas disponíveis
         self.blocked_edges = set()  # Conjunto de IDs de arestas bloqueadas
+        self.blocked_version = 0  # Incrementa a cada novo conjunto de bloqueios (cache do desenho)
         self.coordinator_jid: Optional[str] = None
         self.disruption_active = False
         
@@ -1353,17 +2128,18 @@ class DisruptorAgent(Agent):
         """Ativa disrupção bloqueando N RUAS (2N arestas - ambos os sentidos)"""
         if not self.disruption_active:
             # Identificar vias do perímetro (menos críticas para bloquear)
-            # Vias do perímetro conectam nós (0,0), (0,5), (5,0), (5,5)
-            perimeter_nodes = {'0_0', '0_5', '5_0', '5_5'}
+            # Vias do perímetro conectam os cantos da rede (caixa envolvente do grafo)
+            road_graph = self.road_graph
+            perimeter_nodes = road_graph.corner_nodes
             
             # Criar dicionário de PARES de arestas (ida e volta)
             # Chave: tupla ordenada (nodeA, nodeB), Valor: lista de edge_ids
             road_pairs = {}
-            for edge_id, edge_data in self.edges.items():
-                from_node = edge_data['from']
-                to_node = edge_data['to']
+            for source, target, edge_id in zip(road_graph.sources, road_graph.targets, road_graph.edge_ids):
+                from_node = road_graph.node_ids[source]
+                to_node = road_graph.node_ids[target]
                 
-                # Evitar bloquear vias que conectam diretamente os 4 cantos
+                # Evitar bloquear vias que conectam diretamente os cantos
                 is_perimeter = (from_node in perimeter_nodes and to_node in perimeter_nodes)
                 
                 if not is_perimeter:
@@ -1379,12 +2155,15 @@ class DisruptorAgent(Agent):
                 selected_roads = random.sample(available_roads, num_roads)
                 
                 # Bloquear TODAS as arestas das ruas selecionadas (ambos sentidos)
-                self.blocked_edges = set()
+                # Conjunto novo, publicado já completo (a interface lê-o noutra thread)
+                blocked_edges = set()
                 for road_key in selected_roads:
                     for edge_id in road_pairs[road_key]:
-                        self.blocked_edges.add(edge_id)
+                        blocked_edges.add(edge_id)
+                self.blocked_edges = blocked_edges
                 
                 self.disruption_active = True
+                self.blocked_version += 1
                 
                 # Mostrar quais ruas foram bloqueadas (ambos sentidos)
                 blocked_info = []
@@ -1415,6 +2194,7 @@ class DisruptorAgent(Agent):
         if self.disruption_active:
             self.blocked_edges = set()
             self.disruption_active = False
+            self.blocked_version += 1
             print(f"\n" + "="*80)
             print(f"✅ DISRUPTOR: Disrupção DESATIVADA!")
             print(f"✅ DISRUPTOR: Todas as vias liberadas")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Indice espacial em grelha uniforme
+- UniformGrid: pontos (chave -> x, y) agrupados em celulas quadradas; uma
+  consulta por raio so visita as celulas que intersetam o circulo
+"""
+
+import math
+from typing import Dict, Hashable, List, Tuple
+
+
+class UniformGrid:
+    """Grelha uniforme de celulas com lado cell_size (px)
+
+    Com cell_size igual ao raio tipico de consulta, cada consulta visita no
+    maximo 3x3 celulas, independentemente do numero de pontos indexados.
+    """
+
+    def __init__(self, cell_size: float):
+        self.cell_size = float(cell_size)
+        self.cells: Dict[Tuple[int, int], Dict[Hashable, Tuple[float, float]]] = {}
+        self.positions: Dict[Hashable, Tuple[float, float]] = {}
+
+    def _cell(self, x, y):
+        return (int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size)))
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def insert(self, key, x, y):
+        """Insere ou move um ponto"""
+        if key in self.positions:
+            self.remove(key)
+        self.positions[key] = (x, y)
+        self.cells.setdefault(self._cell(x, y), {})[key] = (x, y)
+
+    def remove(self, key):
+        """Remove um ponto (ignora chaves desconhecidas)"""
+        position = self.positions.pop(key, None)
+        if position is None:
+            return
+        cell = self._cell(*position)
+        bucket = self.cells.get(cell)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self.cells[cell]
+
+    def query(self, x, y, radius) -> List[Hashable]:
+        """Chaves dos pontos a distancia estritamente menor que radius de (x, y)"""
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+        radius_sq = radius * radius
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = self.cells.get((cx, cy))
+                if not bucket:
+                    continue
+                for key, (px, py) in bucket.items():
+                    if (px - x) ** 2 + (py - y) ** 2 < radius_sq:
+                        found.append(key)
+        return found
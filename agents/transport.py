@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transporte de mensagens selecionável para os agentes SPADE
+- xmpp (padrão): ligação ao servidor XMPP (Prosody), para execuções distribuídas
+- local: sem servidor; as mensagens são entregues diretamente nas filas
+  asyncio dos behaviours dos agentes do mesmo processo
+- TransportAgent: classe base dos agentes com o transporte escolhido
+  (mesma semântica de send/receive em ambos os modos)
+"""
+
+from spade.agent import Agent
+
+from .spade_compat import require_tested_spade
+
+TRANSPORT_XMPP = "xmpp"
+TRANSPORT_LOCAL = "local"
+TRANSPORTS = (TRANSPORT_XMPP, TRANSPORT_LOCAL)
+
+_transport = TRANSPORT_XMPP
+
+
+def set_transport(name):
+    """Define o transporte usado pelos agentes iniciados a partir daqui"""
+    global _transport
+    if name not in TRANSPORTS:
+        raise ValueError(f"Transporte desconhecido: {name} (opções: {', '.join(TRANSPORTS)})")
+    if name == TRANSPORT_LOCAL:
+        require_tested_spade("O transporte local")
+    _transport = name
+
+
+def get_transport():
+    """Transporte atual ('xmpp' ou 'local')"""
+    return _transport
+
+
+class LocalContainer:
+    """Entrega em memória entre agentes do processo (sem XMPP)
+
+    Envolve o Container do SPADE: mensagens para agentes registados vão
+    diretamente para as filas dos behaviours (dispatch); mensagens para JIDs
+    fora do processo (ex.: dashboard noutro processo) são descartadas e contadas.
+    """
+
+    def __init__(self, container):
+        self._container = container
+        self.delivered = 0
+        self.dropped = 0
+        self._dropped_jids = set()
+
+    def __getattr__(self, name):
+        return getattr(self._container, name)
+
+    async def send(self, msg, behaviour):
+        to = str(msg.to)
+        if self._container.has_agent(to):
+            self._container.get_agent(to).dispatch(msg)
+            self.delivered += 1
+            return
+        self.dropped += 1
+        if to not in self._dropped_jids:
+            self._dropped_jids.add(to)
+            print(f"📭 Transporte local: {to} não está neste processo (mensagens descartadas)")
+
+
+_local_container = None
+
+
+def local_container(container):
+    """LocalContainer partilhado pelos agentes do processo"""
+    global _local_container
+    if _local_container is None or _local_container._container is not container:
+        _local_container = LocalContainer(container)
+    return _local_container
+
+
+class TransportAgent(Agent):
+    """Agente SPADE com transporte selecionável (ver set_transport)
+
+    No modo local não há ligação nem registo no servidor: o agente executa
+    setup() e inicia os behaviours, e send()/receive() usam as mesmas filas
+    asyncio que o SPADE usa para entregas dentro do processo.
+
+    Substitui os métodos públicos start()/stop(); o modo local replica o
+    arranque do SPADE sem a ligação e usa internos (_alive e os hooks de
+    plugins), por isso set_transport("local") exige a série testada
+    (spade_compat).
+    """
+
+    transport = None  # Transporte com que o agente foi iniciado
+
+    async def start(self, auto_register=True):
+        self.transport = get_transport()
+        if self.transport != TRANSPORT_LOCAL:
+            return await super().start(auto_register=auto_register)
+
+        self.set_container(local_container(self.container))
+        await self._hook_plugin_before_connection()
+        await self._hook_plugin_after_connection()
+        await self.setup()
+        self._alive.set()
+        for behaviour in self.behaviours:
+            if not behaviour.is_running:
+                behaviour.set_agent(self)
+                behaviour.start()
+
+    async def stop(self):
+        if self.transport != TRANSPORT_LOCAL:
+            return await super().stop()
+
+        for behaviour in self.behaviours:
+            behaviour.kill()
+        if self.web.is_started():
+            await self.web.runner.cleanup()
+        self._alive.clear()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tabela de estado do mundo mantida pelo coordenador (state bus)
+- WorldStateTable: estados dos semaforos, atrasos por aresta, posicoes das
+  ambulancias e arestas bloqueadas, com registo das entradas alteradas
+- take_delta(): delta compacto e numerado (seq) publicado a ritmo fixo
+- snapshot(): estado completo para veiculos que entram mais tarde
+"""
+
+from typing import Dict, Optional
+
+
+class WorldStateTable:
+    """Estado partilhado com versoes incrementais
+
+    Os eventos recebidos pelo coordenador atualizam a tabela; cada chamada a
+    take_delta() devolve apenas as entradas alteradas desde o delta anterior
+    (a ultima atualizacao de cada entrada ganha).
+    """
+
+    def __init__(self):
+        self.seq = 0  # Numero do ultimo delta publicado
+        self.lights: Dict[str, dict] = {}  # {node_orientation: estado}
+        self.traffic: Dict[object, dict] = {}  # {edge_id: reporte}
+        self.ambulances: Dict[str, dict] = {}  # {ambulance_id: posicao}
+        self.blocked_edges = set()
+        self._dirty_lights = set()
+        self._dirty_traffic = set()
+        self._dirty_ambulances = set()
+
+    def record_light(self, node_id, orientation, state, position=None, timestamp=None):
+        """Regista a fase atual de um semaforo"""
+        key = f"{node_id}_{orientation}"
+        self.lights[key] = {
+            'node_id': node_id,
+            'orientation': orientation,
+            'state': state,
+            'position': position or {},
+            'timestamp': timestamp
+        }
+        self._dirty_lights.add(key)
+
+    def record_traffic(self, edge_id, report):
+        """Regista o ultimo reporte de trafego de uma aresta"""
+        self.traffic[edge_id] = report
+        self._dirty_traffic.add(edge_id)
+
+    def record_ambulance(self, ambulance_id, position):
+        """Regista a ultima posicao conhecida de uma ambulancia"""
+        self.ambulances[ambulance_id] = position
+        self._dirty_ambulances.add(ambulance_id)
+
+    def set_blocked(self, blocked_edges):
+        """Atualiza as arestas bloqueadas (publicadas pelo broadcast de bloqueios)"""
+        self.blocked_edges = set(blocked_edges)
+
+    def has_changes(self):
+        return bool(self._dirty_lights or self._dirty_traffic or self._dirty_ambulances)
+
+    def take_delta(self, version=None) -> Optional[dict]:
+        """Delta desde a ultima chamada (None se nada mudou)"""
+        if not self.has_changes():
+            return None
+        self.seq += 1
+        delta = {
+            "type": "state_delta",
+            "seq": self.seq,
+            "version": version,
+            "lights": [self.lights[key] for key in self._dirty_lights],
+            "traffic": [self.traffic[edge_id] for edge_id in self._dirty_traffic],
+            "ambulances": [self.ambulances[amb_id] for amb_id in self._dirty_ambulances]
+        }
+        self._dirty_lights.clear()
+        self._dirty_traffic.clear()
+        self._dirty_ambulances.clear()
+        return delta
+
+    def snapshot(self, version=None) -> dict:
+        """Estado completo no mesmo formato de um delta (seq atual)"""
+        return {
+            "type": "state_delta",
+            "seq": self.seq,
+            "version": version,
+            "snapshot": True,
+            "lights": list(self.lights.values()),
+            "traffic": list(self.traffic.values()),
+            "ambulances": list(self.ambulances.values()),
+            "blocked_edges": sorted(self.blocked_edges, key=str)
+        }
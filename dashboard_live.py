@@ -40,17 +40,24 @@ class DashboardAgent(Agent):
         # Estrutura de dados acumulados por veículo
         self._accumulated_data = {}
         
-        # Definir TODOS os veículos esperados
-        self.all_vehicles = ['v0'] + [f'v{i}' for i in range(1, 11)] + [f'AMB{i}' for i in range(4)]
+        # Contadores da cache de rotas do coordenador
+        self.route_cache_stats = {}
+        self.broadcast_stats = {}
         
-        # Inicializar estrutura
-        for vid in self.all_vehicles:
-            self._accumulated_data[vid] = {
-                'latency': [],
-                'route': [],
-                'sem': [],
-                'traffic': []
-            }
+        # Veículos da frota padrão (outros são acrescentados ao chegarem métricas)
+        self.all_vehicles = []
+        for vid in ['v0'] + [f'v{i}' for i in range(1, 11)] + [f'AMB{i}' for i in range(4)]:
+            self.add_vehicle(vid)
+    
+    def add_vehicle(self, vid):
+        """Acrescenta uma linha (vazia) para o veículo"""
+        self.all_vehicles.append(vid)
+        self._accumulated_data[vid] = {
+            'latency': [],
+            'route': [],
+            'sem': [],
+            'traffic': []
+        }
     
     class ReceiveMetricsBehaviour(CyclicBehaviour):
         """Recebe métricas dos veículos via XMPP."""
@@ -65,10 +72,20 @@ class DashboardAgent(Agent):
                     
                     # print(f"📨 Recebida mensagem: {msg_type} de {vid}")  # DEBUG
                     
-                    if vid not in self.agent.all_vehicles:
-                        # print(f"⚠️ Veículo {vid} não reconhecido")  # DEBUG
+                    if msg_type == 'metric_route_cache':
+                        self.agent.route_cache_stats = data
+                        return
+                    
+                    if msg_type == 'metric_broadcast':
+                        self.agent.broadcast_stats = data
                         return
                     
+                    if not vid:
+                        return
+                    if vid not in self.agent._accumulated_data:
+                        # Frotas derivadas da rede podem ter mais veículos
+                        self.agent.add_vehicle(vid)
+                    
                     if msg_type == 'metric_latency':
                         lat = data.get('latency_ms')
                         if lat and lat not in self.agent._accumulated_data[vid]['latency']:
@@ -123,16 +140,17 @@ class DashboardAgent(Agent):
         table.add_column("Pen. Sem", justify="right", style="yellow", width=10)
         table.add_column("Pen. Tráf", justify="right", style="yellow", width=10)
         
-        # Tipo por veículo
-        tipo_map = {
-            'v0': ('A→B', '🟣'),
-            **{f'v{i}': ('Normal', '🔵') for i in range(1, 11)},
-            **{f'AMB{i}': ('Ambulância', '🔴') for i in range(4)}
-        }
-        
         # Adicionar linhas
         for vid in self.all_vehicles:
-            tipo, emoji = tipo_map.get(vid, ('?', '⚪'))
+            # Tipo por veículo (prefixo do ID)
+            if vid == 'v0':
+                tipo, emoji = ('A→B', '🟣')
+            elif vid.startswith('AMB'):
+                tipo, emoji = ('Ambulância', '🔴')
+            elif vid.startswith('v'):
+                tipo, emoji = ('Normal', '🔵')
+            else:
+                tipo, emoji = ('?', '⚪')
             data = self._accumulated_data.get(vid, {})
             
             # Calcular estatísticas
@@ -206,7 +224,17 @@ class DashboardAgent(Agent):
         
         # Footer
         now = datetime.now().strftime("%H:%M:%S")
-        footer_text = f"🔄 Última atualização: {now} | Dados via XMPP | Pressione ESPAÇO na simulação | Ctrl+C para sair"
+        cache = self.route_cache_stats
+        cache_text = ""
+        if cache:
+            cache_text = (f" | 🗂️ Cache rotas: {cache.get('hits', 0)} hits / {cache.get('misses', 0)} misses "
+                          f"({cache.get('hit_rate', 0) * 100:.0f}%), v{cache.get('version', 0)}")
+        fan_out = self.broadcast_stats
+        if fan_out:
+            cache_text += (f" | 📡 Broadcasts: {fan_out.get('broadcasts', 0)} "
+                           f"(fan-out médio {fan_out.get('avg_fanout', 0):.1f}, "
+                           f"encode {fan_out.get('encode_ms_avg', 0):.3f} ms)")
+        footer_text = f"🔄 Última atualização: {now} | Dados via XMPP{cache_text} | Pressione ESPAÇO na simulação | Ctrl+C para sair"
         layout["footer"].update(Panel(footer_text, border_style="dim"))
         
         return layout
@@ -3,7 +3,7 @@
 """
 Simulacao Dinamica de Trafego com SPADE + Pygame
 - Agentes SPADE reais (VehicleAgent, TrafficLightAgent, CoordinatorAgent, DisruptorAgent)
-- Comunicacao XMPP via Prosody
+- Comunicacao XMPP via Prosody (ou transporte local em memoria: --transport local)
 - Visualizacao avancada com Pygame
 - Roteamento inteligente A*
 - Sistema de disrupção de vias (bloqueios aleatórios)
@@ -20,6 +20,17 @@ Cada rua é bloqueada em AMBOS os sentidos (ida e volta) para simular bloqueio f
 Os veículos recalculam automaticamente suas rotas usando A* para evitar as vias bloqueadas.
 As vias bloqueadas são exibidas em VERMELHO com um X no meio.
 Pressione ESPAÇO novamente para remover os bloqueios.
+
+Uso:
+    python live_dynamic_spade.py [--transport {xmpp,local}]
+    python live_dynamic_spade.py --headless [--duration S] [--trips N] [--metrics-dir DIR]
+    python live_dynamic_spade.py --kernel  (movimento vetorizado num MovementKernel central)
+    python live_dynamic_spade.py --headless --clock stepped --transport local --duration 3600
+    (relógio em passos fixos: 1h simulada tão rápido quanto o CPU permitir)
+    python live_dynamic_spade.py --scenario scenarios/default.json [--seed N] [--save-scenario FILE]
+    python live_dynamic_spade.py --headless --grid-size 50  (grelha 50x50, frota e semáforos derivados)
+    python live_dynamic_spade.py --headless --nodes nodes.csv --edges edges.csv [--bidirectional]
+    (local: sem servidor Prosody; o dashboard noutro processo não recebe métricas)
 """
 
 ## TODO: Implementar logica de reroute dinamico para ambulancias
@@ -32,23 +43,43 @@ Pressione ESPAÇO novamente para remover os bloqueios.
 ## TODO: Primeiro veiculo a parar no semafro vermelho deve parar junto deste e nao longe dele
 
 
-import pygame # type: ignore
 import sys
+import os
+import csv
+import argparse
 import asyncio
 import threading
 import time
-import random
 import math
 from typing import Dict, List, Optional
 
+try:
+    import pygame # type: ignore
+except ImportError:  # Modo headless não precisa de Pygame
+    pygame = None
+
 # Import dos agentes SPADE
-from agents.spade_traffic_agents import VehicleAgent, TrafficLightAgent, CoordinatorAgent, DisruptorAgent
+from agents.spade_traffic_agents import MOVE_PERIOD, VehicleAgent, TrafficLightAgent, CoordinatorAgent, DisruptorAgent
+from agents.movement import MovementKernel
+from agents.sim_clock import SteppedClock, get_clock, set_clock, sim_sleep, sim_time
+from agents.scenario import Scenario, add_scenario_arguments, light_username, scenario_from_args, vehicle_username
+from agents.network_loader import ROAD_TYPES, load_network
+from agents.lru_cache import LRUCache
+from agents.road_network import LANDMARK_CACHE_DIR
+from agents.transport import TRANSPORTS, TRANSPORT_XMPP, get_transport, set_transport
 
 # Configuracoes Pygame
 WINDOW_WIDTH = 1400
 WINDOW_HEIGHT = 900
 SIDEBAR_WIDTH = 300
 FPS = 30
+HEADLESS_POLL = 0.1  # Intervalo (s) de atualização das estatísticas no modo headless
+STARTUP_CONCURRENCY = 50  # Agentes a arrancar em simultâneo (ligações XMPP em paralelo)
+READY_TIMEOUT = 10.0  # Prazo (s) para a confirmação do coordenador antes de repetir o pedido
+READY_RETRIES = 2
+VEHICLE_ICON_SIZE = 16
+HEADING_STEPS = 72  # Rotações pré-calculadas por tipo de veículo (passos de 5°)
+TEXT_CACHE_CAPACITY = 4096  # Textos renderizados guardados (rótulos, pesos das ruas, botões)
 
 # Cores
 COLOR_BG = (26, 26, 46)
@@ -69,47 +100,81 @@ COLOR_ACCENT = (102, 126, 234)
 COLOR_DISTANCE_LABEL = (150, 150, 200)
 COLOR_BLOCKED_ROAD = (200, 50, 50)  # Vermelho para vias bloqueadas
 
-# Tipos de ruas e seus pesos (TODAS COM MESMA LARGURA - 2 faixas bem visíveis)
-ROAD_TYPES = {
-    'highway': {'speed_limit': 100, 'weight': 5.0, 'color': (100, 100, 100), 'width': 24},
-    'main': {'speed_limit': 80, 'weight': 15.0, 'color': (85, 85, 85), 'width': 24},
-    'secondary': {'speed_limit': 60, 'weight': 30.0, 'color': (70, 70, 70), 'width': 24},
-    'residential': {'speed_limit': 40, 'weight': 50.0, 'color': (60, 60, 60), 'width': 24}
-}
-
-# Tamanho da grid (reduzido para 6x6)
-GRID_SIZE = 6
-
+class TextCache(LRUCache):
+    """Cache LRU de textos renderizados, chaveada por (fonte, texto, cor)
+    
+    A maioria dos rótulos (IDs, pesos, botões, legenda) não muda entre
+    frames; só os textos novos passam pelo font.render.
+    """
+    
+    def __init__(self, capacity=TEXT_CACHE_CAPACITY):
+        super().__init__(capacity)
+    
+    def render(self, font, text, color):
+        """Superfície do texto (antialiased), da cache ou renderizada agora"""
+        key = (font, text, color)
+        surface = self.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.put(key, surface)
+        return surface
 
 class SPADETrafficSimulation:
     """Simulacao de trafego com agentes SPADE + visualizacao Pygame"""
     
-    def __init__(self):
-        pygame.init()
-        
-        # Configuração de tela com suporte a fullscreen
+    def __init__(self, headless=False, kernel=False, scenario=None, landmark_cache=LANDMARK_CACHE_DIR):
+        self.headless = headless  # Sem janela, fontes nem desenho (execuções batch/CI)
+        self.landmark_cache = landmark_cache  # Pasta da cache das tabelas ALT (None: sem cache)
+        # Cenário: pesos, semáforos, frota e disrupções (semente global reprodutível)
+        self.scenario = scenario or Scenario()
+        self.scenario.seed_runtime()
+        # Motor central de movimento vetorizado (em vez de um MoveBehaviour por veículo)
+        self.movement_kernel = MovementKernel() if kernel else None
+        self.sim_duration = None  # Duração (s simulados) para o relógio em passos
         self.is_fullscreen = False
         self.windowed_size = (WINDOW_WIDTH, WINDOW_HEIGHT)
-        self.screen = pygame.display.set_mode(self.windowed_size, pygame.RESIZABLE)
-        pygame.display.set_caption("SPADE Traffic Simulation - Comunicacao XMPP Real")
+        self.screen = None
         
-        self.clock = pygame.time.Clock()
-        self.font_title = pygame.font.SysFont('Arial', 24, bold=True)
-        self.font_stats = pygame.font.SysFont('Arial', 16, bold=True)
-        self.font_label = pygame.font.SysFont('Arial', 12)
-        # Fonte Unicode para símbolos simples
-        self.font_symbols = pygame.font.SysFont('Arial Unicode MS,DejaVu Sans', 18)
+        if not headless:
+            if pygame is None:
+                raise RuntimeError("Pygame não instalado: use --headless ou instale com: pip install pygame")
+            pygame.init()
+            
+            # Configuração de tela com suporte a fullscreen
+            self.screen = pygame.display.set_mode(self.windowed_size, pygame.RESIZABLE)
+            pygame.display.set_caption("SPADE Traffic Simulation - Comunicacao XMPP Real")
+            
+            self.clock = pygame.time.Clock()
+            self.font_title = pygame.font.SysFont('Arial', 24, bold=True)
+            self.font_stats = pygame.font.SysFont('Arial', 16, bold=True)
+            self.font_label = pygame.font.SysFont('Arial', 12)
+            # Fonte Unicode para símbolos simples
+            self.font_symbols = pygame.font.SysFont('Arial Unicode MS,DejaVu Sans', 18)
         
         # Rede
-        self.nodes = {}
-        self.nodes_simple = {}  # {node_id: (x, y)} para agentes
-        self.edges = {}
-        self.edges_simple = {}  # {edge_id: {'from', 'to', 'weight'}} para agentes
-        self.graph = {}
+        self.nodes = {}  # Desenho (apenas com janela)
+        self.edges = {}  # Desenho (apenas com janela)
+        self.road_graph = None  # CSRGraph partilhado pelos agentes do processo
         self.load_network_with_weights()
         
-        # Viewport
-        self.viewport = self._calculate_viewport()
+        # Camada pré-desenhada das ruas (invalidada pelo viewport e pelos bloqueios)
+        self.road_layer = None
+        self.road_layer_version = None
+        
+        # Sprites dos veículos: {(tipo, passo de rotação): (superfície, meia largura, meia altura)}
+        self.vehicle_icons = {}
+        self.vehicle_sprites = {}
+        self.journey_badge = None
+        
+        # Textos renderizados e bloco estático de estatísticas (refeito só quando as contagens mudam)
+        self.text_cache = TextCache()
+        self.stats_block = None
+        self.stats_block_lines = None
+        if not headless:
+            self.build_vehicle_sprites()
+        
+        # Viewport (apenas com janela)
+        self.viewport = None if headless else self._calculate_viewport()
         
         # Agentes SPADE
         self.coordinator_agent = None
@@ -125,13 +190,17 @@ class SPADETrafficSimulation:
         self.running = False
         self.asyncio_loop = None
         self.agent_thread = None
+        self.agents_ready = threading.Event()  # Todos os agentes confirmados pelo coordenador
+        self.startup_started = None
+        self.startup_time = None  # Duração (s) do arranque até à barreira
+        self.first_move_time = None  # Tempo (s) desde o início do arranque até ao 1.º movimento
         
         # Controlo de velocidade global da simulacao
         self.speed_multiplier = 2.0  # Multiplicador de velocidade (2.0x a 5.0x) - AUMENTADO
         self.slider_dragging = False
         
         # Controlo de tempo para cálculo de espera
-        self.last_update_time = time.time()
+        self.last_update_time = sim_time()
         
         # Estatisticas
         self.stats = {
@@ -145,175 +214,58 @@ class SPADETrafficSimulation:
             'journey_last_position': None  # Última posição para calcular distância percorrida
         }
         
-        # Pontos A e B para journey vehicle
-        self.point_a = "0_0"  # Canto superior esquerdo
-        grid_max = GRID_SIZE - 1
-        self.point_b = str(grid_max) + "_" + str(grid_max)  # Canto inferior direito
+        # Pontos A e B para journey vehicle (primeiro e último nó: cantos da grelha)
+        self.point_a = self.road_graph.node_ids[0]
+        self.point_b = self.road_graph.node_ids[-1]
+        
+        # Frota (origens/destinos do cenário ou sorteados com a semente)
+        self.fleet = self.scenario.vehicles(self.road_graph.node_ids, self.point_a, self.point_b)
+        for spec in self.fleet:
+            if spec['type'] == 'journey':
+                self.point_a, self.point_b = spec['from'], spec['to']
+        self.stats['total_vehicles'] = len(self.fleet)
         
         print("🚀 Simulacao SPADE inicializada!")
-        print("   Nos: " + str(len(self.nodes)))
-        print("   Arestas: " + str(len(self.edges)))
+        print(f"   Cenário: {self.scenario.name} (seed={self.scenario.seed})")
+        print("   Nos: " + str(self.road_graph.num_nodes))
+        print("   Arestas: " + str(self.road_graph.num_edges))
         print("   Semaforos: " + str(len(self.traffic_light_nodes)))
     
     def load_network_with_weights(self):
-        """Carrega rede 6x6 com pesos diferentes e GRID RETO"""
-        base_spacing = 200  # Espaçamento uniforme
-        
-        # Criar nos SEM VARIAÇÃO (grid perfeitamente reto)
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                node_id = f"{row}_{col}"
-                x = col * base_spacing + 50  # Margem - SEM variação
-                y = row * base_spacing + 50  # SEM variação
-                
-                self.nodes[node_id] = {
-                    'id': node_id,
-                    'x': x,
-                    'y': y,
-                    'row': row,
-                    'col': col
-                }
-                self.nodes_simple[node_id] = (x, y)
-        
-        # Criar arestas com pesos variados para cada tipo de rua
-        edge_id = 0
-        for row in range(GRID_SIZE):
-            for col in range(GRID_SIZE):
-                from_id = f"{row}_{col}"
-                
-                # Horizontal
-                if col < GRID_SIZE - 1:
-                    to_id = f"{row}_{col + 1}"
-                    from_node = self.nodes[from_id]
-                    to_node = self.nodes[to_id]
-                    dx = to_node['x'] - from_node['x']
-                    dy = to_node['y'] - from_node['y']
-                    real_distance = math.sqrt(dx * dx + dy * dy)
-                    
-                    # Tipo de rua (perimetricas = highway, internas variam)
-                    if row == 0 or row == GRID_SIZE-1 or col == 0:
-                        road_type = 'highway'
-                    elif row == 2 or col == 2:
-                        road_type = 'main'
-                    elif row == 3:
-                        road_type = 'secondary'
-                    else:
-                        road_type = 'residential'
-                    
-                    # Peso com variacao
-                    base_weight = ROAD_TYPES[road_type]['weight']
-                    weight = base_weight * random.uniform(0.8, 1.5)
-                    
-                    # Esquerda -> Direita
-                    self.edges[edge_id] = {
-                        'id': edge_id,
-                        'from': from_id,
-                        'to': to_id,
-                        'type': road_type,
-                        'weight': weight,
-                        'distance': real_distance,
-                        'speed_limit': ROAD_TYPES[road_type]['speed_limit']
-                    }
-                    self.edges_simple[edge_id] = {
-                        'from': from_id,
-                        'to': to_id,
-                        'weight': weight
-                    }
-                    edge_id += 1
-                    
-                    # Direita -> Esquerda (dois sentidos)
-                    self.edges[edge_id] = {
-                        'id': edge_id,
-                        'from': to_id,
-                        'to': from_id,
-                        'type': road_type,
-                        'weight': weight,
-                        'distance': real_distance,
-                        'speed_limit': ROAD_TYPES[road_type]['speed_limit']
-                    }
-                    self.edges_simple[edge_id] = {
-                        'from': to_id,
-                        'to': from_id,
-                        'weight': weight
-                    }
-                    edge_id += 1
-                
-                # Vertical
-                if row < GRID_SIZE - 1:
-                    to_id = f"{row + 1}_{col}"
-                    from_node = self.nodes[from_id]
-                    to_node = self.nodes[to_id]
-                    dx = to_node['x'] - from_node['x']
-                    dy = to_node['y'] - from_node['y']
-                    real_distance = math.sqrt(dx * dx + dy * dy)
-                    
-                    if col == 0 or col == GRID_SIZE-1 or row == 0:
-                        road_type = 'highway'
-                    elif col == 2 or row == 2:
-                        road_type = 'main'
-                    elif col == 3:
-                        road_type = 'secondary'
-                    else:
-                        road_type = 'residential'
-                    
-                    base_weight = ROAD_TYPES[road_type]['weight']
-                    weight = base_weight * random.uniform(0.8, 1.5)
-                    
-                    # Cima -> Baixo
-                    self.edges[edge_id] = {
-                        'id': edge_id,
-                        'from': from_id,
-                        'to': to_id,
-                        'type': road_type,
-                        'weight': weight,
-                        'distance': real_distance,
-                        'speed_limit': ROAD_TYPES[road_type]['speed_limit']
-                    }
-                    self.edges_simple[edge_id] = {
-                        'from': from_id,
-                        'to': to_id,
-                        'weight': weight
-                    }
-                    edge_id += 1
-                    
-                    # Baixo -> Cima (dois sentidos)
-                    self.edges[edge_id] = {
-                        'id': edge_id,
-                        'from': to_id,
-                        'to': from_id,
-                        'type': road_type,
-                        'weight': weight,
-                        'distance': real_distance,
-                        'speed_limit': ROAD_TYPES[road_type]['speed_limit']
-                    }
-                    self.edges_simple[edge_id] = {
-                        'from': to_id,
-                        'to': from_id,
-                        'weight': weight
-                    }
-                    edge_id += 1
-        
-        # Construir grafo
-        self.build_graph()
+        """Carrega a rede do cenário (grelha de qualquer tamanho ou ficheiros externos)"""
+        self.road_graph = load_network(self.scenario, ROAD_TYPES)
+        # Tabelas ALT partilhadas por todos os veículos (lidas da cache em disco se já calculadas)
+        self.road_graph.build_landmarks(cache_dir=self.landmark_cache)
+        # Os agentes trabalham sobre os arrays CSR; as vistas em dicionário do
+        # CSRGraph só são construídas quando (e se) alguém as usa
+        
+        # Dicionários de desenho apenas com janela
+        if not self.headless:
+            self.build_render_views()
     
-    def build_graph(self):
-        """Constroi grafo de adjacencia para A*"""
-        self.graph = {node_id: [] for node_id in self.nodes}
-        
-        for edge in self.edges.values():
-            from_id = edge['from']
-            to_id = edge['to']
-            self.graph[from_id].append((to_id, edge['id']))
+    def build_render_views(self):
+        """Nós e arestas (com tipo de rua) para o desenho Pygame"""
+        road_graph = self.road_graph
+        self.nodes = {
+            node_id: {'id': node_id, 'x': road_graph.xs[i], 'y': road_graph.ys[i]}
+            for i, node_id in enumerate(road_graph.node_ids)
+        }
+        self.edges = {}
+        for slot, edge_id in enumerate(road_graph.edge_ids):
+            self.edges[edge_id] = {
+                'id': edge_id,
+                'from': road_graph.node_ids[road_graph.sources[slot]],
+                'to': road_graph.node_ids[road_graph.targets[slot]],
+                'type': road_graph.road_types[slot] if road_graph.road_types[slot] in ROAD_TYPES else 'residential',
+                'weight': road_graph.weights[slot],
+                'distance': road_graph.distances[slot],
+                'speed_limit': road_graph.speed_limits[slot]
+            }
     
     def create_traffic_light_list(self):
-        """Define lista de nos com semaforos (10 cruzamentos × 2 direções = 20 semáforos)"""
-        # Apenas 10 cruzamentos estratégicos
-        self.traffic_light_nodes = [
-            # Cantos principais (4)
-            "1_1", "1_4", "4_1", "4_4",
-            # Internos críticos (6)
-            "2_2", "2_3", "3_2", "3_3", "1_3", "3_1"
-        ]
+        """Define lista de nos com semaforos (cada cruzamento × 2 direções)"""
+        # Cruzamentos do cenário (ou sorteados entre os da rede; 10 na grelha 6x6)
+        self.traffic_light_nodes = self.scenario.light_nodes(self.road_graph)
         
         # Criar configurações para pares de semáforos (H + V)
         # Com offset visual para não ficarem sobrepostos
@@ -323,23 +275,26 @@ class SPADETrafficSimulation:
             self.traffic_light_configs.append({
                 'node_id': node_id,
                 'orientation': 'horizontal',
-                'jid': f"tl_{node_id}_h@localhost",
-                'paired_jid': f"tl_{node_id}_v@localhost",
+                'jid': f"{light_username(node_id, 'horizontal')}@localhost",
+                'paired_jid': f"{light_username(node_id, 'vertical')}@localhost",
                 'offset_x': 0,      # Sem offset horizontal
-                'offset_y': -25     # 25px ACIMA do nó
+                'offset_y': -25,    # 25px ACIMA do nó
+                'plan': self.scenario.light_plan(node_id, 'horizontal')
             })
             # Vertical (controla tráfego norte-sul) - deslocado À ESQUERDA do nó
             self.traffic_light_configs.append({
                 'node_id': node_id,
                 'orientation': 'vertical',
-                'jid': f"tl_{node_id}_v@localhost",
-                'paired_jid': f"tl_{node_id}_h@localhost",
+                'jid': f"{light_username(node_id, 'vertical')}@localhost",
+                'paired_jid': f"{light_username(node_id, 'horizontal')}@localhost",
                 'offset_x': -25,    # 25px À ESQUERDA do nó
-                'offset_y': 0       # Sem offset vertical
+                'offset_y': 0,      # Sem offset vertical
+                'plan': self.scenario.light_plan(node_id, 'vertical')
             })
     
     def _calculate_viewport(self):
         """Calcula area visivel do mapa"""
+        self.road_layer = None  # Nova escala/resolução: redesenhar a camada das ruas
         if not self.nodes:
             return {'min_x': 0, 'max_x': 1400, 'min_y': 0, 'max_y': 900, 'scale': 1.0}
         
@@ -407,39 +362,37 @@ class SPADETrafficSimulation:
     async def start_agents(self):
         """Inicia todos os agentes SPADE"""
         print("\n🚀 Iniciando agentes SPADE...")
+        self.startup_started = time.perf_counter()
+        link = "Prosody" if get_transport() == TRANSPORT_XMPP else "transporte local"
         
         # 1. Iniciar Coordenador
         print("📡 Iniciando CoordinatorAgent...")
         self.coordinator_agent = CoordinatorAgent(
             "coordinator@localhost",
             "coordinator",  # Senha = nome do agente
-            self.nodes_simple,
-            self.edges_simple,
-            self.graph
+            self.road_graph
         )
         await self.coordinator_agent.start(auto_register=False)
-        print("   ✅ CoordinatorAgent conectado ao Prosody")
+        print(f"   ✅ CoordinatorAgent conectado ({link})")
         
         # 1.5. Iniciar Disruptor
         print("🚧 Iniciando DisruptorAgent...")
         self.disruptor_agent = DisruptorAgent(
             "disruptor@localhost",
             "disruptor",
-            self.edges_simple
+            self.road_graph
         )
         self.disruptor_agent.coordinator_jid = "coordinator@localhost"
         await self.disruptor_agent.start(auto_register=False)  # Requer registro prévio
-        print("   ✅ DisruptorAgent conectado ao Prosody")
-        
-        await asyncio.sleep(0.5)
+        print(f"   ✅ DisruptorAgent conectado ({link})")
         
-        # 2. Iniciar Semaforos (20 agentes: 10 cruzamentos × 2 direções)
+        # 2. Iniciar Semaforos (2 agentes por cruzamento: H + V), em paralelo
         print(f"🚦 Iniciando {len(self.traffic_light_configs)} TrafficLightAgents (pares H+V)...")
         for config in self.traffic_light_configs:
-            # Temporizadores RAPIDOS
-            green_time = random.randint(5, 12)
-            red_time = random.randint(5, 10)
-            yellow_time = random.randint(1, 2)
+            # Temporizadores RAPIDOS (plano do cenário)
+            green_time = config['plan']['green']
+            red_time = config['plan']['red']
+            yellow_time = config['plan']['yellow']
             
             # Extrair username do JID (ex: "tl_0_0_h@localhost" -> "tl_0_0_h")
             username = config['jid'].split('@')[0]
@@ -457,95 +410,127 @@ class SPADETrafficSimulation:
                 config['offset_x'],  # Offset visual em X
                 config['offset_y']   # Offset visual em Y
             )
-            await tl_agent.start(auto_register=False)
             self.traffic_light_agents.append(tl_agent)
-            await asyncio.sleep(0.02)
+        await self.start_all(self.traffic_light_agents)
         
+        # Barreira: todos os semáforos receberam a posição do coordenador
+        await self.wait_ready(self.traffic_light_agents, "TrafficLightAgents")
         print(f"   ✅ {len(self.traffic_light_agents)} TrafficLightAgents conectados (pares coordenados)")
-
         
-        # Aguardar semaforos receberem posicoes
-        await asyncio.sleep(0.5)
+        # 3. Iniciar Veiculos (frota do cenário: 1 journey + carros + AMB), em paralelo
+        journeys = [v for v in self.fleet if v['type'] == 'journey']
+        cars = [v for v in self.fleet if v['type'] == 'car']
+        ambulances = [v for v in self.fleet if v['type'] == 'ambulance']
+        print(f"🚗 Iniciando {len(journeys) + len(cars)} VehicleAgents ({len(journeys)} journey + {len(cars)} carros) "
+              f"e {len(ambulances)} AmbulanceAgents (AMB)...")
         
-        # 3. Iniciar Veiculos (15 agentes: 1 journey + 10 carros + 4 AMB)
-        print("🚗 Iniciando 15 VehicleAgents (11 carros + 4 AMB)...")
+        # Ordem da frota preservada em vehicle_agents (o journey vehicle é o primeiro)
+        for spec in journeys + cars + ambulances:
+            self.vehicle_agents.append(self.create_vehicle(spec))
+        await self.start_all(self.vehicle_agents)
         
-        # Veiculo 0: Journey vehicle ÚNICO (A -> B)
-        v0 = VehicleAgent(
-            "vehicle_0@localhost",
-            "vehicle_0",
-            "v0",
-            self.point_a,
-            self.point_b,
-            'journey'
-        )
-        await v0.start(auto_register=False)
-        self.vehicle_agents.append(v0)
-        await asyncio.sleep(0.1)
-        
-        # Veiculos 1-10: 10 carros normais
-        for i in range(1, 11):
-            nodes_list = list(self.nodes.keys())
-            start = random.choice(nodes_list)
-            end = random.choice([n for n in nodes_list if n != start])
-            
-            username = f"vehicle_{i}"
-            password = username
-            
-            v_agent = VehicleAgent(
-                f"{username}@localhost",
-                password,
-                f"v{i}",
-                start,
-                end,
-                'car'
-            )
-            await v_agent.start(auto_register=False)
-            self.vehicle_agents.append(v_agent)
-            await asyncio.sleep(0.1)
-        
-        print(f"   ✅ {len(self.vehicle_agents)} VehicleAgents conectados (carros)")
-        
-        # 4. Iniciar Ambulâncias (4 agentes AMB independentes)
-        print("🚑 Iniciando 4 AmbulanceAgents (AMB)...")
-        for i in range(4):
-            nodes_list = list(self.nodes.keys())
-            start = random.choice(nodes_list)
-            end = random.choice([n for n in nodes_list if n != start])
-            
-            username = f"amb_{i}"
-            password = username
-            
-            amb_agent = VehicleAgent(
-                f"{username}@localhost",
-                password,
-                f"AMB{i}",
-                start,
-                end,
-                'ambulance'
-            )
-            await amb_agent.start(auto_register=False)
-            self.vehicle_agents.append(amb_agent)
-            await asyncio.sleep(0.1)
+        # Barreira: todos os veículos receberam a rede do coordenador
+        await self.wait_ready(self.vehicle_agents, "VehicleAgents")
         
         print(f"   ✅ Total: {len(self.vehicle_agents)} agentes de movimento")
-        print(f"   🎯 1 journey vehicle (v0: A->B)")
-        print(f"   🚗 10 carros normais (v1-v10)")
-        print(f"   🚑 4 ambulâncias AMB (AMB0-AMB3)")
+        if self.movement_kernel:
+            asyncio.ensure_future(self.movement_kernel.run(MOVE_PERIOD))
+        print(f"   🎯 {len(journeys)} journey vehicle (v0: A->B)")
+        print(f"   🚗 {len(cars)} carros normais")
+        print(f"   🚑 {len(ambulances)} ambulâncias AMB")
         
+        self.startup_time = time.perf_counter() - self.startup_started
         print("")
-        print("✅ Todos os agentes SPADE iniciados!")
-        print("📡 Comunicacao XMPP via Prosody ativa")
-        print(f"   🎯 1 journey vehicle (v0: A->B)")
-        print(f"   � 4 ambulâncias AMB (AMB0-AMB3)")
-        print(f"   🚗 10 carros normais (v1-v10)")
-        print("\n✅ Todos os agentes SPADE iniciados!")
-        print("📡 Comunicacao XMPP via Prosody ativa\n")
+        print(f"✅ Todos os agentes SPADE iniciados e prontos em {self.startup_time:.2f}s!")
+        print(f"📡 Comunicacao ativa ({link})\n")
+    
+    async def start_all(self, agents):
+        """Inicia os agentes em paralelo (no máximo STARTUP_CONCURRENCY ao mesmo tempo)"""
+        limit = asyncio.Semaphore(STARTUP_CONCURRENCY)
+        
+        async def start_one(agent):
+            async with limit:
+                await agent.start(auto_register=False)
+        
+        await asyncio.gather(*(start_one(agent) for agent in agents))
+    
+    async def wait_ready(self, agents, label):
+        """Aguarda a confirmação do coordenador (ready) de todos os agentes
+        
+        Os agentes sem confirmação dentro de READY_TIMEOUT repetem o pedido
+        (até READY_RETRIES vezes); os restantes ficam registados no aviso.
+        """
+        pending = [agent for agent in agents if not agent.ready.is_set()]
+        for attempt in range(READY_RETRIES + 1):
+            if not pending:
+                return True
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(agent.ready.wait() for agent in pending)), READY_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                pass
+            pending = [agent for agent in pending if not agent.ready.is_set()]
+            if pending and attempt < READY_RETRIES:
+                print(f"⏳ {len(pending)} {label} sem confirmação do coordenador; a repetir o pedido...")
+                for agent in pending:
+                    agent.repeat_request()
+        if pending:
+            print(f"⚠️ {len(pending)} {label} sem confirmação após {READY_RETRIES + 1} tentativas: "
+                  + ", ".join(str(agent.jid) for agent in pending[:5]))
+        return not pending
+    
+    def create_vehicle(self, spec):
+        """Cria um VehicleAgent a partir de uma entrada da frota do cenário"""
+        # JIDs registados no Prosody: vehicle_<n> (v<n>) e amb_<n> (AMB<n>)
+        username = vehicle_username(spec)
+        password = username  # Senha = nome do agente
+        
+        return VehicleAgent(
+            f"{username}@localhost",
+            password,
+            spec['id'],
+            spec['from'],
+            spec['to'],
+            spec['type'],
+            kernel=self.movement_kernel
+        )
+    
+    async def watch_first_move(self):
+        """Regista o tempo até ao primeiro movimento de um veículo (desde o arranque)"""
+        origins = [(v.x, v.y) for v in self.vehicle_agents]
+        while self.running and self.first_move_time is None:
+            for vehicle, origin in zip(self.vehicle_agents, origins):
+                if (vehicle.x, vehicle.y) != origin:
+                    self.first_move_time = time.perf_counter() - self.startup_started
+                    print(f"⏱️  Primeiro movimento ({vehicle.vehicle_id}) {self.first_move_time:.2f}s após o início do arranque")
+                    return
+            await sim_sleep(MOVE_PERIOD)
+    
+    async def run_scheduled_disruptions(self):
+        """Aplica as disrupções agendadas no cenário (instantes em s simulados)"""
+        started = sim_time()
+        for event in self.scenario.disruptions():
+            await sim_sleep(max(0.0, started + event.get('at', 0) - sim_time()))
+            if not self.disruptor_agent:
+                return
+            print(f"📅 Cenário: disrupção agendada em t={event.get('at', 0)}s")
+            if event.get('clear'):
+                self.disruptor_agent.deactivate_disruption()
+            else:
+                if self.disruptor_agent.disruption_active:
+                    self.disruptor_agent.deactivate_disruption()
+                self.disruptor_agent.activate_disruption(num_roads=event.get('roads', 3))
     
     async def stop_agents(self):
         """Para todos os agentes SPADE"""
         print("\n🛑 Parando agentes SPADE...")
         
+        if self.movement_kernel:
+            self.movement_kernel.stop()
+        if not get_clock().realtime:
+            get_clock().stop()
+        
         for vehicle in self.vehicle_agents:
             await vehicle.stop()
         
@@ -562,8 +547,17 @@ class SPADETrafficSimulation:
         self.asyncio_loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.asyncio_loop)
         
-        # Iniciar agentes
+        # Iniciar agentes (termina na barreira: todos confirmados pelo coordenador)
         self.asyncio_loop.run_until_complete(self.start_agents())
+        self.agents_ready.set()
+        self.asyncio_loop.create_task(self.watch_first_move())
+        
+        # Relógio em passos: o tempo simulado só começa a correr após o arranque
+        clock = get_clock()
+        if not clock.realtime:
+            self.asyncio_loop.create_task(clock.run(duration=self.sim_duration))
+        if self.scenario.disruptions():
+            self.asyncio_loop.create_task(self.run_scheduled_disruptions())
         
         # Manter loop rodando
         try:
@@ -586,8 +580,9 @@ class SPADETrafficSimulation:
         self.agent_thread = threading.Thread(target=self.agent_loop, daemon=True)
         self.agent_thread.start()
         
-        # Aguardar agentes iniciarem
-        time.sleep(5)
+        # Aguardar a barreira de arranque (ou o fim da thread, se o arranque falhar)
+        while not self.agents_ready.wait(0.1) and self.agent_thread.is_alive():
+            pass
         
         print("✅ Simulacao iniciada!")
     
@@ -623,15 +618,15 @@ class SPADETrafficSimulation:
             
             # Iniciar cronômetro quando o veículo começa a se mover
             if self.stats['journey_start_time'] is None and journey_vehicle.moving:
-                self.stats['journey_start_time'] = time.time()
+                self.stats['journey_start_time'] = sim_time()
                 self.stats['journey_last_position'] = (journey_vehicle.x, journey_vehicle.y)
                 print(f"⏱️  Cronômetro iniciado para Journey vehicle!")
             
             # Calcular tempo de viagem
             if self.stats['journey_start_time'] is not None and journey_vehicle.arrival_time is None:
-                self.stats['journey_travel_time'] = time.time() - self.stats['journey_start_time']
+                self.stats['journey_travel_time'] = sim_time() - self.stats['journey_start_time']
             
-            self.last_update_time = time.time()
+            self.last_update_time = sim_time()
             
             # Atualizar custo da rota do journey vehicle (peso das arestas)
             if hasattr(journey_vehicle, 'route_total_cost'):
@@ -670,9 +665,38 @@ class SPADETrafficSimulation:
         
         return surface
     
-    def draw(self):
-        """Desenha a simulacao com ruas UNIFORMES de 2 faixas bem visíveis"""
-        self.screen.fill(COLOR_BG)
+    def build_vehicle_sprites(self):
+        """Pré-desenha os ícones (um por tipo) e as suas rotações quantizadas"""
+        for vehicle_type in ('journey', 'ambulance', 'car'):
+            icon = self.draw_vehicle_icon(vehicle_type, size=VEHICLE_ICON_SIZE)
+            self.vehicle_icons[vehicle_type] = icon
+            for step in range(HEADING_STEPS):
+                rotated = pygame.transform.rotate(icon, -step * 360 / HEADING_STEPS)
+                self.vehicle_sprites[(vehicle_type, step)] = (
+                    rotated, rotated.get_width() // 2, rotated.get_height() // 2
+                )
+        
+        # Etiqueta "A→B" por cima do veículo journey
+        label_ab = self.font_stats.render("A→B", True, (255, 255, 255))
+        self.journey_badge = pygame.Surface((label_ab.get_width() + 6, label_ab.get_height() + 4))
+        self.journey_badge.fill((147, 51, 234))
+        self.journey_badge.set_alpha(200)
+        self.journey_badge.blit(label_ab, (3, 2))
+    
+    def vehicle_sprite(self, vehicle_type, angle):
+        """Sprite em cache do tipo de veículo para a direção mais próxima (graus)"""
+        if vehicle_type not in self.vehicle_icons:
+            vehicle_type = 'car'
+        step = round(angle * HEADING_STEPS / 360) % HEADING_STEPS
+        return self.vehicle_sprites[(vehicle_type, step)]
+    
+    def render_road_layer(self, blocked_version):
+        """Pré-desenha a camada estática (fundo, ruas, pesos, nós e marcadores A/B)"""
+        surface = pygame.Surface(self.screen.get_size()).convert()
+        blocked = set()
+        if self.disruptor_agent and self.disruptor_agent.disruption_active:
+            blocked = self.disruptor_agent.blocked_edges
+        surface.fill(COLOR_BG)
         
         # Desenhar arestas UNIFORMES com 2 faixas bem definidas
         drawn_edges = set()  # Para evitar desenhar duas vezes a mesma aresta visual
@@ -691,10 +715,7 @@ class SPADETrafficSimulation:
             to_pos = self.world_to_screen(to_node['x'], to_node['y'])
             
             # Verificar se a via está bloqueada
-            edge_id = edge['id']
-            is_blocked = False
-            if self.disruptor_agent and self.disruptor_agent.disruption_active:
-                is_blocked = edge_id in self.disruptor_agent.blocked_edges
+            is_blocked = edge['id'] in blocked
             
             # LARGURA UNIFORME para todas as ruas (16px = 2 faixas de 8px cada)
             road_width = 16
@@ -704,19 +725,19 @@ class SPADETrafficSimulation:
                 color = COLOR_BLOCKED_ROAD
                 
                 # 1. Desenhar borda preta externa (calçada)
-                pygame.draw.line(self.screen, (30, 30, 30), from_pos, to_pos, road_width + 4)
+                pygame.draw.line(surface, (30, 30, 30), from_pos, to_pos, road_width + 4)
                 
                 # 2. Desenhar rua bloqueada (vermelho)
-                pygame.draw.line(self.screen, color, from_pos, to_pos, road_width)
+                pygame.draw.line(surface, color, from_pos, to_pos, road_width)
                 
                 # 3. Desenhar X no meio da via
                 mid_x = (from_pos[0] + to_pos[0]) // 2
                 mid_y = (from_pos[1] + to_pos[1]) // 2
                 x_size = 15
-                pygame.draw.line(self.screen, (255, 255, 255), 
+                pygame.draw.line(surface, (255, 255, 255), 
                                (mid_x - x_size, mid_y - x_size), 
                                (mid_x + x_size, mid_y + x_size), 3)
-                pygame.draw.line(self.screen, (255, 255, 255), 
+                pygame.draw.line(surface, (255, 255, 255), 
                                (mid_x - x_size, mid_y + x_size), 
                                (mid_x + x_size, mid_y - x_size), 3)
             else:
@@ -724,13 +745,13 @@ class SPADETrafficSimulation:
                 color = ROAD_TYPES[edge['type']]['color']
                 
                 # 1. Desenhar borda preta externa (calçada)
-                pygame.draw.line(self.screen, (30, 30, 30), from_pos, to_pos, road_width + 4)
+                pygame.draw.line(surface, (30, 30, 30), from_pos, to_pos, road_width + 4)
                 
                 # 2. Desenhar rua (asfalto cinza)
-                pygame.draw.line(self.screen, color, from_pos, to_pos, road_width)
+                pygame.draw.line(surface, color, from_pos, to_pos, road_width)
                 
                 # 3. Desenhar linha divisória central AMARELA (faixa dupla bem visível)
-                pygame.draw.line(self.screen, COLOR_LANE_DIVIDER, from_pos, to_pos, 2)
+                pygame.draw.line(surface, COLOR_LANE_DIVIDER, from_pos, to_pos, 2)
             
             # 4. Desenhar linhas brancas nas bordas (marcação de faixa) - apenas se não bloqueada
             if not is_blocked:
@@ -749,12 +770,12 @@ class SPADETrafficSimulation:
                     # Borda superior (linha branca)
                     border1_start = (from_pos[0] + perp_x * offset, from_pos[1] + perp_y * offset)
                     border1_end = (to_pos[0] + perp_x * offset, to_pos[1] + perp_y * offset)
-                    pygame.draw.line(self.screen, (200, 200, 200), border1_start, border1_end, 1)
+                    pygame.draw.line(surface, (200, 200, 200), border1_start, border1_end, 1)
                     
                     # Borda inferior (linha branca)
                     border2_start = (from_pos[0] - perp_x * offset, from_pos[1] - perp_y * offset)
                     border2_end = (to_pos[0] - perp_x * offset, to_pos[1] - perp_y * offset)
-                    pygame.draw.line(self.screen, (200, 200, 200), border2_start, border2_end, 1)
+                    pygame.draw.line(surface, (200, 200, 200), border2_start, border2_end, 1)
             
             # Mostrar peso da rua no meio (ou "BLOCKED" se bloqueada)
             mid_x = (from_pos[0] + to_pos[0]) // 2
@@ -767,34 +788,46 @@ class SPADETrafficSimulation:
                 weight_text = f"{int(edge['weight'])}"
                 text_color = COLOR_DISTANCE_LABEL
             
-            weight_surface = self.font_label.render(weight_text, True, text_color)
+            weight_surface = self.render_text(self.font_label, weight_text, text_color)
             
             # Fundo semi-transparente para legibilidade
             text_rect = weight_surface.get_rect(center=(mid_x, mid_y))
             bg_rect = text_rect.inflate(4, 2)
-            pygame.draw.rect(self.screen, (26, 26, 46, 200), bg_rect)
-            self.screen.blit(weight_surface, text_rect)
+            pygame.draw.rect(surface, (26, 26, 46, 200), bg_rect)
+            surface.blit(weight_surface, text_rect)
         
         # Desenhar nos
         for node in self.nodes.values():
             pos = self.world_to_screen(node['x'], node['y'])
-            pygame.draw.circle(self.screen, COLOR_NODE, pos, 5)
-            pygame.draw.circle(self.screen, COLOR_TEXT, pos, 5, 1)
+            pygame.draw.circle(surface, COLOR_NODE, pos, 5)
+            pygame.draw.circle(surface, COLOR_TEXT, pos, 5, 1)
         
         # Desenhar marcadores A (verde GRANDE) e B (vermelho GRANDE)
         if self.point_a in self.nodes:
             a_node = self.nodes[self.point_a]
             a_pos = self.world_to_screen(a_node['x'], a_node['y'])
-            pygame.draw.circle(self.screen, (0, 255, 0), a_pos, 20, 4)
-            label_a = self.font_stats.render("A", True, (0, 255, 0))
-            self.screen.blit(label_a, (a_pos[0] - 7, a_pos[1] - 10))
+            pygame.draw.circle(surface, (0, 255, 0), a_pos, 20, 4)
+            label_a = self.render_text(self.font_stats, "A", (0, 255, 0))
+            surface.blit(label_a, (a_pos[0] - 7, a_pos[1] - 10))
         
         if self.point_b in self.nodes:
             b_node = self.nodes[self.point_b]
             b_pos = self.world_to_screen(b_node['x'], b_node['y'])
-            pygame.draw.circle(self.screen, (255, 0, 0), b_pos, 20, 4)
-            label_b = self.font_stats.render("B", True, (255, 0, 0))
-            self.screen.blit(label_b, (b_pos[0] - 7, b_pos[1] - 10))
+            pygame.draw.circle(surface, (255, 0, 0), b_pos, 20, 4)
+            label_b = self.render_text(self.font_stats, "B", (255, 0, 0))
+            surface.blit(label_b, (b_pos[0] - 7, b_pos[1] - 10))
+        
+        self.road_layer = surface
+        self.road_layer_version = blocked_version
+    
+    def draw(self):
+        """Desenha a simulacao com ruas UNIFORMES de 2 faixas bem visíveis"""
+        # Camada estática (ruas, nós, A/B): redesenhada só com novo viewport ou novos bloqueios
+        blocked_version = self.disruptor_agent.blocked_version if self.disruptor_agent else 0
+        if (self.road_layer is None or self.road_layer_version != blocked_version
+                or self.road_layer.get_size() != self.screen.get_size()):
+            self.render_road_layer(blocked_version)
+        self.screen.blit(self.road_layer, (0, 0))
         
         # Desenhar semaforos (usando posição visual com offset)
         for tl_agent in self.traffic_light_agents:
@@ -817,7 +850,7 @@ class SPADETrafficSimulation:
                     pygame.draw.rect(self.screen, color, rect, border_radius=3)
                     pygame.draw.rect(self.screen, COLOR_TEXT, rect, 2, border_radius=3)
                     # Label "H" dentro
-                    label_h = self.font_label.render("H", True, (0, 0, 0))
+                    label_h = self.render_text(self.font_label, "H", (0, 0, 0))
                     self.screen.blit(label_h, (pos[0] - 4, pos[1] - 5))
                 else:
                     # Vertical: retângulo alto (10x16)
@@ -825,7 +858,7 @@ class SPADETrafficSimulation:
                     pygame.draw.rect(self.screen, color, rect, border_radius=3)
                     pygame.draw.rect(self.screen, COLOR_TEXT, rect, 2, border_radius=3)
                     # Label "V" dentro
-                    label_v = self.font_label.render("V", True, (0, 0, 0))
+                    label_v = self.render_text(self.font_label, "V", (0, 0, 0))
                     self.screen.blit(label_v, (pos[0] - 3, pos[1] - 5))
         
         # Desenhar veiculos como QUADRADOS ORIENTADOS
@@ -844,27 +877,17 @@ class SPADETrafficSimulation:
                         dy = next_node['y'] - v_agent.y
                         angle = math.degrees(math.atan2(dy, dx))
                 
-                # Desenhar ícone do veículo
-                vehicle_icon = self.draw_vehicle_icon(v_agent.vehicle_type, size=16)
-                
-                # Rotacionar o ícone baseado na direção
-                rotated_surface = pygame.transform.rotate(vehicle_icon, -angle)
-                rotated_rect = rotated_surface.get_rect(center=pos)
-                
-                # Desenhar veículo rotacionado
-                self.screen.blit(rotated_surface, rotated_rect.topleft)
+                # Desenhar veículo (sprite pré-rotacionado, centrado na posição)
+                sprite, half_w, half_h = self.vehicle_sprite(v_agent.vehicle_type, angle)
+                self.screen.blit(sprite, (pos[0] - half_w, pos[1] - half_h))
                 
                 # Label especial para journey A→B
                 if v_agent.vehicle_type == 'journey':
-                    label_ab = self.font_stats.render("A→B", True, (255, 255, 255))
-                    label_ab_bg = pygame.Surface((label_ab.get_width() + 6, label_ab.get_height() + 4))
-                    label_ab_bg.fill((147, 51, 234))
-                    label_ab_bg.set_alpha(200)
-                    label_ab_bg.blit(label_ab, (3, 2))
-                    self.screen.blit(label_ab_bg, (pos[0] - label_ab.get_width()//2 - 3, pos[1] - 28))
+                    badge = self.journey_badge
+                    self.screen.blit(badge, (pos[0] - badge.get_width()//2, pos[1] - 28))
                 
                 # Label com ID
-                label_id = self.font_label.render(v_agent.vehicle_id, True, COLOR_TEXT)
+                label_id = self.render_text(self.font_label, v_agent.vehicle_id, COLOR_TEXT)
                 self.screen.blit(label_id, (pos[0] + 12, pos[1] - 6))
         
         # Desenhar sidebar
@@ -883,13 +906,13 @@ class SPADETrafficSimulation:
         minus_rect = pygame.Rect(x, y, button_size, button_size)
         pygame.draw.rect(self.screen, (60, 60, 80), minus_rect, border_radius=5)
         pygame.draw.rect(self.screen, COLOR_ACCENT, minus_rect, 2, border_radius=5)
-        minus_text = self.font_title.render("-", True, COLOR_TEXT)
+        minus_text = self.render_text(self.font_title, "-", COLOR_TEXT)
         text_rect = minus_text.get_rect(center=minus_rect.center)
         self.screen.blit(minus_text, text_rect)
         self.minus_button_rect = minus_rect
         
         # Valor da velocidade (centralizado entre botões)
-        speed_text = self.font_title.render(f"{self.speed_multiplier:.1f}x", True, COLOR_ACCENT)
+        speed_text = self.render_text(self.font_title, f"{self.speed_multiplier:.1f}x", COLOR_ACCENT)
         speed_rect = speed_text.get_rect(center=(x + button_size + 40, y + button_size // 2))
         self.screen.blit(speed_text, speed_rect)
         
@@ -897,13 +920,13 @@ class SPADETrafficSimulation:
         plus_rect = pygame.Rect(x + button_size + 80, y, button_size, button_size)
         pygame.draw.rect(self.screen, (60, 60, 80), plus_rect, border_radius=5)
         pygame.draw.rect(self.screen, COLOR_ACCENT, plus_rect, 2, border_radius=5)
-        plus_text = self.font_title.render("+", True, COLOR_TEXT)
+        plus_text = self.render_text(self.font_title, "+", COLOR_TEXT)
         text_rect = plus_text.get_rect(center=plus_rect.center)
         self.screen.blit(plus_text, text_rect)
         self.plus_button_rect = plus_rect
         
         # Label instrução
-        label = self.font_label.render("Ajustar Vel.", True, (180, 180, 180))
+        label = self.render_text(self.font_label, "Ajustar Vel.", (180, 180, 180))
         self.screen.blit(label, (x + button_size + 120, y + 7))
 
     def draw_disruption_buttons(self, x, y):
@@ -949,7 +972,7 @@ class SPADETrafficSimulation:
             pygame.draw.rect(self.screen, bg_color, rect, border_radius=5)
             pygame.draw.rect(self.screen, border_color, rect, 2, border_radius=5)
             
-            text = self.font_label.render(level["label"], True, COLOR_TEXT)
+            text = self.render_text(self.font_label, level["label"], COLOR_TEXT)
             text_rect = text.get_rect(center=rect.center)
             self.screen.blit(text, text_rect)
             
@@ -967,7 +990,7 @@ class SPADETrafficSimulation:
         pygame.draw.rect(self.screen, (60, 20, 20), stop_rect, border_radius=5)
         pygame.draw.rect(self.screen, (200, 50, 50), stop_rect, 2, border_radius=5)
         
-        text = self.font_label.render("PARAR DISRUPCAO", True, (255, 200, 200))
+        text = self.render_text(self.font_label, "PARAR DISRUPCAO", (255, 200, 200))
         text_rect = text.get_rect(center=stop_rect.center)
         self.screen.blit(text, text_rect)
         
@@ -980,6 +1003,22 @@ class SPADETrafficSimulation:
         for v_agent in self.vehicle_agents:
             v_agent.update_speed_multiplier(self.speed_multiplier)
     
+    def render_text(self, font, text, color):
+        """Texto renderizado (cache LRU partilhada pelo mapa e pela sidebar)"""
+        return self.text_cache.render(font, text, color)
+    
+    def render_stats_block(self, lines):
+        """Pré-desenha as linhas estáticas de estatísticas (20px cada) sobre o fundo da sidebar
+        
+        Linhas None ficam vazias: são as variáveis, desenhadas por cima a cada frame.
+        """
+        surface = pygame.Surface((SIDEBAR_WIDTH - 20, 20 * len(lines))).convert()
+        surface.fill(COLOR_SIDEBAR)
+        for i, line in enumerate(lines):
+            if line:
+                surface.blit(self.font_label.render(line, True, COLOR_TEXT), (0, 20 * i))
+        return surface
+    
     def draw_sidebar(self):
         """Desenha barra lateral com estatisticas"""
         screen_width, screen_height = self.screen.get_size()
@@ -992,31 +1031,22 @@ class SPADETrafficSimulation:
         y_offset = 20
         
         # Titulo
-        title = self.font_title.render("SPADE Traffic", True, COLOR_ACCENT)
+        title = self.render_text(self.font_title, "SPADE Traffic", COLOR_ACCENT)
         self.screen.blit(title, (sidebar_x + 20, y_offset))
         y_offset += 60
         
         # Estatisticas
-        stats_title = self.font_stats.render("Estatisticas", True, COLOR_TEXT)
+        stats_title = self.render_text(self.font_stats, "Estatisticas", COLOR_TEXT)
         self.screen.blit(stats_title, (sidebar_x + 20, y_offset))
         y_offset += 30
         
+        # Bloco estático (None = linha variável, desenhada abaixo a cada frame)
         stats_lines = [
-            f"Step: {self.stats['step']}",
+            None,  # Step
             f"",
             f"Veiculo Journey A->B:",
-            f"  Velocidade: {self.stats['journey_speed']:.1f} px/s",
-        ]
-        
-        # Adicionar informações de tempo
-        travel_time = self.stats['journey_travel_time']
-        
-        # Formatar tempo de viagem (mm:ss)
-        travel_mins = int(travel_time // 60)
-        travel_secs = int(travel_time % 60)
-        
-        stats_lines.extend([
-            f"  Tempo Total: {travel_mins:02d}:{travel_secs:02d}",
+            None,  # Velocidade
+            None,  # Tempo Total
             f"",
             f"Agentes SPADE:",
             f"  Coordenador: 1",
@@ -1024,17 +1054,30 @@ class SPADETrafficSimulation:
             f"  Veiculos: {len(self.vehicle_agents)}",
             f"  Semaforos: {len(self.traffic_light_agents)}",
             f"  TOTAL: {2 + len(self.vehicle_agents) + len(self.traffic_light_agents)}"
-        ])
+        ]
         
-        for line in stats_lines:
-            text = self.font_label.render(line, True, COLOR_TEXT)
-            self.screen.blit(text, (sidebar_x + 20, y_offset))
-            y_offset += 20
+        if stats_lines != self.stats_block_lines:
+            self.stats_block = self.render_stats_block(stats_lines)
+            self.stats_block_lines = stats_lines
+        self.screen.blit(self.stats_block, (sidebar_x + 20, y_offset))
+        
+        # Linhas variáveis: o passo muda a cada frame (render direto, fora da cache);
+        # velocidade e tempo (mm:ss) repetem-se e passam pela cache de textos
+        travel_time = self.stats['journey_travel_time']
+        travel_mins = int(travel_time // 60)
+        travel_secs = int(travel_time % 60)
+        step_text = self.font_label.render(f"Step: {self.stats['step']}", True, COLOR_TEXT)
+        self.screen.blit(step_text, (sidebar_x + 20, y_offset))
+        speed_text = self.render_text(self.font_label, f"  Velocidade: {self.stats['journey_speed']:.1f} px/s", COLOR_TEXT)
+        self.screen.blit(speed_text, (sidebar_x + 20, y_offset + 20 * 3))
+        time_text = self.render_text(self.font_label, f"  Tempo Total: {travel_mins:02d}:{travel_secs:02d}", COLOR_TEXT)
+        self.screen.blit(time_text, (sidebar_x + 20, y_offset + 20 * 4))
+        y_offset += 20 * len(stats_lines)
         
         y_offset += 20
         
         # Controle de Velocidade
-        speed_title = self.font_stats.render("Velocidade Global", True, COLOR_TEXT)
+        speed_title = self.render_text(self.font_stats, "Velocidade Global", COLOR_TEXT)
         self.screen.blit(speed_title, (sidebar_x + 20, y_offset))
         y_offset += 30
         
@@ -1043,7 +1086,7 @@ class SPADETrafficSimulation:
         y_offset += 50
         
         # Botoes Disrupcao
-        dis_ctl_title = self.font_stats.render("Controle de Disrupcao", True, COLOR_TEXT)
+        dis_ctl_title = self.render_text(self.font_stats, "Controle de Disrupcao", COLOR_TEXT)
         self.screen.blit(dis_ctl_title, (sidebar_x + 20, y_offset))
         y_offset += 30
         
@@ -1056,7 +1099,7 @@ class SPADETrafficSimulation:
         
         # Estado de disrupção
         if self.disruptor_agent:
-            disruption_title = self.font_stats.render("Estado de Disrupção", True, COLOR_TEXT)
+            disruption_title = self.render_text(self.font_stats, "Estado de Disrupção", COLOR_TEXT)
             self.screen.blit(disruption_title, (sidebar_x + 20, y_offset))
             y_offset += 30
             
@@ -1070,58 +1113,59 @@ class SPADETrafficSimulation:
                 status_color = (100, 255, 100)
                 blocked_text = "Todas as vias livres"
             
-            status_surface = self.font_label.render(f"Status: {status_text}", True, status_color)
+            status_surface = self.render_text(self.font_label, f"Status: {status_text}", status_color)
             self.screen.blit(status_surface, (sidebar_x + 20, y_offset))
             y_offset += 20
             
-            blocked_surface = self.font_label.render(blocked_text, True, COLOR_TEXT)
+            blocked_surface = self.render_text(self.font_label, blocked_text, COLOR_TEXT)
             self.screen.blit(blocked_surface, (sidebar_x + 20, y_offset))
             y_offset += 30
         
         # Legenda
-        legend_title = self.font_stats.render("Legenda", True, COLOR_TEXT)
+        legend_title = self.render_text(self.font_stats, "Legenda", COLOR_TEXT)
         self.screen.blit(legend_title, (sidebar_x + 20, y_offset))
         y_offset += 30
         
         # Veiculos com ícones customizados
-        icon_journey = self.draw_vehicle_icon('journey', size=16)
+        icon_journey = self.vehicle_icons['journey']
         self.screen.blit(icon_journey, (sidebar_x + 25, y_offset - 4))
-        text = self.font_label.render("Veiculo Journey (A->B)", True, COLOR_TEXT)
+        text = self.render_text(self.font_label, "Veiculo Journey (A->B)", COLOR_TEXT)
         self.screen.blit(text, (sidebar_x + 50, y_offset))
         y_offset += 25
         
-        icon_amb = self.draw_vehicle_icon('ambulance', size=16)
+        icon_amb = self.vehicle_icons['ambulance']
         self.screen.blit(icon_amb, (sidebar_x + 25, y_offset - 4))
-        text = self.font_label.render("Ambulancia", True, COLOR_TEXT)
+        text = self.render_text(self.font_label, "Ambulancia", COLOR_TEXT)
         self.screen.blit(text, (sidebar_x + 50, y_offset))
         y_offset += 25
         
-        icon_car = self.draw_vehicle_icon('normal', size=16)
+        icon_car = self.vehicle_icons['car']
         self.screen.blit(icon_car, (sidebar_x + 25, y_offset - 4))
-        text = self.font_label.render("Carro Normal", True, COLOR_TEXT)
+        text = self.render_text(self.font_label, "Carro Normal", COLOR_TEXT)
         self.screen.blit(text, (sidebar_x + 50, y_offset))
         y_offset += 25
         
         # Semaforos
         pygame.draw.circle(self.screen, COLOR_LIGHT_GREEN, (sidebar_x + 30, y_offset + 5), 5)
-        text = self.font_label.render("Semaforo Verde", True, COLOR_TEXT)
+        text = self.render_text(self.font_label, "Semaforo Verde", COLOR_TEXT)
         self.screen.blit(text, (sidebar_x + 45, y_offset))
         y_offset += 20
         
         pygame.draw.circle(self.screen, COLOR_LIGHT_YELLOW, (sidebar_x + 30, y_offset + 5), 5)
-        text = self.font_label.render("Semaforo Amarelo", True, COLOR_TEXT)
+        text = self.render_text(self.font_label, "Semaforo Amarelo", COLOR_TEXT)
         self.screen.blit(text, (sidebar_x + 45, y_offset))
         y_offset += 20
         
         pygame.draw.circle(self.screen, COLOR_LIGHT_RED, (sidebar_x + 30, y_offset + 5), 5)
-        text = self.font_label.render("Semaforo Vermelho", True, COLOR_TEXT)
+        text = self.render_text(self.font_label, "Semaforo Vermelho", COLOR_TEXT)
         self.screen.blit(text, (sidebar_x + 45, y_offset))
     
     def run(self):
         """Loop principal"""
         print("\n" + "="*50)
         print("🚦 SPADE Traffic Simulation")
-        print("   Agentes SPADE + Prosody XMPP + Pygame")
+        transport = "Prosody XMPP" if get_transport() == TRANSPORT_XMPP else "transporte local"
+        print(f"   Agentes SPADE + {transport} + Pygame")
         print("="*50)
         print("\nIniciando simulacao...")
         
@@ -1202,11 +1246,169 @@ class SPADETrafficSimulation:
         self.stop()
         pygame.quit()
         sys.exit()
+    
+    def run_headless(self, duration=None, trips=None, metrics_dir="metrics"):
+        """Executa sem Pygame até esgotar a duração (s) ou o número de viagens"""
+        print("\n" + "="*50)
+        print("🚦 SPADE Traffic Simulation (headless)")
+        limits = []
+        if duration:
+            limits.append(f"{duration:.0f}s")
+        if trips:
+            limits.append(f"{trips} viagens")
+        print("   Limite: " + " ou ".join(limits))
+        print("="*50)
+        
+        clock = get_clock()
+        if not clock.realtime:
+            # Relógio em passos: a duração é cumprida pelo próprio relógio
+            self.sim_duration = duration
+        
+        sim_started = sim_time()
+        self.start()
+        wall_started = time.time()
+        if clock.realtime:
+            sim_started = sim_time()
+        deadline = sim_started + duration if duration and clock.realtime else None
+        
+        try:
+            while True:
+                time.sleep(HEADLESS_POLL)
+                self.update()
+                
+                if trips and self.trips_completed() >= trips:
+                    print(f"🏁 {trips} viagens concluídas")
+                    break
+                if (deadline and sim_time() >= deadline) or getattr(clock, 'finished', False):
+                    print(f"⏱️  Duração de {duration:.0f}s atingida")
+                    break
+        except KeyboardInterrupt:
+            print("\n⚠️ Interrompido pelo utilizador")
+        
+        elapsed = sim_time() - sim_started
+        wall = time.time() - wall_started
+        if not clock.realtime:
+            print(f"⏩ {elapsed:.0f}s simulados em {wall:.1f}s reais ({elapsed / max(wall, 1e-9):.1f}x)")
+        path = self.write_headless_summary(metrics_dir, elapsed)
+        print(f"📄 Resumo escrito em {path}")
+        
+        # Parar agentes e aguardar a thread (stop_agents corre no loop dos agentes)
+        self.stop()
+        if self.agent_thread:
+            self.agent_thread.join(timeout=10)
+    
+    def trips_completed(self):
+        """Total de destinos alcançados por todos os veículos"""
+        return sum(v.trips_completed for v in self.vehicle_agents)
+    
+    def write_headless_summary(self, metrics_dir, elapsed):
+        """Escreve metrics/headless_summary.csv (uma linha por veículo + totais)"""
+        os.makedirs(metrics_dir, exist_ok=True)
+        path = os.path.join(metrics_dir, "headless_summary.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["vehicle_id", "vehicle_type", "trips", "travel_steps", "waiting_time"])
+            for v in self.vehicle_agents:
+                writer.writerow([v.vehicle_id, v.vehicle_type, v.trips_completed, v.total_travel_time, v.waiting_time])
+            writer.writerow(["TOTAL", "", self.trips_completed(), f"{elapsed:.1f}s", ""])
+            writer.writerow(["STARTUP", "", "", f"{self.startup_time or 0:.2f}s", ""])
+            writer.writerow(["FIRST_MOVE", "", "", f"{self.first_move_time or 0:.2f}s", ""])
+        
+        if self.coordinator_agent:
+            cache = self.coordinator_agent.route_cache.stats()
+            fan_out = self.coordinator_agent.fan_out_stats()
+            print(f"   🗂️ Cache rotas: {cache['hits']} hits / {cache['misses']} misses ({cache['hit_rate'] * 100:.0f}%)")
+            print(f"   📡 Broadcasts: {fan_out['broadcasts']} (fan-out médio {fan_out['avg_fanout']:.1f})")
+        if self.movement_kernel:
+            kernel = self.movement_kernel.stats()
+            print(f"   ⚙️  MovementKernel: {kernel['ticks']} ticks, {kernel['step_ms_avg']:.3f} ms/tick")
+        print(f"   🚗 Viagens: {self.trips_completed()} em {elapsed:.1f}s")
+        return path
 
 
 def main():
     """Funcao principal"""
-    sim = SPADETrafficSimulation()
+    parser = argparse.ArgumentParser(description="Simulacao de trafego SPADE + Pygame")
+    parser.add_argument(
+        '--transport',
+        choices=TRANSPORTS,
+        default=TRANSPORT_XMPP,
+        help='Transporte das mensagens: xmpp (Prosody) ou local (em memoria, sem servidor)'
+    )
+    parser.add_argument(
+        '--kernel',
+        action='store_true',
+        help='Movimento de todos os veículos num único passo vetorizado (NumPy) por tick'
+    )
+    parser.add_argument(
+        '--clock',
+        choices=('real', 'stepped'),
+        default='real',
+        help='real: tempo de parede; stepped: passos fixos, tão rápido quanto o CPU permitir'
+    )
+    parser.add_argument(
+        '--step',
+        type=float,
+        default=MOVE_PERIOD,
+        help='Passo (s simulados) do relógio stepped (padrão: período do movimento)'
+    )
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        help='Sem janela Pygame: corre durante --duration segundos ou até --trips viagens e escreve métricas'
+    )
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=None,
+        help='Duração da execução headless em segundos simulados (padrão: 60 se --trips não for dado)'
+    )
+    parser.add_argument(
+        '--trips',
+        type=int,
+        default=None,
+        help='Termina a execução headless após N viagens concluídas'
+    )
+    parser.add_argument(
+        '--metrics-dir',
+        default="metrics",
+        help='Pasta do resumo headless (padrão: metrics)'
+    )
+    parser.add_argument(
+        '--landmark-cache',
+        default=LANDMARK_CACHE_DIR,
+        help=f'Pasta da cache das tabelas de landmarks (redes grandes); "" desativa (padrão: {LANDMARK_CACHE_DIR})'
+    )
+    add_scenario_arguments(parser)
+    parser.add_argument(
+        '--save-scenario',
+        default=None,
+        help='Escreve o cenário resolvido (valores sorteados explícitos) neste ficheiro'
+    )
+    args = parser.parse_args()
+    set_transport(args.transport)
+    scenario = scenario_from_args(parser, args)
+    scenario.record_weights = bool(args.save_scenario)
+    if args.clock == 'stepped':
+        set_clock(SteppedClock(step=args.step))
+    
+    if args.headless:
+        duration = args.duration
+        if duration is None and args.trips is None:
+            duration = 60.0
+        sim = SPADETrafficSimulation(
+            headless=True, kernel=args.kernel, scenario=scenario, landmark_cache=args.landmark_cache or None
+        )
+        if args.save_scenario:
+            scenario.save(args.save_scenario)
+            print(f"💾 Cenário resolvido escrito em {args.save_scenario}")
+        sim.run_headless(duration=duration, trips=args.trips, metrics_dir=args.metrics_dir)
+        return
+    
+    sim = SPADETrafficSimulation(kernel=args.kernel, scenario=scenario, landmark_cache=args.landmark_cache or None)
+    if args.save_scenario:
+        scenario.save(args.save_scenario)
+        print(f"💾 Cenário resolvido escrito em {args.save_scenario}")
     sim.run()
 
 
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+scripts/provision_agents.py
+
+Registo idempotente das contas XMPP de todos os agentes de um cenario.
+- Lista esperada derivada do cenario (coordenador, disruptor, dashboard,
+  pares de semaforos e frota), resolvida como na simulacao
+- Contas existentes: com prosodyctl (por omissao; contentor Docker de
+  scripts/setup_prosody.sh), uma unica listagem "prosodyctl shell user list"
+  comparada com o conjunto esperado; com --method xmpp, login de cada JID
+  (senha = utilizador) em lotes paralelos. So as contas em falta sao registadas
+- Registo em lotes paralelos: prosodyctl no contentor ou in-band
+  (auto_register do SPADE, XEP-0077; requer allow_registration)
+
+Uso:
+    python scripts/provision_agents.py [--scenario FILE] [--seed N] [--grid-size N]
+    python scripts/provision_agents.py --method xmpp --batch 100
+    python scripts/provision_agents.py --check   (so verifica; sai com 1 se faltarem contas)
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spade.agent import Agent
+
+from agents.network_loader import load_network
+from agents.scenario import add_scenario_arguments, scenario_from_args
+
+XMPP_DOMAIN = "localhost"
+PROSODY_CONTAINER = "prosody"
+LOGIN_TIMEOUT = 10.0  # Prazo (s) de cada login/registo
+DEFAULT_BATCH = 50  # Ligações em simultâneo
+
+
+async def login(username, auto_register=False):
+    """True se o agente autentica (com auto_register, regista-se antes in-band)"""
+    agent = Agent(f"{username}@{XMPP_DOMAIN}", username)
+    try:
+        await asyncio.wait_for(agent.start(auto_register=auto_register), LOGIN_TIMEOUT)
+    except Exception:
+        return False
+    try:
+        await agent.stop()
+    except Exception:
+        pass
+    return True
+
+
+async def register_inband(username):
+    return await login(username, auto_register=True)
+
+
+async def register_prosodyctl(username):
+    process = await asyncio.create_subprocess_exec(
+        "docker", "exec", PROSODY_CONTAINER, "prosodyctl", "register", username, XMPP_DOMAIN, username,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    return await process.wait() == 0
+
+
+async def prosody_accounts():
+    """Utilizadores registados no dominio, numa unica chamada a prosodyctl no contentor"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "docker", "exec", PROSODY_CONTAINER, "prosodyctl", "shell", "user", "list", XMPP_DOMAIN,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+    except OSError as e:
+        raise RuntimeError(f"docker indisponível ({e}); use --method xmpp") from e
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        detail = (stderr or stdout).decode(errors='replace').strip()
+        raise RuntimeError(f"prosodyctl shell user list falhou ({process.returncode}): {detail}")
+    # Uma linha por JID (as linhas de estado, p.ex. "OK: Showing all N users", não terminam no domínio)
+    suffix = "@" + XMPP_DOMAIN
+    accounts = set()
+    for line in stdout.decode(errors='replace').splitlines():
+        jid = line.strip().lstrip("|").strip()
+        if jid.endswith(suffix) and " " not in jid:
+            accounts.add(jid[:-len(suffix)])
+    return accounts
+
+
+REGISTER_METHODS = {'xmpp': register_inband, 'prosodyctl': register_prosodyctl}
+
+
+async def run_batches(usernames, batch, worker):
+    """worker(utilizador) para todos, no maximo batch em simultaneo -> {utilizador: resultado}"""
+    limit = asyncio.Semaphore(batch)
+
+    async def run_one(username):
+        async with limit:
+            return await worker(username)
+
+    results = await asyncio.gather(*(run_one(username) for username in usernames))
+    return dict(zip(usernames, results))
+
+
+async def missing_accounts(usernames, method, batch):
+    """Utilizadores esperados sem conta (listagem do prosodyctl ou login, conforme o metodo)"""
+    if method == 'prosodyctl':
+        registered = await prosody_accounts()
+        return [username for username in usernames if username not in registered]
+    logged_in = await run_batches(usernames, batch, login)
+    return [username for username in usernames if not logged_in[username]]
+
+
+async def provision(usernames, method, batch, check_only=False):
+    """Verifica e regista as contas em falta; devolve as que continuam em falta"""
+    started = time.perf_counter()
+    missing = await missing_accounts(usernames, method, batch)
+    print(f"🔍 {len(usernames) - len(missing)}/{len(usernames)} contas já registadas "
+          f"({time.perf_counter() - started:.1f}s)")
+    if check_only or not missing:
+        return missing
+
+    print(f"📝 A registar {len(missing)} contas ({method}, {batch} em paralelo)...")
+    started = time.perf_counter()
+    await run_batches(missing, batch, REGISTER_METHODS[method])
+    missing = await missing_accounts(missing, method, batch)
+    print(f"   ⏱️  Registo e verificação em {time.perf_counter() - started:.1f}s")
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regista no Prosody as contas XMPP dos agentes de um cenário")
+    add_scenario_arguments(parser)
+    parser.add_argument(
+        '--method',
+        choices=tuple(REGISTER_METHODS),
+        default='prosodyctl',
+        help='prosodyctl: lista e regista por docker exec no contentor (padrão); '
+             'xmpp: verifica por login e regista in-band (auto_register do SPADE)'
+    )
+    parser.add_argument(
+        '--batch',
+        type=int,
+        default=DEFAULT_BATCH,
+        help=f'Logins/registos em simultâneo (padrão: {DEFAULT_BATCH})'
+    )
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        help='Só verifica as contas esperadas (código de saída 1 se faltarem, 2 se a verificação falhar)'
+    )
+    args = parser.parse_args()
+
+    scenario = scenario_from_args(parser, args)
+    usernames = scenario.agent_usernames(load_network(scenario))
+    print(f"👥 {len(usernames)} agentes esperados no cenário {scenario.name} (seed={scenario.seed})")
+    if scenario.seed is None:
+        print("⚠️  Sem semente: semáforos sorteados podem diferir da execução (use --seed ou --scenario)")
+
+    try:
+        missing = asyncio.run(provision(usernames, args.method, max(1, args.batch), args.check))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    if missing:
+        print(f"❌ {len(missing)} contas em falta: " + ", ".join(missing[:10]) + (" ..." if len(missing) > 10 else ""))
+        sys.exit(1)
+    print("✅ Todas as contas esperadas estão registadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -48,21 +48,14 @@ else
     echo "${GREEN}✅ Prosody já está rodando${NC}"
 fi
 
-# 3. Verificar se os agentes estão registrados
-AGENT_COUNT=$(docker exec prosody prosodyctl list localhost 2>/dev/null | wc -l)
-if [ "$AGENT_COUNT" -lt 30 ]; then
-    echo "${YELLOW}⚠️  Agentes não registrados ou incompletos!${NC}"
-    echo "${CYAN}📝 A registrar agentes...${NC}"
-    ./scripts/register_10_paired_lights.sh
-    
-    if [ $? -ne 0 ]; then
-        echo "${RED}❌ Falha ao registrar agentes!${NC}"
-        exit 1
-    fi
-    
-    echo "${GREEN}✅ Agentes registrados com sucesso!${NC}"
-else
-    echo "${GREEN}✅ Agentes já estão registrados (${AGENT_COUNT} agentes)${NC}"
+# 3. Registar as contas em falta (verifica o conjunto exato de JIDs do cenário; idempotente)
+echo "${CYAN}📝 A verificar contas XMPP dos agentes...${NC}"
+source venv/bin/activate
+python scripts/provision_agents.py --method prosodyctl
+
+if [ $? -ne 0 ]; then
+    echo "${RED}❌ Falha ao registrar agentes!${NC}"
+    exit 1
 fi
 
 echo ""
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# Testes correm a partir da raiz do repositório (pacote agents e live_dynamic_spade)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GRID_SIZE = 4
+GRID_SPACING = 100
+
+
+@pytest.fixture
+def grid_network():
+    """Grelha GRID_SIZE x GRID_SIZE com ruas nos dois sentidos e peso 100
+
+    Nós "i_j" em (i * GRID_SPACING, j * GRID_SPACING); a aresta de "a" para
+    "b" tem o ID "a->b". Devolve ({node_id: (x, y)}, {edge_id: aresta}).
+    """
+    nodes = {f"{i}_{j}": (i * GRID_SPACING, j * GRID_SPACING) for i in range(GRID_SIZE) for j in range(GRID_SIZE)}
+    edges = {}
+    for i in range(GRID_SIZE):
+        for j in range(GRID_SIZE):
+            for ni, nj in ((i + 1, j), (i - 1, j), (i, j + 1), (i, j - 1)):
+                if 0 <= ni < GRID_SIZE and 0 <= nj < GRID_SIZE:
+                    edges[f"{i}_{j}->{ni}_{nj}"] = {'from': f"{i}_{j}", 'to': f"{ni}_{nj}", 'weight': 100.0}
+    return nodes, edges
+
+
+@pytest.fixture
+def road_graph(grid_network):
+    """CSRGraph da grelha (mesma forma que a rede carregada pela simulacao)"""
+    from agents.road_network import CSRGraph
+
+    return CSRGraph.from_network(*grid_network)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LRUCache: despejo pela ordem de acesso e contadores
+"""
+
+from agents.lru_cache import LRUCache
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'hit_rate': 0.75, 'size': 2, 'evictions': 1}
+
+
+def test_falsy_values_are_hits():
+    cache = LRUCache(4)
+    cache.put(("x", "y"), False)
+    assert cache.get(("x", "y")) is False and (cache.hits, cache.misses) == (1, 0)
+    cache.clear()
+    assert len(cache) == 0 and cache.get(("x", "y")) is None and cache.misses == 1
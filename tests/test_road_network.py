@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CSRGraph: construcao dos arrays CSR e cache em disco das tabelas ALT
+"""
+
+import random
+
+from agents import road_network
+from agents.road_network import CSRGraph
+from agents.routing import LandmarkTable
+
+
+def test_csr_arrays_are_ordered_by_source_and_edge_id(grid_network):
+    nodes, edges = grid_network
+    edge_list = [
+        (edge_id, edge['from'], edge['to'], float(len(edge_id)), 100.0, 50)
+        for edge_id, edge in edges.items()
+    ]
+    random.Random(3).shuffle(edge_list)
+    edge_list[0] = edge_list[0] + ('main',)
+    road_graph = CSRGraph(list(nodes), [x for x, _ in nodes.values()], [y for _, y in nodes.values()], edge_list)
+
+    expected = sorted(edge_list, key=lambda edge: (road_graph.node_index[edge[1]], edge[0]))
+    assert road_graph.edge_ids == [edge[0] for edge in expected]
+    assert list(road_graph.weights) == [edge[3] for edge in expected]
+    assert road_graph.road_types.count('main') == 1 and road_graph.road_types.count(None) == len(edge_list) - 1
+    for i, node_id in enumerate(road_graph.node_ids):
+        outgoing = road_graph.edge_ids[road_graph.offsets[i]:road_graph.offsets[i + 1]]
+        assert outgoing == sorted(edge_id for edge_id, edge in edges.items() if edge['from'] == node_id)
+    in_offsets, in_slots = road_graph.incoming
+    for i in range(road_graph.num_nodes):
+        assert list(in_slots[in_offsets[i]:in_offsets[i + 1]]) == [
+            slot for slot in range(road_graph.num_edges) if road_graph.targets[slot] == i
+        ]
+    assert road_graph.min_cost_per_pixel == min(edge[3] for edge in edge_list) / 100.0
+
+
+def test_landmark_tables_are_reused_from_the_disk_cache(grid_network, tmp_path, monkeypatch):
+    monkeypatch.setattr(road_network, 'LANDMARK_CACHE_MIN_NODES', 0)
+    built = CSRGraph.from_network(*grid_network).build_landmarks(count=3, cache_dir=tmp_path)
+    assert len(list(tmp_path.glob('landmarks_*.npz'))) == 1
+
+    def not_called(*args):
+        raise AssertionError("tabelas recalculadas apesar da cache")
+
+    monkeypatch.setattr(LandmarkTable, '__init__', not_called)
+    loaded = CSRGraph.from_network(*grid_network).build_landmarks(count=3, cache_dir=tmp_path)
+    assert loaded.landmarks == built.landmarks
+    assert loaded.dist_from == built.dist_from and loaded.dist_to == built.dist_to
+    assert loaded.lower_bound(0, 15) == built.lower_bound(0, 15)
+
+
+def test_landmark_cache_ignores_other_weights_and_unreadable_files(grid_network, tmp_path, monkeypatch):
+    monkeypatch.setattr(road_network, 'LANDMARK_CACHE_MIN_NODES', 0)
+    nodes, edges = grid_network
+    road_graph = CSRGraph.from_network(nodes, edges)
+    road_graph.build_landmarks(count=3, cache_dir=tmp_path)
+
+    heavier = {edge_id: dict(edge, weight=250.0) for edge_id, edge in edges.items()}
+    other = CSRGraph.from_network(nodes, heavier)
+    assert other.fingerprint != road_graph.fingerprint
+    heavier_tables = other.build_landmarks(count=3, cache_dir=tmp_path)
+    assert max(heavier_tables.dist_from[0]) == 2.5 * max(road_graph.landmarks.dist_from[0])
+
+    (tmp_path / f"landmarks_{road_graph.fingerprint}_3.npz").write_bytes(b"truncado")
+    rebuilt = CSRGraph.from_network(nodes, edges).build_landmarks(count=3, cache_dir=tmp_path)
+    assert rebuilt.dist_from == road_graph.landmarks.dist_from
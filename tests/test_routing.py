@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Estruturas de roteamento: planeador incremental D* Lite, cache de rotas,
+calendarios de semaforos e arvores de caminhos em lote
+"""
+
+import random
+
+import pytest
+
+from agents.road_network import CSRGraph
+from agents.routing import (
+    DStarLitePlanner, EdgeCostModel, LightSchedule, ReachabilityIndex, RouteCache, shortest_path_trees,
+    tree_next_hops, tree_route,
+)
+
+
+def make_planner(road_graph, penalties, blocked=()):
+    def edge_cost(from_node, to_node, edge_id):
+        if edge_id in blocked:
+            return float('inf')
+        return road_graph.edge_weight(edge_id) + penalties.get(edge_id, 0)
+
+    return DStarLitePlanner(road_graph, "3_3", edge_cost)
+
+
+def path_edges(path):
+    return {f"{a}->{b}" for a, b in zip(path, path[1:])}
+
+
+def test_dstar_lite_finds_the_shortest_path(road_graph):
+    planner = make_planner(road_graph, {})
+    path = planner.plan("0_0")
+    assert path[0] == "0_0" and path[-1] == "3_3"
+    assert len(path) == 7
+    assert planner.path_cost == pytest.approx(600)
+
+
+def test_dstar_lite_repairs_around_blocked_edges(road_graph):
+    blocked = set()
+    planner = make_planner(road_graph, {}, blocked)
+    path = planner.plan("0_0")
+    edge_id = f"{path[2]}->{path[3]}"
+    blocked.add(edge_id)
+    planner.update_edges([edge_id])
+    repaired = planner.plan(path[1])
+    assert repaired[0] == path[1] and repaired[-1] == "3_3"
+    assert edge_id not in path_edges(repaired)
+    assert planner.path_cost == pytest.approx(500)
+
+
+def test_refresh_costs_reevaluates_memoised_penalties(road_graph):
+    penalties = {}
+    planner = make_planner(road_graph, penalties)
+    path = planner.plan("0_0")
+    # Penalidade nova (ex: trafego) numa aresta da rota, sem bloqueios alterados
+    edge_id = f"{path[1]}->{path[2]}"
+    penalties[edge_id] = 1000
+    planner.refresh_costs()
+    repaired = planner.plan("0_0")
+    assert edge_id not in path_edges(repaired)
+    assert planner.path_cost == pytest.approx(600)
+
+
+def test_route_cache_is_keyed_by_network_version():
+    cache = RouteCache(capacity=2)
+    cache.put("0_0", "3_3", 0, ["0_0", "3_3"], {'route_total_cost': 1.0})
+    assert cache.get("0_0", "3_3", 0) == (("0_0", "3_3"), {'route_total_cost': 1.0})
+    cache.bump_version()
+    assert cache.get("0_0", "3_3", 0) is None
+    cache.put("0_0", "3_3", 0, ["0_0", "3_3"], {})  # Versao ultrapassada: ignorada
+    assert cache.stats()['size'] == 0
+    for origin in ("0_0", "0_1", "0_2"):
+        cache.put(origin, "3_3", 1, [origin, "3_3"], {})
+    assert cache.evictions == 1 and cache.get("0_0", "3_3", 1) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_shortest_path_trees_follow_edge_costs(road_graph):
+    traffic = {"0_0->0_1": {'delay': 100}, "0_0->1_0": {'delay': 100}}
+    costs = EdgeCostModel(road_graph, traffic, {}, {}).slot_costs(0.0)
+    dist, next_hop = shortest_path_trees(road_graph, ["3_3"], costs=costs)["3_3"]
+    assert dist[road_graph.node_index["0_0"]] == pytest.approx(600 + 100 * 5)
+    assert dist[road_graph.node_index["0_1"]] == pytest.approx(500)
+
+
+def test_tree_next_hops_keeps_only_paths_from_starts(road_graph):
+    dist, next_hop = shortest_path_trees(road_graph, ["3_3"], {"0_0->0_1"})["3_3"]
+    hops = tree_next_hops(road_graph, next_hop, ["0_0"])
+    assert len(hops) == 6 < road_graph.num_nodes
+    path = tree_route(hops, "0_0", "3_3")
+    assert path[0] == "0_0" and path[-1] == "3_3" and len(path) == 7
+    assert "0_0->0_1" not in path_edges(path)
+    outside = next(node_id for node_id in road_graph.node_ids if node_id not in path)
+    assert tree_route(hops, outside, "3_3") == []
+
+
+def test_shortest_path_trees_on_an_irregular_one_way_network():
+    rng = random.Random(7)
+    nodes = {f"n{i}": (rng.uniform(0, 1000), rng.uniform(0, 1000)) for i in range(40)}
+    edges = {}
+    for i in range(40):
+        # Anel de sentido unico (fortemente conexo) mais atalhos aleatorios
+        for j in {(i + 1) % 40} | set(rng.sample(range(40), 3)) - {i}:
+            edges[f"n{i}->n{j}"] = {'from': f"n{i}", 'to': f"n{j}", 'weight': rng.uniform(1, 50)}
+    road_graph = CSRGraph.from_network(nodes, edges)
+    blocked = {"n5->n6"}
+
+    # Referencia: relaxacao exaustiva de todas as arestas
+    expected = {node_id: float('inf') for node_id in nodes}
+    expected["n0"] = 0.0
+    for _ in nodes:
+        for edge_id, edge in edges.items():
+            if edge_id not in blocked:
+                expected[edge['from']] = min(expected[edge['from']], edge['weight'] + expected[edge['to']])
+
+    dist, next_hop = shortest_path_trees(road_graph, ["n0"], blocked)["n0"]
+    for node_id, cost in expected.items():
+        assert dist[road_graph.node_index[node_id]] == pytest.approx(cost)
+
+    # Com partidas, a pesquisa para cedo mas os caminhos pedidos sao os otimos
+    starts = ["n7", "n23"]
+    dist, next_hop = shortest_path_trees(road_graph, ["n0"], blocked, starts={"n0": starts})["n0"]
+    assert sum(d < float('inf') for d in dist) < len(nodes)
+    hops = tree_next_hops(road_graph, next_hop, starts)
+    for start in starts:
+        path = tree_route(hops, start, "n0")
+        assert path[0] == start and path[-1] == "n0"
+        assert not path_edges(path) & blocked
+        cost = sum(edges[edge_id]['weight'] for edge_id in path_edges(path))
+        assert cost == pytest.approx(expected[start])
+
+
+def test_reachability_index_matches_graph_search():
+    rng = random.Random(3)
+    nodes = {f"n{i}": (i, 0) for i in range(30)}
+    # Cadeias de sentido unico entre grupos: muitas componentes no grafo condensado
+    edges = {}
+    for _ in range(45):
+        a, b = rng.sample(range(30), 2)
+        edges[f"n{a}->n{b}"] = {'from': f"n{a}", 'to': f"n{b}", 'weight': 1.0}
+    road_graph = CSRGraph.from_network(nodes, edges)
+    blocked = set(rng.sample(sorted(edges), 5))
+    index = ReachabilityIndex(road_graph, blocked)
+    assert 1 < index.num_components <= len(nodes)
+    assert len(index.dag_targets) <= len(edges) - len(blocked)
+
+    for start in nodes:
+        seen, stack = {start}, [start]
+        while stack:
+            node = stack.pop()
+            for edge_id, edge in edges.items():
+                if edge['from'] == node and edge_id not in blocked and edge['to'] not in seen:
+                    seen.add(edge['to'])
+                    stack.append(edge['to'])
+        for goal in nodes:
+            assert index.reachable(start, goal) == (goal in seen)
+    assert index.reachable("n0", "unknown")
+
+
+def test_light_schedule_predicts_phase_and_wait():
+    # Verde 10, amarelo 2, vermelho 8 ticks de 0.5 s; vermelho com 4 ticks restantes em t=0
+    schedule = LightSchedule(10, 2, 8, 0.5, 'red', 4, 0.0)
+    assert schedule.state_at(0.0) == 'red' and schedule.wait_at(0.0) == pytest.approx(2.0)
+    assert schedule.state_at(2.0) == 'green' and schedule.wait_at(2.0) == 0.0
+    assert schedule.state_at(7.5) == 'yellow'
+    assert schedule.state_at(2.0 + schedule.cycle * 0.5) == 'green'
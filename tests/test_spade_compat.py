@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Internos do SPADE usados pelo transporte local e pelo relogio em passos:
+falham aqui, de forma explicita, quando o SPADE instalado muda
+"""
+
+import inspect
+
+import pytest
+import spade
+from spade.agent import Agent
+from spade.behaviour import CyclicBehaviour, PeriodicBehaviour
+
+from agents import spade_compat
+from agents.sim_clock import ClockedPeriodicBehaviour, SteppedClock, get_clock, set_clock
+from agents.transport import TRANSPORT_LOCAL, TransportAgent, get_transport, set_transport
+
+
+def test_installed_spade_is_the_tested_series():
+    assert spade_compat.spade_is_tested(), (
+        f"SPADE {spade.__version__} instalado; o transporte local e o relógio em passos foram testados com "
+        f"{spade_compat.TESTED_SPADE_SERIES}.x (ver agents/spade_compat.py)"
+    )
+
+
+def test_local_transport_internals_exist():
+    agent = Agent("probe@localhost", "probe")
+    assert hasattr(agent, "_alive") and not agent.is_alive()
+    for hook in ("_hook_plugin_before_connection", "_hook_plugin_after_connection"):
+        assert callable(getattr(agent, hook))
+    # start()/stop() são os pontos de entrada que o TransportAgent substitui
+    assert TransportAgent.start is not Agent.start and TransportAgent.stop is not Agent.stop
+
+
+def test_untested_spade_refuses_local_transport(monkeypatch):
+    assert spade_compat.spade_is_tested("4.1.2") and not spade_compat.spade_is_tested("4.10.0")
+    monkeypatch.setattr(spade, "__version__", "5.0.0")
+    previous = get_transport()
+    with pytest.raises(RuntimeError, match="5.0.0"):
+        set_transport(TRANSPORT_LOCAL)
+    assert get_transport() == previous
+
+
+def test_stepped_clock_internals_exist():
+    # O ciclo do CyclicBehaviour chama _run a cada iteração; o relógio em passos substitui-o
+    assert "self._run()" in inspect.getsource(CyclicBehaviour._step)
+    assert ClockedPeriodicBehaviour._run is not PeriodicBehaviour._run
+    assert "_next_activation" in inspect.getsource(PeriodicBehaviour._run)
+
+
+def test_untested_spade_refuses_stepped_clock(monkeypatch):
+    monkeypatch.setattr(spade, "__version__", "5.0.0")
+    previous = get_clock()
+    with pytest.raises(RuntimeError, match="relógio em passos"):
+        set_clock(SteppedClock())
+    assert get_clock() is previous
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VehicleAgent e CoordinatorAgent: reparacao de rotas com D* Lite, cache de
+rotas partilhada e roteamento em lote (sem servidor XMPP)
+"""
+
+import asyncio
+import logging
+
+import pytest
+
+from agents.road_network import CSRGraph
+from agents.routing import LightSchedule, RouteCache
+from agents.sim_clock import RealTimeClock, SteppedClock, get_clock, set_clock
+from agents.spade_traffic_agents import MOVE_PERIOD, VERSION_MIN_INTERVAL, CoordinatorAgent, DisruptorAgent, VehicleAgent
+
+
+def make_vehicle(road_graph, name="car_1", vehicle_type='car'):
+    vehicle = VehicleAgent(f"{name}@localhost", "secret", name, "0_0", "3_3", vehicle_type=vehicle_type)
+    vehicle.set_road_graph(road_graph)
+    return vehicle
+
+
+@pytest.fixture
+def vehicle(road_graph):
+    """Carro de 0_0 para 3_3 com a rede da grelha ja recebida"""
+    return make_vehicle(road_graph)
+
+
+@pytest.fixture
+def frozen_clock():
+    """SteppedClock parado: sim_time() constante durante o teste"""
+    previous_clock = get_clock()
+    clock = SteppedClock(step=0.05)
+    set_clock(clock)
+    yield clock
+    set_clock(previous_clock if previous_clock is not clock else RealTimeClock())
+
+
+def add_unavoidable_penalties(vehicle):
+    """Trafego a saida da origem e semaforos nas duas entradas do destino"""
+    vehicle.traffic_reports["0_0->1_0"] = {'edge_id': "0_0->1_0", 'delay': 30}
+    vehicle.traffic_reports["0_0->0_1"] = {'edge_id': "0_0->0_1", 'delay': 10}
+    vehicle.traffic_lights["3_3_vertical"] = {'state': 'red'}
+    vehicle.traffic_lights["3_3_horizontal"] = {'state': 'yellow'}
+
+
+def route_edges(route):
+    return {f"{a}->{b}" for a, b in zip(route, route[1:])}
+
+
+def test_repair_route_avoids_newly_blocked_edges(vehicle):
+    assert vehicle.repair_route(())
+    blocked = f"{vehicle.route[1]}->{vehicle.route[2]}"
+    vehicle.blocked_edges = {blocked}
+    assert vehicle.repair_route({blocked})
+    assert vehicle.route[0] == "0_0" and vehicle.route[-1] == "3_3"
+    assert blocked not in route_edges(vehicle.route)
+
+
+def test_repair_route_sees_traffic_reported_since_last_repair(vehicle):
+    assert vehicle.repair_route(())
+    congested = f"{vehicle.route[1]}->{vehicle.route[2]}"
+    vehicle.traffic_reports[congested] = {'edge_id': congested, 'delay': 100}
+    assert vehicle.repair_route(())
+    assert congested not in route_edges(vehicle.route)
+    assert vehicle.route_planner.path_cost == pytest.approx(600)
+
+
+def test_vehicles_share_cached_routes(vehicle, road_graph):
+    cache = RouteCache()
+    other = make_vehicle(road_graph, "car_2")
+    vehicle.route_cache = other.route_cache = cache
+    route = vehicle.plan_route("0_0", "3_3")
+    assert other.plan_route("0_0", "3_3") == route
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert other.route_total_cost == vehicle.route_total_cost
+
+
+def test_batch_route_trees_match_vehicle_costs(vehicle, road_graph):
+    coordinator = CoordinatorAgent("coordinator@localhost", "secret", road_graph)
+    assert vehicle.repair_route(())
+    congested = f"{vehicle.route[1]}->{vehicle.route[2]}"
+    coordinator.traffic_reports[congested] = {'edge_id': congested, 'delay': 100}
+    vehicle.traffic_reports[congested] = {'edge_id': congested, 'delay': 100}
+    for jid, vehicle_type in ((str(vehicle.jid), 'car'), ("ambulance_1@localhost", 'ambulance')):
+        coordinator.vehicle_destinations[jid] = "3_3"
+        coordinator.vehicle_types[jid] = vehicle_type
+        coordinator.update_vehicle_route(jid, route_edges(vehicle.route))
+    next_hops, groups = coordinator.batch_route_trees([str(vehicle.jid), "ambulance_1@localhost"])
+    assert groups == {str(vehicle.jid): ("3_3", False), "ambulance_1@localhost": ("3_3", True)}
+    # So o recorte a partir dos nos das rotas, nao um salto por no da rede
+    assert all(len(hops) < road_graph.num_nodes for hops in next_hops.values())
+    assert vehicle.apply_route_tree(next_hops[("3_3", False)])
+    assert congested not in route_edges(vehicle.route)
+    assert vehicle.route_total_cost == pytest.approx(600)
+
+
+def test_astar_cost_breakdown_sums_to_route_total(vehicle):
+    vehicle.traffic_reports["0_0->0_1"] = {'edge_id': "0_0->0_1", 'delay': 10}
+    vehicle.traffic_reports["0_0->1_0"] = {'edge_id': "0_0->1_0", 'delay': 10}
+    vehicle.traffic_lights["3_3_vertical"] = {'state': 'red'}
+    vehicle.traffic_lights["3_3_horizontal"] = {'state': 'yellow'}
+    route = vehicle.calculate_route_astar("0_0", "3_3")
+    assert route[-1] == "3_3"
+    assert vehicle.route_traffic_penalty_cost == pytest.approx(50)
+    # Entrada pelo semaforo amarelo (o semaforo que controla a direcao do movimento)
+    assert vehicle.route_semaphore_penalty_cost == pytest.approx(50)
+    components = (vehicle.route_base_cost, vehicle.route_traffic_penalty_cost, vehicle.route_semaphore_penalty_cost)
+    assert vehicle.route_total_cost == pytest.approx(sum(components)) == pytest.approx(700)
+
+
+def test_repaired_route_costs_are_consistent(vehicle):
+    assert vehicle.repair_route(())
+    vehicle.traffic_reports[f"{vehicle.route[2]}->{vehicle.route[3]}"] = {'delay': 10}
+    vehicle.traffic_lights["3_3"] = {'state': 'yellow'}
+    assert vehicle.repair_route(())
+    components = (vehicle.route_base_cost, vehicle.route_traffic_penalty_cost, vehicle.route_semaphore_penalty_cost)
+    assert vehicle.route_total_cost == pytest.approx(sum(components))
+    assert vehicle.route_penalty_cost == pytest.approx(sum(components[1:]))
+    assert vehicle.route_semaphore_penalty_cost == pytest.approx(50)
+
+
+def recorded_costs(vehicle, path):
+    costs = (vehicle.route_total_cost, vehicle.route_base_cost,
+             vehicle.route_traffic_penalty_cost, vehicle.route_semaphore_penalty_cost)
+    vehicle._record_route_costs(path)
+    return costs, (vehicle.route_total_cost, vehicle.route_base_cost,
+                   vehicle.route_traffic_penalty_cost, vehicle.route_semaphore_penalty_cost)
+
+
+def test_astar_prices_predicted_light_waits(vehicle, frozen_clock):
+    add_unavoidable_penalties(vehicle)
+    vehicle.light_schedules["3_3_horizontal"] = LightSchedule(10, 2, 60, 0.5, 'red', 60, frozen_clock.time())
+    path = vehicle.calculate_route_astar("0_0", "3_3")
+    assert path[0] == "0_0" and path[-1] == "3_3"
+    astar_costs, recorded = recorded_costs(vehicle, path)
+    assert recorded[2] > 0 and recorded[3] > 0
+    assert astar_costs == pytest.approx(recorded)
+    assert recorded[0] == pytest.approx(sum(recorded[1:]))
+
+
+def test_dstar_lite_uses_the_astar_cost_function(vehicle, frozen_clock):
+    add_unavoidable_penalties(vehicle)
+    astar_path = vehicle.calculate_route_astar("0_0", "3_3")
+    astar_total = vehicle.route_total_cost
+    assert vehicle.repair_route(())
+    assert vehicle.route_total_cost == pytest.approx(astar_total)
+    assert vehicle.route_total_cost == pytest.approx(
+        vehicle.cost_model.route_costs(astar_path, frozen_clock.time(), vehicle.travel_speed())[0]
+    )
+
+
+def test_ambulances_ignore_lights(road_graph, frozen_clock):
+    ambulance, car = make_vehicle(road_graph, "ambulance_1", 'ambulance'), make_vehicle(road_graph)
+    add_unavoidable_penalties(ambulance)
+    add_unavoidable_penalties(car)
+    ambulance.calculate_route_astar("0_0", "3_3")
+    assert ambulance.route_semaphore_penalty_cost == 0
+    costs = ambulance.cost_model.slot_costs(frozen_clock.time())
+    pairs = list(zip(costs, car.cost_model.slot_costs(frozen_clock.time())))
+    assert all(a <= c for a, c in pairs) and any(a < c for a, c in pairs)
+
+
+def test_route_cache_is_not_shared_across_vehicle_profiles(road_graph, frozen_clock):
+    cache = RouteCache()
+    ambulance, car = make_vehicle(road_graph, "ambulance_1", 'ambulance'), make_vehicle(road_graph)
+    ambulance.route_cache = car.route_cache = cache
+    ambulance.plan_route("0_0", "3_3")
+    car_route = car.plan_route("0_0", "3_3")
+    assert cache.hits == 0
+    other = make_vehicle(road_graph, "car_2")
+    other.route_cache = cache
+    assert other.route_profile() == car.route_profile()
+    assert other.plan_route("0_0", "3_3") == car_route and cache.hits == 1
+
+
+def test_route_cache_hits_across_vehicles_within_a_light_cycle(road_graph, frozen_clock):
+    cache = RouteCache()
+    # Ciclo de 20 ticks de 0.5 s: janela de partida de 10 s
+    schedule = LightSchedule(10, 2, 8, 0.5, 'green', 10, frozen_clock.time())
+    cars = [make_vehicle(road_graph, f"car_{i}") for i in range(1, 11)]
+    for i, car in enumerate(cars):
+        car.route_cache = cache
+        car.add_light_schedule("3_3_horizontal", schedule)
+        frozen_clock.ticks = i * 10  # Partidas espalhadas por 4.5 s
+        car.plan_route("0_0", "3_3")
+    assert (cache.hits, cache.misses) == (9, 1)
+    assert cache.stats()['hit_rate'] == pytest.approx(0.9)
+    frozen_clock.ticks = 200  # Ciclo seguinte: nova previsão das esperas
+    cars[0].plan_route("0_0", "3_3")
+    assert cache.misses == 2
+
+
+def test_schedule_republish_with_same_plan_keeps_network_version(road_graph, frozen_clock):
+    coordinator = CoordinatorAgent("coordinator@localhost", "secret", road_graph)
+    schedule = {'node_id': "1_1", 'orientation': 'horizontal', 'green_time': 10, 'yellow_time': 2,
+                'red_time': 8, 'tick': 0.5, 'state': 'green', 'timer': 10, 'timestamp': 0.0}
+    frozen_clock.ticks = 100
+    coordinator.record_light_schedule(schedule)
+    assert coordinator.network_version == 1
+    frozen_clock.ticks = 200
+    coordinator.record_light_schedule(dict(schedule, state='red', timer=3, timestamp=frozen_clock.time()))
+    assert coordinator.network_version == 1
+    assert coordinator.light_projections["1_1_horizontal"].state_at(frozen_clock.time()) == 'red'
+    coordinator.record_light_schedule(dict(schedule, red_time=12))
+    assert coordinator.network_version == 2
+
+
+def test_version_bumps_within_the_interval_are_deferred(road_graph, frozen_clock):
+    coordinator = CoordinatorAgent("coordinator@localhost", "secret", road_graph)
+    frozen_clock.ticks = 100
+    coordinator.request_version_bump("tráfego em 0_0->0_1")
+    coordinator.request_version_bump("tráfego em 0_0->1_0")
+    assert coordinator.network_version == 1
+    frozen_clock.ticks += round(VERSION_MIN_INTERVAL / frozen_clock.step)
+    coordinator.flush_version_bump()
+    assert coordinator.network_version == 2
+    coordinator.flush_version_bump()
+    assert coordinator.network_version == 2
+
+
+def test_failed_searches_keep_the_destination(vehicle, frozen_clock, monkeypatch):
+    step = VehicleAgent.MoveBehaviour(period=MOVE_PERIOD)
+    step.set_agent(vehicle)
+    monkeypatch.setattr(step, "_report_route", lambda: asyncio.sleep(0))
+    monkeypatch.setattr(vehicle, "plan_route", lambda start, goal: [])
+    for attempt in range(10):
+        frozen_clock.ticks = attempt * 20  # Tentativas espaçadas de 1 s
+        assert asyncio.run(step.route_step()) is None
+    assert vehicle.end_node == "3_3"
+
+
+def test_unreachable_destination_is_replaced_without_searching(vehicle, monkeypatch):
+    vehicle.blocked_edges = {"2_3->3_3", "3_2->3_3"}
+    vehicle.update_reachability()
+    step = VehicleAgent.MoveBehaviour(period=MOVE_PERIOD)
+    step.set_agent(vehicle)
+    monkeypatch.setattr(step, "_report_route", lambda: asyncio.sleep(0))
+    monkeypatch.setattr(vehicle, "plan_route", lambda start, goal: pytest.fail("A* para destino inalcançável"))
+    asyncio.run(step.route_step())
+    assert vehicle.end_node != "3_3" and vehicle.destination_reachable()
+
+
+def test_blocked_edge_skips_are_logged_at_debug_level(vehicle, capsys, caplog):
+    vehicle.blocked_edges = {"0_0->0_1"}
+    with caplog.at_level(logging.DEBUG, logger="agents.spade_traffic_agents"):
+        assert vehicle.calculate_route_astar("0_0", "3_3")
+    assert "pulou aresta" not in capsys.readouterr().out
+    assert any("pulou aresta bloqueada 0_0->0_1" in record.getMessage() for record in caplog.records)
+
+
+def test_disruptor_keeps_roads_between_network_corners_open():
+    # Grelha 2x3: a-d e c-f ligam dois cantos da caixa envolvente
+    nodes = {"a": (0, 0), "b": (0, 50), "c": (0, 100), "d": (80, 0), "e": (80, 50), "f": (80, 100)}
+    streets = [("a", "b"), ("b", "c"), ("d", "e"), ("e", "f"), ("a", "d"), ("b", "e"), ("c", "f")]
+    edges = {}
+    for a, b in streets:
+        edges[f"{a}->{b}"] = {'from': a, 'to': b, 'weight': 100.0}
+        edges[f"{b}->{a}"] = {'from': b, 'to': a, 'weight': 100.0}
+    road_graph = CSRGraph.from_network(nodes, edges)
+    assert road_graph.corner_nodes == {"a", "c", "d", "f"}
+
+    disruptor = DisruptorAgent("disruptor@localhost", "secret", road_graph)
+    disruptor.loop = None
+    assert disruptor.activate_disruption(num_roads=5)
+    blocked_roads = {tuple(sorted(edge_id.split("->"))) for edge_id in disruptor.blocked_edges}
+    assert blocked_roads == {("a", "b"), ("b", "c"), ("d", "e"), ("e", "f"), ("b", "e")}
+    disruptor.deactivate_disruption()
+    assert not disruptor.activate_disruption(num_roads=6)